@@ -38,6 +38,7 @@ from . import acl
 from . import amazon
 from . import amqp
 from . import base
+from . import cache
 from . import config
 from . import crypt
 from . import daemon
@@ -50,6 +51,7 @@ from . import export
 from . import extras
 from . import formats
 from . import httpc
+from . import jobs
 from . import jsonf
 from . import legacy
 from . import log
@@ -78,9 +80,10 @@ from .acl import check_basic_auth, check_login, check_user, check_token, check_t
 from .base import APP, RUN_CALLED, RUN_F, Quorum, monkey, call_run, run, prepare_app,\
     run_base, run_waitress, run_netius, load, unload, load_all, load_app_config,\
     load_paths, load_bundles, start_log, extra_logging, get_app, get_adapter, get_log,\
-    get_level, get_handlers, get_handler, get_bundle, is_devel, finalize, before_request,\
-    after_request, context_processor, start_execution, stop_execution, setup_models,\
+    get_level, get_handlers, get_handler, get_bundle, get_chain, get_missing, get_startup, is_devel, finalize, before_request,\
+    after_request, flush_identity, get_identity_stats, context_processor, start_execution, stop_execution, setup_models, ensure_models,\
     models_c, resolve, templates_path, bundles_path, base_path, has_context, ensure_context, onrun
+from .cache import IdentityMap, QueryCache, MemoryCache, RedisCache
 from .config import conf, conf_prefix, conf_suffix, confs, confr, confd, confctx
 from .crypt import Cipher, RC4, Spritz
 from .daemon import Daemon
@@ -91,13 +94,15 @@ from .errors import errors_json
 from .exceptions import BaseError, ServerInitError, ModuleNotFound, OperationalError, AssertionError,\
     NotFoundError, ValidationError, NotImplementedError, BaseInternalError, ValidationInternalError,\
     ValidationMultipleError, HTTPError, HTTPDataError, JSONError
-from .execution import ExecutionThread, background, insert_work, interval_work,\
+from .execution import ExecutionThread, ExecutionWorker, background, register_queue, get_metrics,\
+    get_metrics_json, insert_work, insert_job, interval_work,\
     seconds_work, minutes_work, hourly_work, daily_work, weekly_work, monthly_work,\
     seconds_eval, minutes_eval, hourly_eval, daily_eval, weekly_eval, monthly_eval
 from .formats import xlsx_to_map
 from .httpc import file_g, get_f, get, get_json, post_json, put_json, delete_json, HTTPResponse
 from .info import NAME, VERSION, AUTHOR, EMAIL, DESCRIPTION, LICENSE, KEYWORDS, URL,\
     COPYRIGHT
+from .jobs import JobBackend, MemoryBackend, StoreBackend, RedisBackend
 from .jsonf import load_json
 from .log import MemoryHandler, BaseFormatter, ThreadFormatter, rotating_handler, smtp_handler,\
     in_signature, has_exception, debug, info, warning, error, critical
@@ -106,13 +111,14 @@ from .meta import Ordered
 from .model import Model, LocalModel, Field, link, operation, view, field, type_d, is_unset
 from .mongodb import MongoMap, MongoEncoder
 from .observer import Observable
-from .structures import OrderedDict, LazyDict, LazyValue, GeneratorFile, lazy_dict, lazy
-from .template import render_template, template_resolve
+from .structures import OrderedDict, Bundles, LazyDict, LazyValue, GeneratorFile, lazy_dict, lazy
+from .template import render_template, template_resolve, template_scan, template_invalidate
 from .typesf import AbstractType, Type, File, Files, ImageFile, ImageFiles, image, images, Reference,\
     reference, References, references, Encrypted, encrypted, secure
 from .unit_test import secured, TestCase
 from .util import is_iterable, request_json, get_field, get_object, is_mobile, is_tablet,\
-    is_browser, is_bot, browser_info, resolve_alias, page_types, find_types, norm_object, set_object,\
+    is_browser, is_bot, browser_info, user_agent_info, user_agent_stats, resolve_alias, page_types,\
+    find_types, norm_object, set_object,\
     leafs, load_form, load_locale, get_locale, get_langs, set_locale, reset_locale, anotate_async,\
     anotate_secure, run_thread, camel_to_underscore, camel_to_readable, underscore_to_camel, underscore_to_readable,\
     generate_identifier, to_locale, nl_to_br, nl_to_br_jinja, sp_to_nbsp, sp_to_nbsp_jinja, unset, date_time,\
@@ -47,15 +47,18 @@ import socket
 import logging
 import inspect
 import datetime
+import threading
 import functools
 
 import werkzeug.debug
 
 from . import acl
 from . import log
+from . import cache
 from . import amqp
 from . import util
 from . import data
+from . import jobs
 from . import mail
 from . import route
 from . import model
@@ -64,6 +67,7 @@ from . import amazon
 from . import extras
 from . import config
 from . import session
+from . import structures
 from . import redisdb
 from . import mongodb
 from . import pusherc
@@ -286,6 +290,7 @@ def load(
     logger = None,
     models = None,
     safe = False,
+    identity_map = False,
     **kwargs
 ):
     """
@@ -329,6 +334,10 @@ def load(
     :param safe: If the application should be run in a safe mode meaning that\
     extra validations will be done to ensure proper execution, typically these\
     kind of validations have a performance impacts (not recommended).
+    :type identity_map: bool
+    :param identity_map: If a request scoped identity map (first level cache)\
+    should be used by the data infra-structure, avoiding multiple retrievals of\
+    the same entity during the handling of a request.
     :rtype: Application
     :return: The application that is used by the loaded quorum environment in\
     case one was provided that is retrieved, otherwise the newly created one is\
@@ -338,9 +347,17 @@ def load(
     global APP
     if APP: return APP
 
+    # starts the timing of the loading process, each of the phases
+    # is going to be registered with its duration in the startup
+    # report that is going to be available after the load
+    phases = []
+    start = time.time()
+    mark = start
+
     # runs the initial loading of the configuration from all
     # the currently available sources (eg: file, environment, etc.)
     load_all()
+    mark = _phase(phases, "config", mark)
 
     # retrieves the value of all the configuration considered
     # to be base and that are going to be used in the loading
@@ -370,6 +387,12 @@ def load(
     mongo_url = config.conf("MONGO_URL", mongo_url)
     amqp_url = config.conf("CLOUDAMQP_URL", amqp_url)
     amqp_url = config.conf("RABBITMQ_URL", amqp_url)
+    identity_map = config.conf("IDENTITY_MAP", identity_map, cast = bool)
+    templates_cache = config.conf("TEMPLATES_CACHE", True, cast = bool)
+    templates_scan = config.conf("TEMPLATES_SCAN", False, cast = bool)
+    models_setup = config.conf("MODELS_SETUP", "eager")
+    bundles_load = config.conf("BUNDLES_LOAD", "eager")
+    bundles_missing = config.conf("BUNDLES_MISSING", 0, cast = int)
 
     # retrieves the possible base URL configuration value and uses it
     # as the basis for the creation of the static URL values to be used
@@ -406,10 +429,11 @@ def load(
     level = logging.DEBUG if debug else _level(level_s)
     logger = logger and prefix + logger
 
-    # retrieves the last stack element as the previous element and
-    # uses it to retrieve the module that has triggered the loading
-    previous = inspect.stack()[1]
-    module = inspect.getmodule(previous[0])
+    # retrieves the previous frame (caller) and uses it to retrieve
+    # the module that has triggered the loading, note that the frame
+    # is retrieved directly as the inspection of the stack is expensive
+    previous = sys._getframe(1)
+    module = inspect.getmodule(previous)
 
     # uses the module to retrieve the base path for the execution of
     # the app, this is going to be used to calculate relative paths
@@ -427,7 +451,9 @@ def load(
     # requested logger and provided "verbosity" level
     load_app_config(app, kwargs)
     load_app_config(app, config.confd())
+    mark = _phase(phases, "app", mark)
     start_log(app, name = logger, level = level)
+    mark = _phase(phases, "log", mark)
 
     # loads the various paths associated with the application into the
     # current environment to reduce the amount of issues related with
@@ -436,8 +462,10 @@ def load(
 
     # loads the complete set of bundle localized in the proper path into
     # the current app environment, this is a blocking operation and may
-    # take some time to be performed completely
-    load_bundles(app)
+    # take some time to be performed completely (unless deferred)
+    load_bundles(app, lazy = not bundles_load == "eager")
+    app.bundles.missing_size = bundles_missing
+    mark = _phase(phases, "bundles", mark)
 
     # converts the naming of the adapter into a capital case one and
     # then tries to retrieve the associated class for proper instantiation
@@ -466,6 +494,9 @@ def load(
     app.request_class = request.Request
     app.locales = locales
     app.safe = safe
+    app.identity_map = identity_map
+    app.identity_stats = dict()
+    app.templates_cache = templates_cache
     app.debug = debug
     app.use_debugger = debug
     app.use_reloader = reloader
@@ -487,6 +518,15 @@ def load(
         finalize = finalize
     )
     app._locale_d = locales[0]
+    app.startup = phases
+    mark = _phase(phases, "setup", mark)
+
+    # compiles the lookup chains of the bundles for each of the available
+    # locales so that no resolution is required at request time, in case
+    # the bundles loading is deferred the compilation is deferred as well
+    if bundles_load == "eager": compile_bundles(app)
+    elif bundles_load == "background": _background(app, "bundles", compile_bundles, app)
+    mark = _phase(phases, "compile", mark)
 
     # sets a series of conditional based attributes in both
     # the associated modules and the base app object (as expected)
@@ -504,10 +544,20 @@ def load(
     if smtp_user: mail.SMTP_USER = smtp_user
     if smtp_password: mail.SMTP_PASSWORD = smtp_password
     if execution: start_execution()
+    mark = _phase(phases, "execution", mark)
     if redis_session: app.session_interface = session.RedisSessionInterface(url = redis_url)
     if mongo_database: mongodb.database = mongo_database + suffix
-    if models: setup_models(models)
+    if models: setup_models(models, lazy = not models_setup == "eager")
+    if models and models_setup == "background": _background(app, "models", ensure_models, models)
+    mark = _phase(phases, "models", mark)
     if force_ssl: extras.SSLify(app)
+    if templates_scan and template.is_cached(app): template.template_scan()
+    mark = _phase(phases, "extras", mark)
+
+    # registers the total duration of the loading process and logs
+    # the complete startup report for debugging purposes
+    phases.append(("total", mark - start))
+    app.logger.debug("Loaded in %s" % _startup_s(phases))
 
     # verifies if the module that has called the method is not
     # of type main and in case it's not calls the runner methods
@@ -539,6 +589,8 @@ def unload():
     if not APP: return
 
     if APP.models: teardown_models(APP.models)
+    if APP.adapter: APP.adapter.flush()
+    template.template_invalidate()
 
     APP = None
 
@@ -548,8 +600,8 @@ def load_all(path = None):
     config.load_env()
 
 def load_config(offset = 1, encoding = "utf-8"):
-    element = inspect.stack()[offset]
-    module = inspect.getmodule(element[0])
+    element = sys._getframe(offset)
+    module = inspect.getmodule(element)
     base_folder = os.path.dirname(module.__file__)
     config.load(path = base_folder, encoding = encoding)
 
@@ -560,23 +612,31 @@ def load_app_config(app, configs):
 def load_paths(app):
     if not app.root_path in sys.path: sys.path.insert(0, app.root_path)
 
-def load_bundles(app, offset = 2):
+def load_bundles(app, offset = 2, lazy = False):
     # creates the base dictionary that will handle all the loaded
     # bundle information and sets it in the current application
     # object reference so that may be used latter on
-    bundles = dict()
+    bundles = structures.Bundles()
     app.bundles = bundles
 
     # inspects the current stack to obtain the reference to the base
     # application module and then uses it to calculate the base path
     # for the application, from there re-constructs the path to the
     # bundle file and verifies its own existence
-    element = inspect.stack()[offset]
-    module = inspect.getmodule(element[0])
+    element = sys._getframe(offset)
+    module = inspect.getmodule(element)
     base_folder = os.path.dirname(module.__file__)
     bundles_path = os.path.join(base_folder, "bundles")
     if not os.path.exists(bundles_path): return
 
+    # in case the loading is meant to be lazy the loader is set in the
+    # bundles so that the files are only read on first use
+    if lazy: bundles.loader = functools.partial(_load_bundles, path = bundles_path)
+    else: _load_bundles(bundles, bundles_path)
+
+def _load_bundles(bundles, path):
+    bundles_path = path
+
     # list the bundles directory files and iterates over each of the
     # files to load its own contents into the bundles "registry"
     paths = os.listdir(bundles_path)
@@ -603,6 +663,11 @@ def load_bundles(app, offset = 2):
         bundle.update(data_j)
         bundles[locale] = bundle
 
+def compile_bundles(app):
+    for locale in app.locales:
+        get_chain(locale, app = app)
+        get_chain(locale, app = app, fallback = False)
+
 def start_log(
     app,
     name = None,
@@ -798,6 +863,7 @@ def get_handler(name, app = None):
 def get_bundle(name, app = None, split = True):
     app = app or APP
     if not app: return None
+    if isinstance(app.bundles, structures.Bundles): app.bundles.ensure()
     bundle = app.bundles.get(name, None)
     if bundle: return bundle
     if split and name:
@@ -807,6 +873,78 @@ def get_bundle(name, app = None, split = True):
     name = _best_locale(name)
     return app.bundles.get(name, None)
 
+def get_chain(locale, app = None, fallback = True):
+    """
+    Retrieves the (compiled) chain of bundles to be used in the
+    localization of values for the provided locale, meaning the
+    bundle of the locale, the bundle of its language and then (if
+    requested) the bundles of the default locale.
+
+    The chains are compiled once and cached in the bundles registry
+    so that the localization is a direct lookup in the bundles.
+
+    :type locale: String
+    :param locale: The locale for which to retrieve the chain, if not
+    provided only the default locale bundles are used (fallback).
+    :type app: Application
+    :param app: The application from which the bundles are retrieved.
+    :type fallback: bool
+    :param fallback: If the bundles of the default locale should be
+    part of the chain (as a fallback).
+    :rtype: Tuple
+    :return: The sequence of bundles to be used for the localization.
+    """
+
+    app = app or APP
+    if not app: return ()
+    if not isinstance(app.bundles, structures.Bundles):
+        app.bundles = structures.Bundles(app.bundles)
+
+    def builder():
+        chain = []
+        locales = [locale] if locale else []
+        if fallback: locales.append(app._locale_d)
+        for _locale in locales:
+            language = _locale.split("_", 1)[0]
+            for name in (_locale, language):
+                bundle = get_bundle(name, app = app)
+                if bundle == None: continue
+                if [_bundle for _bundle in chain if _bundle is bundle]: continue
+                chain.append(bundle)
+        return chain
+
+    token = (tuple(app.locales), app._locale_d)
+    return app.bundles.chain((locale, fallback), builder, token = token)
+
+def get_missing(app = None):
+    app = app or APP
+    if not app: return None
+    missing = getattr(app.bundles, "missing", {})
+    return dict((locale, dict(values)) for locale, values in missing.items())
+
+def get_startup(app = None):
+    """
+    Retrieves the report on the timing of the loading (startup) of
+    the application, with the duration of each of the phases.
+
+    Phases deferred to the background are added to the report as
+    they complete (eg: ``models@background``).
+
+    :type app: Application
+    :param app: The application for which to retrieve the report.
+    :rtype: Dictionary
+    :return: The report as a map with the ordered sequence of phases
+    (name and duration in seconds) and the total loading duration.
+    """
+
+    app = app or APP
+    if not app: return None
+    report = dict(phases = [], total = None)
+    for name, duration in getattr(app, "startup", []):
+        if name == "total": report["total"] = duration
+        else: report["phases"].append(dict(name = name, duration = duration))
+    return report
+
 def is_devel(app = None):
     level = get_level(app = app)
     if not level: return False
@@ -820,13 +958,21 @@ def finalize(value):
     return value
 
 def before_request():
-    flask.request.args_s = util.load_form(flask.request.args)
-    flask.request.form_s = util.load_form(flask.request.form)
+    # in case the request is not an instance of the quorum request
+    # (custom request class) the structured versions of the arguments
+    # and the form are eagerly loaded, otherwise they are lazy loaded
+    _request = flask.request._get_current_object()
+    if not isinstance(_request, request.Request):
+        flask.request.args_s = util.load_form(flask.request.args)
+        flask.request.form_s = util.load_form(flask.request.form)
     flask.request.locale = util.load_locale(APP.locales)
+    flask.request.chains = dict()
+    flask.request.identity = cache.IdentityMap() if APP.identity_map else None
     util.set_locale()
 
 def after_request(response):
     if APP.safe: util.reset_locale()
+    flush_identity()
     util.anotate_async(response)
     util.anotate_secure(response)
     return response
@@ -844,11 +990,44 @@ def context_processor():
         zip = zip
     )
 
+def flush_identity():
+    # retrieves the identity map associated with the current request
+    # and in case there's none returns immediately (nothing to be done)
+    identity = getattr(flask.request, "identity", None)
+    if identity == None: return
+
+    # accumulates the hit and miss counters of the identity map under
+    # the statistics of the current endpoint, so that the reduction in
+    # queries may be measured on a per endpoint basis
+    endpoint = flask.request.endpoint or "default"
+    stats = APP.identity_stats.get(endpoint, dict(requests = 0, hits = 0, misses = 0))
+    stats["requests"] += 1
+    stats["hits"] += identity.hits
+    stats["misses"] += identity.misses
+    APP.identity_stats[endpoint] = stats
+
+    # clears the identity map and unsets it from the current request
+    # so that no more (possibly stale) values are used from it
+    identity.clear()
+    flask.request.identity = None
+
+def get_identity_stats(app = None):
+    app = app or APP
+    if not app: return None
+    return app.identity_stats
+
 def start_execution():
     # creates the thread that it's going to be used to
     # execute the various background tasks and starts
     # it, providing the mechanism for execution
-    execution.background_t = execution.ExecutionThread()
+    workers = config.conf("EXECUTION_WORKERS", 0, cast = int)
+    backend = config.conf("EXECUTION_BACKEND", None)
+    lease = config.conf("EXECUTION_LEASE", jobs.LEASE_TIME, cast = float)
+    backend = jobs.get_backend(backend, lease = lease)
+    execution.background_t = execution.ExecutionThread(
+        workers = workers,
+        backend = backend
+    )
     background_t = execution.background_t
     background_t.start()
 
@@ -859,13 +1038,22 @@ def stop_execution():
     background_t = execution.background_t
     background_t and background_t.stop()
 
-def setup_models(models):
+def setup_models(models, lazy = False):
+    _models_c = models_c(models = models)
+    for model_c in _models_c:
+        if model_c._is_ready(): continue
+        model_c._pending = True
+        if not lazy: model_c._ensure()
+
+def ensure_models(models):
     _models_c = models_c(models = models)
-    for model_c in _models_c: model_c.setup()
+    for model_c in _models_c: model_c._ensure()
 
 def teardown_models(models):
     _models_c = models_c(models = models)
-    for model_c in _models_c: model_c.teardown()
+    for model_c in _models_c:
+        model_c.teardown()
+        model_c._ready = False
 
 def models_c(models = None):
     # retrieves the proper models defaulting to the current
@@ -970,6 +1158,27 @@ def onrun(function):
     RUN_F[fname] = function
     return function
 
+def _phase(phases, name, mark):
+    current = time.time()
+    phases.append((name, current - mark))
+    return current
+
+def _background(app, name, callable, *args, **kwargs):
+    def runner():
+        start = time.time()
+        try: callable(*args, **kwargs)
+        except Exception as exception:
+            app.logger.warning("Problem in background %s load: %s" % (name, exception))
+        _phase(app.startup, name + "@background", start)
+
+    thread = threading.Thread(target = runner, name = "Background-" + name)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+def _startup_s(phases):
+    return ", ".join("%s %.2fms" % (name, duration * 1000.0) for name, duration in phases)
+
 def _level(level):
     """
     Converts the provided logging level value into the best
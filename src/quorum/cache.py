@@ -0,0 +1,423 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Flask Quorum
+# Copyright (c) 2008-2020 Hive Solutions Lda.
+#
+# This file is part of Hive Flask Quorum.
+#
+# Hive Flask Quorum is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Flask Quorum is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Flask Quorum. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__version__ = "1.0.0"
+""" The version of the module """
+
+__revision__ = "$LastChangedRevision$"
+""" The revision number of the module """
+
+__date__ = "$LastChangedDate$"
+""" The last change date of the module """
+
+__copyright__ = "Copyright (c) 2008-2020 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+import copy
+import json
+import time
+import uuid
+import hashlib
+import threading
+import collections
+
+from . import legacy
+from . import redisdb
+from . import exceptions
+
+class IdentityMap(object):
+    """
+    Request scoped identity map (first level cache) that keeps
+    the raw documents loaded from the data source indexed by
+    their collection and identifier, so that the same entity
+    is not retrieved multiple times in the same request.
+
+    Documents may also be retrieved by alias, meaning a pair of
+    attribute name and value that was previously used to load
+    them (eg: the join attribute of a reference).
+
+    The documents are always copied when stored and retrieved
+    so that no data is shared between model instances.
+    """
+
+    hits = 0
+    """ The number of lookup operations that have been served
+    by the identity map (no data source access required) """
+
+    misses = 0
+    """ The number of lookup operations that could not be
+    served by the identity map (data source access required) """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._documents = dict()
+        self._aliases = dict()
+
+    def get(self, collection, name, value, fields = None):
+        """
+        Retrieves a copy of the document of the provided collection
+        that has the provided value for the attribute with the given
+        name, in case there's no such document an invalid value is
+        returned (and the miss is accounted).
+
+        :type collection: String
+        :param collection: The name of the collection to which the
+        document to be retrieved belongs.
+        :type name: String
+        :param name: The name of the attribute that is going to be
+        used for the lookup, should be either the identifier or an
+        alias attribute (previously registered).
+        :type value: Object
+        :param value: The value of the attribute for the lookup.
+        :type fields: List
+        :param fields: The sequence of fields that are required to
+        be present in the document, in case the stored document does
+        not contain all of them the lookup is considered a miss.
+        :rtype: Dictionary
+        :return: A copy of the stored document or an invalid value in
+        case it's not possible to serve the lookup.
+        """
+
+        document = self._get(collection, name, value, fields = fields)
+        if document == None: self.misses += 1; return None
+        self.hits += 1
+        return copy.deepcopy(document)
+
+    def has(self, collection, name, value, fields = None):
+        document = self._get(collection, name, value, fields = fields)
+        return False if document == None else True
+
+    def put(self, collection, document, name = None, fields = None):
+        """
+        Stores (a copy of) the provided raw document in the identity
+        map, optionally registering it under the alias defined by the
+        provided attribute name.
+
+        :type collection: String
+        :param collection: The name of the collection to which the
+        document belongs.
+        :type document: Dictionary
+        :param document: The raw document (as retrieved from the data
+        source) that is going to be stored.
+        :type name: String
+        :param name: The name of the attribute that has been used to
+        retrieve the document, to be used as an alias.
+        :type fields: List
+        :param fields: The sequence of fields that were requested when
+        retrieving the document (projection), an invalid value means
+        that the complete document was retrieved.
+        """
+
+        _id = document.get("_id", None)
+        if _id == None: return
+        fields = frozenset(fields) if fields else None
+        self._documents[(collection, _id)] = (copy.deepcopy(document), fields)
+        if not name or name == "_id": return
+        if not name in document: return
+        if not self._is_key(document[name]): return
+        self._aliases[(collection, name, document[name])] = _id
+
+    def invalidate(self, collection):
+        """
+        Removes the complete set of documents (and aliases) associated
+        with the provided collection, should be called whenever a write
+        operation is performed for the collection.
+
+        :type collection: String
+        :param collection: The name of the collection that is going to
+        have its documents invalidated.
+        """
+
+        for key in legacy.eager(self._documents.keys()):
+            if not key[0] == collection: continue
+            del self._documents[key]
+        for key in legacy.eager(self._aliases.keys()):
+            if not key[0] == collection: continue
+            del self._aliases[key]
+
+    def clear(self):
+        self._documents.clear()
+        self._aliases.clear()
+
+    def stats(self):
+        return dict(
+            hits = self.hits,
+            misses = self.misses,
+            size = len(self._documents)
+        )
+
+    def _get(self, collection, name, value, fields = None):
+        if not self._is_key(value): return None
+        if name == "_id": _id = value
+        else: _id = self._aliases.get((collection, name, value), None)
+        if _id == None: return None
+        document, _fields = self._documents.get((collection, _id), (None, None))
+        if document == None: return None
+        if not fields or _fields == None: return document
+        if not _fields.issuperset(fields): return None
+        return dict(
+            (key, value) for key, value in legacy.iteritems(document)\
+            if key in fields or key == "_id"
+        )
+
+    def _is_key(self, value):
+        if value == None: return False
+        if isinstance(value, (dict, list, tuple, set)): return False
+        try: hash(value)
+        except TypeError: return False
+        return True
+
+class QueryCache(object):
+    """
+    Abstract query (second level) cache that stores the results
+    of the data source queries (eg: find and count) indexed by a
+    key built from the normalized query parameters.
+
+    The entries are grouped by collection so that a write in a
+    collection invalidates every query result associated with it,
+    the concrete implementations define the storage strategy.
+    """
+
+    ttl = None
+    """ The time to live (in seconds) of each cache entry, after
+    this period the entry is considered stale and is discarded,
+    an invalid value means that the entries never expire """
+
+    hits = 0
+    """ The number of lookups served by the cache """
+
+    misses = 0
+    """ The number of lookups that required access to the data
+    source, either because of a missing or an expired entry """
+
+    def __init__(self, ttl = None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, *args):
+        """
+        Builds the (digest based) key for the query defined by the
+        provided sequence of arguments, the arguments are serialized
+        in a normalized fashion (sorted keys) so that equivalent
+        queries generate the same key.
+
+        :rtype: String
+        :return: The hexadecimal digest that identifies the query.
+        """
+
+        data = json.dumps(args, sort_keys = True, default = repr)
+        data = legacy.bytes(data, encoding = "utf-8", force = True)
+        return hashlib.sha1(data).hexdigest()
+
+    def get(self, collection, key):
+        """
+        Retrieves the result stored in the cache for the provided
+        collection and (query) key, an invalid value is returned in
+        case there's no valid entry (the lookup is considered a miss).
+
+        :type collection: String
+        :param collection: The name of the collection of the query.
+        :type key: String
+        :param key: The key that identifies the query.
+        :rtype: Object
+        :return: The (copy of the) stored result or an invalid value
+        in case it was not possible to serve the lookup.
+        """
+
+        value = self._get(collection, key)
+        if value == None: self.misses += 1; return None
+        self.hits += 1
+        return value
+
+    def set(self, collection, key, value):
+        self._set(collection, key, value)
+
+    def invalidate(self, collection):
+        raise exceptions.NotImplementedError("Missing implementation")
+
+    def clear(self):
+        raise exceptions.NotImplementedError("Missing implementation")
+
+    def ratio(self):
+        total = self.hits + self.misses
+        if total == 0: return 0.0
+        return self.hits / float(total)
+
+    def stats(self):
+        return dict(
+            hits = self.hits,
+            misses = self.misses,
+            ratio = self.ratio()
+        )
+
+    def _get(self, collection, key):
+        raise exceptions.NotImplementedError("Missing implementation")
+
+    def _set(self, collection, key, value):
+        raise exceptions.NotImplementedError("Missing implementation")
+
+class MemoryCache(QueryCache):
+    """
+    In process query cache implementation that keeps a bounded
+    number of entries, evicting the least recently used ones once
+    the limit is reached.
+
+    This cache is local to the process so in a multiple process
+    environment writes performed by other processes are only seen
+    after the entries expire (a small ttl should be used).
+    """
+
+    size = None
+    """ The maximum number of entries to be kept in the cache,
+    an invalid value means that the cache is unbounded """
+
+    evictions = 0
+    """ The number of entries removed from the cache due to the
+    size limit being reached (least recently used ones) """
+
+    def __init__(self, ttl = None, size = 1024):
+        QueryCache.__init__(self, ttl = ttl)
+        self.size = size
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    def invalidate(self, collection):
+        with self._lock:
+            for key in legacy.eager(self._entries.keys()):
+                if not key[0] == collection: continue
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        stats = QueryCache.stats(self)
+        stats.update(
+            evictions = self.evictions,
+            size = len(self._entries)
+        )
+        return stats
+
+    def _get(self, collection, key):
+        with self._lock:
+            entry = self._entries.pop((collection, key), None)
+            if entry == None: return None
+            value, expires = entry
+            if expires and expires < time.time(): return None
+            self._entries[(collection, key)] = entry
+        return copy.deepcopy(value)
+
+    def _set(self, collection, key, value):
+        expires = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries.pop((collection, key), None)
+            self._entries[(collection, key)] = (copy.deepcopy(value), expires)
+            while self.size and len(self._entries) > self.size:
+                self._entries.popitem(last = False)
+                self.evictions += 1
+
+class RedisCache(QueryCache):
+    """
+    Query cache implementation backed by a Redis (compatible)
+    connection, so that the cached results are shared among the
+    multiple processes of the application.
+
+    The invalidation of a collection is performed by changing its
+    generation value (part of the entry keys) so that the previous
+    entries are no longer reachable and expire according to the ttl,
+    the same happens for the complete cache with the namespace value.
+    """
+
+    prefix = None
+    """ The prefix to be used in every key stored in Redis """
+
+    def __init__(self, ttl = 3600, prefix = "quorum:cache", connection = None):
+        QueryCache.__init__(self, ttl = ttl)
+        self.prefix = prefix
+        self._connection = connection
+
+    def invalidate(self, collection):
+        connection = self._get_connection()
+        connection.set(self._generation_key(collection), str(uuid.uuid4()))
+
+    def clear(self):
+        # changes the namespace of the cache (part of every entry key)
+        # so that all of the previous entries are immediately unreachable
+        # and then removes them, as they may not have a ttl defined
+        connection = self._get_connection()
+        namespace = self._namespace()
+        connection.set(self._namespace_key(), str(uuid.uuid4()))
+        match = "%s:%s:*" % (self.prefix, namespace)
+        for name in connection.scan_iter(match = match): connection.delete(name)
+
+    def _get(self, collection, key):
+        connection = self._get_connection()
+        data = connection.get(self._entry_key(collection, key))
+        if data == None: return None
+        return legacy.cPickle.loads(data)
+
+    def _set(self, collection, key, value):
+        connection = self._get_connection()
+        data = legacy.cPickle.dumps(value, protocol = 2)
+        name = self._entry_key(collection, key)
+        if self.ttl: connection.setex(name, value = data, time = self.ttl)
+        else: connection.set(name, data)
+
+    def _entry_key(self, collection, key):
+        namespace, generation = self._generation(collection)
+        return "%s:%s:%s:%s:%s" % (self.prefix, namespace, collection, generation, key)
+
+    def _namespace_key(self):
+        return "%s:namespace" % self.prefix
+
+    def _generation_key(self, collection):
+        return "%s:%s:generation" % (self.prefix, collection)
+
+    def _namespace(self):
+        connection = self._get_connection()
+        namespace = connection.get(self._namespace_key())
+        if namespace == None: return "0"
+        return legacy.str(namespace)
+
+    def _generation(self, collection):
+        # retrieves both the namespace of the cache and the generation
+        # of the collection in a single operation (one round trip)
+        connection = self._get_connection()
+        namespace, generation = connection.mget(
+            [self._namespace_key(), self._generation_key(collection)]
+        )
+        namespace = "0" if namespace == None else legacy.str(namespace)
+        generation = "0" if generation == None else legacy.str(generation)
+        return namespace, generation
+
+    def _get_connection(self):
+        if self._connection: return self._connection
+        self._connection = redisdb.get_connection()
+        return self._connection
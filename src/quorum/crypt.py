@@ -38,10 +38,24 @@ __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
 import array
+import threading
+import collections
 
 from . import legacy
 from . import exceptions
 
+STATES_SIZE = 256
+""" The maximum number of key schedule states kept in the
+cache (per cipher), the least recently used are discarded """
+
+STATES = collections.OrderedDict()
+""" The cache associating the cipher name and key with the
+state of the cipher after the key schedule, avoiding the
+re-computation of the schedule for the same key """
+
+STATES_LOCK = threading.RLock()
+""" The lock that controls the access to the states cache """
+
 class Cipher(object):
 
     def __init__(self, key):
@@ -52,6 +66,48 @@ class Cipher(object):
         cipher = cls._cipher(cipher)
         return cipher(key)
 
+    @classmethod
+    def encrypt_many(cls, key, sequence):
+        """
+        Encrypts each of the items of the provided sequence using
+        a new cipher instance (fresh key stream) for each of them,
+        the result is the same as encrypting them individually.
+
+        :type key: String
+        :param key: The key to be used in the encryption.
+        :type sequence: List
+        :param sequence: The sequence of data buffers to be encrypted.
+        :rtype: List
+        :return: The list of the encrypted data buffers in the same
+        order as the provided sequence.
+        """
+
+        return [cls(key).encrypt(data) for data in sequence]
+
+    @classmethod
+    def decrypt_many(cls, key, sequence):
+        return [cls(key).decrypt(data) for data in sequence]
+
+    @classmethod
+    def _state(cls, key, builder):
+        name = cls.__name__.lower()
+        _key = (name, legacy.bytes(key))
+        STATES_LOCK.acquire()
+        try:
+            state = STATES.get(_key, None)
+            if not state == None: STATES[_key] = STATES.pop(_key)
+        finally:
+            STATES_LOCK.release()
+        if not state == None: return state
+        state = builder()
+        STATES_LOCK.acquire()
+        try:
+            STATES[_key] = state
+            while len(STATES) > STATES_SIZE: STATES.popitem(last = False)
+        finally:
+            STATES_LOCK.release()
+        return state
+
     @classmethod
     def _cipher(cls, name):
         for subclass in cls.__subclasses__():
@@ -95,29 +151,40 @@ class RC4(Cipher):
         i = self.i
         j = self.j
 
-        for char in data:
-            i = (i + 1) % 256
-            j = (j + box[i]) % 256
+        if not isinstance(data, (bytes, bytearray)):
+            data = bytearray(legacy.ord(char) for char in data)
+
+        for byte in bytearray(data):
+            i = (i + 1) & 0xff
+            j = (j + box[i]) & 0xff
 
-            box[i], box[j] = box[j], self.box[i]
-            k = box[(box[i] + box[j]) % 256]
+            box[i], box[j] = box[j], box[i]
+            k = box[(box[i] + box[j]) & 0xff]
 
-            ciph = legacy.ord(char) ^ k
-            out[index] = ciph
+            out[index] = byte ^ k
             index += 1
 
         self.i = i
         self.j = j
 
     def _start(self):
-        self.box = legacy.range(256)
+        # restores the box from the (cached) state resulting from
+        # the key schedule, the box is copied as it's mutated
+        box = self._state(self.key, self._schedule)
+        self.box = bytearray(box)
         self.i = 0
         self.j = 0
 
+    def _schedule(self):
+        box = bytearray(range(256))
+        key = bytearray(legacy.ord(char) for char in self.key)
+
         x = 0
         for i in range(256):
-            x = (x + self.box[i] + legacy.ord(self.key[i % len(self.key)])) % 256
-            self.box[i], self.box[x] = self.box[x], self.box[i]
+            x = (x + box[i] + key[i % len(key)]) & 0xff
+            box[i], box[x] = box[x], box[i]
+
+        return bytes(box)
 
 class Spritz(Cipher):
     """
@@ -133,22 +200,23 @@ class Spritz(Cipher):
 
     def __init__(self, key):
         Cipher.__init__(self, key)
-        self._start()
-        self.absorb(self.key)
+        self._states = self._state(self.key, self._schedule)
+        self._restore(self._states[0])
 
     def encrypt(self, data):
         data = bytearray(data)
-        sequezing = self.squeeze(len(data))
-        out = bytearray(self._add(b1, b2) for b1, b2 in zip(data, sequezing))
+        stream = self._stream(len(data))
+        out = bytearray((b1 + b2) & 0xff for b1, b2 in zip(data, stream))
         return bytes(out)
 
     def decrypt(self, data):
         data = bytearray(data)
-        sequezing = self.squeeze(len(data))
-        out = bytearray(self._add(b1, -b2) for b1, b2 in zip(data, sequezing))
+        stream = self._stream(len(data))
+        out = bytearray((b1 - b2) & 0xff for b1, b2 in zip(data, stream))
         return bytes(out)
 
     def absorb(self, data):
+        self._states = None
         data = bytearray(data)
         for byte in data: self._absorb_byte(byte)
 
@@ -165,6 +233,7 @@ class Spritz(Cipher):
         self.w = self._add(self.w, 2)
 
     def crush(self):
+        self._states = None
         for v in range(128):
             if self.S[v] <= self.S[255 - v]: continue
             self._swap(v, 255 - v)
@@ -179,6 +248,7 @@ class Spritz(Cipher):
         return self._output()
 
     def _update(self):
+        self._states = None
         self.i = self._add(self.i, self.w)
         self.j = self._add(self.k, self.S[self._add(self.j, self.S[self.i])])
         self.k = self._add(self.i, self.k, self.S[self.j])
@@ -188,6 +258,71 @@ class Spritz(Cipher):
         self.z = self.S[self._add(self.j, self.S[self._add(self.i, self.S[self._add(self.z, self.k)])])]
         return self.z
 
+    def _stream(self, r):
+        # in case a shuffle is pending and the state is the one resulting
+        # from the key schedule the (cached) shuffled state is restored,
+        # otherwise the shuffle is performed using the fast loop
+        states = self._states
+        if self.a > 0 and states:
+            if not states[1]: states[1] = self._shuffled()
+            self._restore(states[1])
+        elif self.a > 0:
+            self._shuffle_fast()
+        self._states = None
+
+        S = self.S
+        i, j, k, z, w = self.i, self.j, self.k, self.z, self.w
+        out = bytearray(r)
+
+        # runs the update and output operations of the drip
+        # in a tight loop using only local variables
+        for index in range(r):
+            i = (i + w) & 0xff
+            j = (k + S[(j + S[i]) & 0xff]) & 0xff
+            k = (i + k + S[j]) & 0xff
+            S[i], S[j] = S[j], S[i]
+            z = S[(j + S[(i + S[(z + k) & 0xff]) & 0xff]) & 0xff]
+            out[index] = z
+
+        self.i, self.j, self.k, self.z = i, j, k, z
+        return out
+
+    def _shuffle_fast(self):
+        for _index in range(2):
+            self._whip_fast(512)
+            self.crush()
+        self._whip_fast(512)
+        self.a = 0
+
+    def _whip_fast(self, r):
+        S = self.S
+        i, j, k, w = self.i, self.j, self.k, self.w
+
+        for _index in range(r):
+            i = (i + w) & 0xff
+            j = (k + S[(j + S[i]) & 0xff]) & 0xff
+            k = (i + k + S[j]) & 0xff
+            S[i], S[j] = S[j], S[i]
+
+        self.i, self.j, self.k = i, j, k
+        self.w = (w + 2) & 0xff
+
+    def _schedule(self):
+        self._start()
+        self.absorb(self.key)
+        return [self._save(), None]
+
+    def _shuffled(self):
+        self._shuffle_fast()
+        return self._save()
+
+    def _save(self):
+        return (self.i, self.j, self.k, self.z, self.a, self.w, bytes(self.S))
+
+    def _restore(self, state):
+        self.i, self.j, self.k, self.z, self.a, self.w, S = state
+        self.S = bytearray(S)
+
     def _add(self, *args):
         return sum(args) % 256
 
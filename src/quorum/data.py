@@ -38,7 +38,10 @@ __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
 import os
+import re
 import time
+import atexit
+import bisect
 import struct
 import socket
 import hashlib
@@ -89,6 +92,9 @@ class DataAdapter(object):
     def drop_db_a(self, *args, **kwargs):
         raise exceptions.NotImplementedError()
 
+    def flush(self):
+        pass
+
     def object_id(self, value = None):
         if not value: return self._id()
         if not len(value) == 24:
@@ -169,8 +175,16 @@ class TinyAdapter(DataAdapter):
         DataAdapter.__init__(self, *args, **kwargs)
         self.file_path = config.conf("TINY_PATH", "db.json")
         self.storage = config.conf("TINY_STORAGE", "json")
+        self.cache = config.conf("TINY_CACHE", False, cast = bool)
+        self.cache_size = config.conf("TINY_CACHE_SIZE", 1000, cast = int)
+        self.cache_interval = config.conf("TINY_CACHE_INTERVAL", None, cast = float)
         self.file_path = kwargs.get("file_path", self.file_path)
+        self.cache = kwargs.get("cache", self.cache)
+        self.cache_size = kwargs.get("cache_size", self.cache_size)
+        self.cache_interval = kwargs.get("cache_interval", self.cache_interval)
         self._db = None
+        self._indexes = dict()
+        self._atexit = False
 
     def collection(self, name, *args, **kwargs):
         db = self.get_db()
@@ -193,12 +207,67 @@ class TinyAdapter(DataAdapter):
         else: db.purge_tables()
         db.close()
         self._db = None
+        self._indexes.clear()
         method = getattr(self, "_drop_db_%s" % self.storage)
         method()
 
+    def flush(self):
+        # in case there's no database currently loaded or the storage
+        # is not buffered (no caching) there's nothing to be flushed
+        if self._db == None: return
+        storage = getattr(self._db, "storage", None) or self._db._storage
+        if not hasattr(storage, "flush"): return
+        storage.flush()
+
     def _get_db_json(self):
         import tinydb
-        return tinydb.TinyDB(self.file_path)
+        if not self.cache: return tinydb.TinyDB(self.file_path)
+
+        # creates the write behind (caching) storage that buffers the
+        # write operations in memory, flushing them to the file once
+        # the number of writes is reached or the time interval elapses
+        # after the first buffered write (from a timer thread), and
+        # registers the flush operation to be run at exit (only once per
+        # adapter, as the database may be re-created multiple times)
+        storage = self._caching_storage()
+        if not self._atexit: atexit.register(self.flush); self._atexit = True
+        return tinydb.TinyDB(self.file_path, storage = storage)
+
+    def _caching_storage(self):
+        import tinydb.storages
+        import tinydb.middlewares
+
+        size = self.cache_size
+        interval = self.cache_interval
+
+        class CachingMiddleware(tinydb.middlewares.CachingMiddleware):
+
+            WRITE_CACHE_SIZE = size
+
+            def __init__(self, *args, **kwargs):
+                tinydb.middlewares.CachingMiddleware.__init__(self, *args, **kwargs)
+                self._timer = None
+                self._lock = threading.RLock()
+
+            def write(self, data):
+                with self._lock:
+                    # buffers the write and, in case there's an interval
+                    # defined and no flush is scheduled, schedules one so
+                    # that the buffered writes are never kept for longer
+                    # than the interval (even if no other write arrives)
+                    tinydb.middlewares.CachingMiddleware.write(self, data)
+                    if not interval or self._timer: return
+                    self._timer = threading.Timer(interval, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+            def flush(self):
+                with self._lock:
+                    if self._timer: self._timer.cancel()
+                    self._timer = None
+                    tinydb.middlewares.CachingMiddleware.flush(self)
+
+        return CachingMiddleware(tinydb.storages.JSONStorage)
 
     def _get_db_memory(self):
         import tinydb
@@ -230,15 +299,24 @@ class Collection(object):
     def insert(self, *args, **kwargs):
         raise exceptions.NotImplementedError()
 
+    def insert_many(self, *args, **kwargs):
+        raise exceptions.NotImplementedError()
+
     def update(self, *args, **kwargs):
         raise exceptions.NotImplementedError()
 
+    def bulk_update(self, *args, **kwargs):
+        raise exceptions.NotImplementedError()
+
     def remove(self, *args, **kwargs):
         raise exceptions.NotImplementedError()
 
     def count(self, *args, **kwargs):
         raise exceptions.NotImplementedError()
 
+    def count_estimated(self, *args, **kwargs):
+        raise exceptions.NotImplementedError()
+
     def ensure_index(self, *args, **kwargs):
         raise exceptions.NotImplementedError()
 
@@ -282,10 +360,18 @@ class MongoCollection(Collection):
         self.log("insert", *args, **kwargs)
         return mongodb._store_insert(self._base, *args, **kwargs)
 
+    def insert_many(self, *args, **kwargs):
+        self.log("insert_many", *args, **kwargs)
+        return mongodb._store_insert_many(self._base, *args, **kwargs)
+
     def update(self, *args, **kwargs):
         self.log("update", *args, **kwargs)
         return mongodb._store_update(self._base, *args, **kwargs)
 
+    def bulk_update(self, *args, **kwargs):
+        self.log("bulk_update", *args, **kwargs)
+        return mongodb._store_bulk_update(self._base, *args, **kwargs)
+
     def remove(self, *args, **kwargs):
         self.log("remove", *args, **kwargs)
         return mongodb._store_remove(self._base, *args, **kwargs)
@@ -294,6 +380,10 @@ class MongoCollection(Collection):
         self.log("count", *args, **kwargs)
         return mongodb._count(self._base, *args, **kwargs)
 
+    def count_estimated(self, *args, **kwargs):
+        self.log("count_estimated", *args, **kwargs)
+        return mongodb._count_estimated(self._base, *args, **kwargs)
+
     def ensure_index(self, *args, **kwargs):
         self.log("ensure_index", *args, **kwargs)
         direction = kwargs.pop("direction", True)
@@ -319,6 +409,10 @@ class MongoCollection(Collection):
 
 class TinyCollection(Collection):
 
+    _get_many = True
+    """ If the multiple document get of the table (tinydb >= 4.8)
+    is still considered available, disabled on the first failure """
+
     def __init__(self, owner, name, base):
         Collection.__init__(self, owner, name)
         self._base = base
@@ -326,15 +420,13 @@ class TinyCollection(Collection):
     def find(self, *args, **kwargs):
         self.log("find", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
-        condition = self._to_condition(filter)
-        results = self._base.search(condition)
+        results = self._search(filter)
         return self._to_results(results, kwargs)
 
     def find_one(self, *args, **kwargs):
         self.log("find_one", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
-        condition = self._to_condition(filter)
-        results = self._base.search(condition)
+        results = self._search(filter)
         results = self._to_results(results, kwargs)
         return results[0] if results else None
 
@@ -343,8 +435,8 @@ class TinyCollection(Collection):
         filter = args[0] if len(args) > 0 else dict()
         modification = args[1] if len(args) > 1 else dict()
         create = kwargs.get("new", False)
-        condition = self._to_condition(filter)
-        object = self._base.get(condition)
+        results = self._search(filter)
+        object = results[0] if results else None
         found = True if object else False
         if not found and not create:
             raise exceptions.OperationalError("No object found")
@@ -359,45 +451,166 @@ class TinyCollection(Collection):
         object = args[0] if len(args) > 0 else dict()
         has_id = "_id" in object
         if not has_id: object["_id"] = self._id()
-        self._base.insert(object)
+        doc_id = self._base.insert(object)
+        self._index_add(doc_id, object)
         return object
 
+    def insert_many(self, *args, **kwargs):
+        self.log("insert_many", *args, **kwargs)
+        objects = args[0] if len(args) > 0 else []
+        for object in objects:
+            has_id = "_id" in object
+            if not has_id: object["_id"] = self._id()
+        doc_ids = self._base.insert_multiple(objects)
+        for doc_id, object in zip(doc_ids, objects): self._index_add(doc_id, object)
+        return objects
+
     def update(self, *args, **kwargs):
         self.log("update", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
         updater = args[1] if len(args) > 1 else dict()
-        condition = self._to_condition(filter)
         object = updater.get("$set", dict())
-        return self._base.update(object, condition)
+        documents = self._search(filter)
+        if not documents: return []
+        doc_ids = [document.doc_id for document in documents]
+        result = self._base.update(object, doc_ids = doc_ids)
+
+        # applies the same changes to the (copied) documents that have
+        # been retrieved so that they may be re-indexed without the need
+        # to read them again from the storage
+        for document in documents:
+            document.update(object)
+            self._index_remove(document.doc_id)
+            self._index_add(document.doc_id, document)
+        return result
+
+    def bulk_update(self, *args, **kwargs):
+        self.log("bulk_update", *args, **kwargs)
+        updates = args[0] if len(args) > 0 else []
+
+        # reads a single snapshot of the table and applies every update
+        # (by order) to the snapshot documents, so that each filter sees
+        # the changes of the previous ones, accumulating the changes that
+        # are going to be written per document identifier
+        snapshot = dict((document.doc_id, document) for document in self._base.all())
+        changes = dict()
+        for filter, updater in updates:
+            object = updater.get("$set", dict())
+            doc_ids = self._candidates(filter)
+            if doc_ids == None: doc_ids = snapshot.keys()
+            else: doc_ids = sorted(doc_ids | set(changes))
+            for doc_id in doc_ids:
+                document = snapshot.get(doc_id, None)
+                if not document or not _matches(document, filter): continue
+                document.update(object)
+                changes.setdefault(doc_id, dict()).update(object)
+        if not changes: return []
+
+        # writes the complete set of changes in a single table operation
+        # (one read and one write of the storage) and then re-indexes
+        # each of the changed documents using the updated snapshot
+        changes_id = dict(
+            (snapshot[doc_id]["_id"], change) for doc_id, change in legacy.iteritems(changes)
+        )
+        def transform(document): document.update(changes_id[document["_id"]])
+        result = self._base.update(transform, doc_ids = list(changes.keys()))
+        for doc_id in changes:
+            self._index_remove(doc_id)
+            self._index_add(doc_id, snapshot[doc_id])
+        return result
 
     def remove(self, *args, **kwargs):
         self.log("remove", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
-        condition = self._to_condition(filter)
-        return self._base.remove(condition)
+        doc_ids = [document.doc_id for document in self._search(filter)]
+        if not doc_ids: return doc_ids
+        for doc_id in doc_ids: self._index_remove(doc_id)
+        return self._base.remove(doc_ids = doc_ids)
 
     def count(self, *args, **kwargs):
         self.log("count", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
-        condition = self._to_condition(filter)
-        return self._base.count(condition)
+        if not filter: return len(self._base)
+        return len(self._search(filter))
+
+    def count_estimated(self, *args, **kwargs):
+        self.log("count_estimated", *args, **kwargs)
+        return len(self._base)
 
     def ensure_index(self, *args, **kwargs):
         self.log("ensure_index", *args, **kwargs)
+        name = args[0] if len(args) > 0 else None
+        if not legacy.is_string(name): return
+        indexes = self._indexes()
+        if name in indexes: return
+        index = TinyIndex(name)
+        for document in self._base.all(): index.add(document.doc_id, document)
+        indexes[name] = index
 
     def drop_indexes(self, *args, **kwargs):
         self.log("drop_indexes", *args, **kwargs)
-
-    def _to_condition(self, filter):
-        import tinydb
-        query = tinydb.Query()
-        condition = query._id.exists()
+        self._indexes().clear()
+
+    def _search(self, filter):
+        # tries to use the in memory indexes of the collection to
+        # reduce the set of candidate documents for the filter, the
+        # resulting set is a super set of the matching documents
+        doc_ids = self._candidates(filter)
+
+        # retrieves the candidate documents, either the complete set
+        # of documents (full scan) or the ones selected by the indexes
+        # (with a single read of the table) and then filters them using
+        # the complete filter
+        if doc_ids == None: documents = self._base.all()
+        elif not doc_ids: documents = []
+        else: documents = self._documents(sorted(doc_ids))
+        return [
+            document for document in documents\
+            if document and _matches(document, filter)
+        ]
+
+    def _documents(self, doc_ids):
+        # uses the multiple document get of the table in case it's
+        # available (tinydb >= 4.8), otherwise falls back to a single
+        # read of the complete table filtered by the document ids
+        if TinyCollection._get_many:
+            try: return self._base.get(doc_ids = doc_ids)
+            except TypeError: TinyCollection._get_many = False
+        doc_ids = set(doc_ids)
+        return [
+            document for document in self._base.all()\
+            if document.doc_id in doc_ids
+        ]
+
+    def _candidates(self, filter):
+        indexes = self._indexes()
+        if not indexes: return None
+        candidates = None
         for name, value in legacy.iteritems(filter):
             if name.startswith("$"): continue
-            query = tinydb.Query()
-            _condition = getattr(query, name).__eq__(value)
-            condition &= _condition
-        return condition
+            index = indexes.get(name, None)
+            if not index: continue
+            doc_ids = index.lookup(value)
+            if doc_ids == None: continue
+            if candidates == None: candidates = doc_ids
+            else: candidates = candidates & doc_ids
+        return candidates
+
+    def _indexes(self):
+        # in case the indexes of the collection are already created
+        # returns them immediately, otherwise creates the (default)
+        # identifier index, as it's used by most of the operations
+        indexes = self.owner._indexes.get(self.name, None)
+        if not indexes == None: return indexes
+        indexes = self.owner._indexes[self.name] = dict()
+        self.ensure_index("_id")
+        return indexes
+
+    def _index_add(self, doc_id, document):
+        for index in legacy.itervalues(self._indexes()): index.add(doc_id, document)
+
+    def _index_remove(self, doc_id):
+        for index in legacy.itervalues(self._indexes()): index.remove(doc_id)
 
     def _to_results(self, results, kwargs, build = True):
         sort = kwargs.get("sort", [])
@@ -405,23 +618,28 @@ class TinyCollection(Collection):
         limit = kwargs.get("limit", None)
 
         limit = None if limit == 0 else limit
-        reverse = sort[0][1] == -1 if sort else False
 
-        def sorter(value):
-            result = []
-            for item in sort: result.append(value[item[0]])
-            return tuple(result)
+        def sorter(name):
+            def _sorter(value):
+                value = _get_value(value, name)
+                if value in (None, _MISSING): return (0, None)
+                return (1, value)
+            return _sorter
 
-        if sort: results.sort(key = sorter, reverse = reverse)
-        if skip or limit: results = results[slice(skip, skip + limit, 1)]
+        for name, direction in reversed(sort or []):
+            results.sort(key = sorter(name), reverse = direction == -1)
+        if skip or limit: results = results[slice(skip, skip + limit if limit else None, 1)]
         if build: results = [dict(result) for result in results]
         return results
 
     def _to_update(self, modification, object = None):
         object = object or dict()
+        sets = modification.get("$set", {})
         increments = modification.get("$inc", {})
         mins = modification.get("$min", {})
         maxs = modification.get("$max", {})
+        for name, value in legacy.iteritems(sets):
+            object[name] = value
         for name, increment in legacy.iteritems(increments):
             value = object.get(name, 0)
             value += increment
@@ -433,3 +651,187 @@ class TinyCollection(Collection):
             value = object.get(name, 0)
             object[name] = max(value, target)
         return object
+
+class TinyIndex(object):
+    """
+    In memory index for a field of a tiny collection, keeps both
+    an hash based map (for equality and inclusion lookups) and a
+    lazily sorted sequence of the values (for range lookups).
+
+    Documents whose value is not indexable (eg: sequences) are
+    kept in a separate set that is always part of the results.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.values = dict()
+        self.keys = dict()
+        self.others = set()
+        self._sorted = None
+
+    def add(self, doc_id, document):
+        value = _get_value(document, self.name)
+        if value == _MISSING: value = None
+        if _is_hashable(value):
+            self.values.setdefault(value, set()).add(doc_id)
+            self.keys[doc_id] = value
+            self._sorted = None
+        else:
+            self.others.add(doc_id)
+
+    def remove(self, doc_id):
+        self.others.discard(doc_id)
+        if not doc_id in self.keys: return
+        value = self.keys.pop(doc_id)
+        doc_ids = self.values.get(value, set())
+        doc_ids.discard(doc_id)
+        if doc_ids: return
+        del self.values[value]
+        self._sorted = None
+
+    def lookup(self, value):
+        """
+        Retrieves the set of document identifiers that may match the
+        provided filter value, in case the index is not able to handle
+        the filter value an invalid value is returned (full scan).
+
+        :type value: Object
+        :param value: The filter value for the field of the index,
+        either a plain value (equality) or an operators map.
+        :rtype: Set
+        :return: The super set of the identifiers of the documents that
+        match the filter value or an invalid value.
+        """
+
+        is_operators = isinstance(value, dict) and value and\
+            all(key.startswith("$") for key in value)
+        if not is_operators: return self._lookup_values([value])
+
+        doc_ids = None
+        for operator, target in legacy.iteritems(value):
+            if operator == "$eq": _doc_ids = self._lookup_values([target])
+            elif operator == "$in": _doc_ids = self._lookup_values(target)
+            elif operator in ("$gt", "$gte", "$lt", "$lte"):
+                _doc_ids = self._lookup_range(operator, target)
+            else: _doc_ids = None
+            if _doc_ids == None: continue
+            if doc_ids == None: doc_ids = _doc_ids
+            else: doc_ids = doc_ids & _doc_ids
+        return doc_ids
+
+    def _lookup_values(self, values):
+        if not isinstance(values, (list, tuple, set)): return None
+        if not all(_is_hashable(value) for value in values): return None
+        doc_ids = set(self.others)
+        for value in values: doc_ids.update(self.values.get(value, ()))
+        return doc_ids
+
+    def _lookup_range(self, operator, target):
+        keys = self._get_sorted()
+        if keys == None: return None
+        try:
+            if operator == "$gt": keys = keys[bisect.bisect_right(keys, target):]
+            elif operator == "$gte": keys = keys[bisect.bisect_left(keys, target):]
+            elif operator == "$lt": keys = keys[:bisect.bisect_left(keys, target)]
+            else: keys = keys[:bisect.bisect_right(keys, target)]
+        except TypeError:
+            return None
+        doc_ids = set(self.others)
+        for key in keys: doc_ids.update(self.values[key])
+        return doc_ids
+
+    def _get_sorted(self):
+        if not self._sorted == None: return self._sorted or None
+        try: self._sorted = sorted(key for key in self.values if not key == None)
+        except TypeError: self._sorted = []
+        return self._sorted or None
+
+_MISSING = object()
+""" Sentinel value used to represent a field that is not
+present in a document (different from an unset value) """
+
+def _get_value(document, name):
+    value = document
+    for part in name.split("."):
+        if not isinstance(value, dict) or not part in value: return _MISSING
+        value = value[part]
+    return value
+
+def _is_hashable(value):
+    if isinstance(value, (dict, list, tuple, set)): return False
+    try: hash(value)
+    except TypeError: return False
+    return True
+
+def _equals(value, target):
+    if value == _MISSING: value = None
+    if isinstance(value, list) and not isinstance(target, list):
+        return target in value
+    return value == target
+
+def _compare(value, target, comparator):
+    if value in (None, _MISSING): return False
+    values = value if isinstance(value, list) else [value]
+    for value in values:
+        try:
+            if comparator(value, target): return True
+        except TypeError:
+            pass
+    return False
+
+def _regex(value, target, options):
+    flags = re.IGNORECASE if "i" in (options or "") else 0
+    values = value if isinstance(value, list) else [value]
+    for value in values:
+        if not legacy.is_string(value): continue
+        if re.search(target, value, flags): return True
+    return False
+
+TINY_OPERATORS = {
+    "$eq" : lambda v, t, o: _equals(v, t),
+    "$ne" : lambda v, t, o: not _equals(v, t),
+    "$in" : lambda v, t, o: any(_equals(v, _t) for _t in t),
+    "$nin" : lambda v, t, o: not any(_equals(v, _t) for _t in t),
+    "$gt" : lambda v, t, o: _compare(v, t, lambda a, b: a > b),
+    "$gte" : lambda v, t, o: _compare(v, t, lambda a, b: a >= b),
+    "$lt" : lambda v, t, o: _compare(v, t, lambda a, b: a < b),
+    "$lte" : lambda v, t, o: _compare(v, t, lambda a, b: a <= b),
+    "$regex" : lambda v, t, o: _regex(v, t, o),
+    "$all" : lambda v, t, o: isinstance(v, list) and all(_t in v for _t in t),
+    "$exists" : lambda v, t, o: (not v == _MISSING) == bool(t),
+    "$size" : lambda v, t, o: isinstance(v, list) and len(v) == t
+}
+""" The map associating the (mongo compatible) query operators
+with the functions that evaluate them for a document value, the
+functions receive the value, the target and the options """
+
+def _matches(document, filter):
+    for name, value in legacy.iteritems(filter):
+        if name == "$and":
+            if not all(_matches(document, _filter) for _filter in value): return False
+        elif name == "$or":
+            if not any(_matches(document, _filter) for _filter in value): return False
+        elif name == "$nor":
+            if any(_matches(document, _filter) for _filter in value): return False
+        elif name.startswith("$"):
+            continue
+        elif not _matches_value(_get_value(document, name), value):
+            return False
+    return True
+
+def _matches_value(value, target):
+    is_operators = isinstance(target, dict) and target and\
+        all(key.startswith("$") for key in target)
+    if not is_operators: return _equals(value, target)
+    options = target.get("$options", None)
+    for operator, _target in legacy.iteritems(target):
+        if operator == "$options": continue
+        if operator == "$not":
+            if _matches_value(value, _target): return False
+            continue
+        method = TINY_OPERATORS.get(operator, None)
+        if not method: raise exceptions.OperationalError(
+            "Operator '%s' not supported" % operator
+        )
+        if not method(value, _target, options): return False
+    return True
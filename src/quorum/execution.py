@@ -38,12 +38,19 @@ __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
 import time
+import json
+import uuid
 import heapq
+import importlib
 import calendar
+import itertools
+import collections
 import datetime
 import threading
 
 from . import log
+from . import legacy
+from . import exceptions
 
 BACKGROUND = []
 """ The list containing the various global registered
@@ -51,10 +58,26 @@ functions to be executed as background operations, note
 that only the name is used in the list so a possible
 collision of tasks is possible """
 
-SLEEP_TIME = 0.5
-""" The amount of time to sleep between iteration
-this amount should be small enough to provide some
-resolution level to the schedule execution """
+SLEEP_TIME = None
+""" The maximum amount of time to block waiting for
+new work when there's no work due, an invalid value
+means that the thread blocks until it's notified """
+
+POLL_TIME = 1.0
+""" The maximum amount of time (in seconds) between consecutive
+polls of the job backend, for the claiming of persistent work """
+
+BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0, 60.0, None)
+""" The upper bounds (in seconds) of the buckets of the histogram
+of durations kept for each callable, the last (invalid) bound
+represents the bucket for every larger duration """
+
+QUEUES = dict(
+    default = dict(priority = 0, concurrency = None)
+)
+""" The map associating the name of the execution queues with
+their definition (priority and concurrency limit), the work of
+queues with higher priority is executed first by the workers """
 
 background_t = None
 """ The background execution task to be started by
@@ -66,6 +89,10 @@ class ExecutionThread(threading.Thread):
     "callables" for a provided time, this thread contains
     a series of thread safe method for operating over
     the work tuples.
+
+    In case a pool of workers is defined this thread acts
+    only as a scheduler, dispatching the due work to the
+    (named) queues that are consumed by the workers.
     """
 
     run_flag = True
@@ -82,9 +109,63 @@ class ExecutionThread(threading.Thread):
     """ The lock that control the access to the list of
     work to be executed """
 
-    def __init__(self):
+    work_condition = None
+    """ The condition (associated with the work lock) used
+    to block the thread until new work is inserted or the
+    next work in the list is due for execution """
+
+    work_index = None
+    """ The counter used to generate the sequence index of each
+    inserted work, ensuring insertion order for the same time """
+
+    workers = []
+    """ The list of worker threads that consume the work from the
+    ready queues, in case it's empty the work is executed by the
+    execution thread itself (in sequence) """
+
+    ready = {}
+    """ The map associating the name of each queue with the sequence
+    of work that is due and ready to be executed by the workers """
+
+    running = {}
+    """ The map associating the name of each queue with the number
+    of works of the queue currently being executed by the workers """
+
+    ready_condition = None
+    """ The condition that controls the access to the ready queues
+    and that is used to notify the workers of new ready work """
+
+    metrics_map = {}
+    """ The map associating the name of each executed callable with
+    its metrics (runs, errors, durations and schedule lag) """
+
+    metrics_lock = None
+    """ The lock that controls the access to the metrics map """
+
+    backend = None
+    """ The (persistent) job backend from which the work shared
+    among processes is claimed, if any """
+
+    identifier = None
+    """ The unique identifier of the thread, used as the owner
+    of the jobs claimed from the backend """
+
+    claimed = False
+    """ Flag indicating if the last poll of the backend has claimed
+    as many jobs as the free capacity (or if new jobs have been pushed),
+    meaning that the backend should be polled again without waiting """
+
+    def __init__(self, workers = 0, backend = None):
         """
         Constructor of the class.
+
+        :type workers: int
+        :param workers: The number of worker threads to be used for
+        the execution of the work, in case the value is zero the work
+        is executed in sequence by the execution thread.
+        :type backend: JobBackend
+        :param backend: The persistent job backend to be used for the
+        storage and claiming of the jobs (shared among processes).
         """
 
         threading.Thread.__init__(self, name = "Execution")
@@ -92,6 +173,21 @@ class ExecutionThread(threading.Thread):
         self.daemon = True
         self.work_list = []
         self.work_lock = threading.RLock()
+        self.work_condition = threading.Condition(self.work_lock)
+        self.work_index = itertools.count()
+        self.ready = {}
+        self.running = {}
+        self.ready_condition = threading.Condition(threading.RLock())
+        self.workers = [ExecutionWorker(self, index) for index in range(workers)]
+        self.metrics_map = {}
+        self.metrics_lock = threading.RLock()
+        self.backend = backend
+        self.identifier = str(uuid.uuid4())
+        self.claimed = False
+
+    def start(self):
+        threading.Thread.start(self)
+        for worker in self.workers: worker.start()
 
     def run(self):
         # iterates continuously (executing work)
@@ -106,12 +202,16 @@ class ExecutionThread(threading.Thread):
             # of work and execute it
             self.work_lock.acquire()
 
-            # retrieves the current time, this variable
-            # is going to be used to check if the work in
-            # iteration should be run or not
-            current_time = time.time()
-
             try:
+                # blocks the thread until the next work is due
+                # or until new work is inserted (notification)
+                self.wait_work()
+
+                # retrieves the current time, this variable
+                # is going to be used to check if the work in
+                # iteration should be run or not
+                current_time = time.time()
+
                 # iterates continuously to execute all the
                 # work that can be executed in the work list
                 while True:
@@ -122,9 +222,9 @@ class ExecutionThread(threading.Thread):
                     # retrieves the current work tuple to
                     # be used and executes it in case the
                     # time has passed (should be executed)
-                    _time, callable, callback, args, kwargs = self.work_list[0]
-                    if _time < current_time:
-                        execution_list.append((callable, callback, args, kwargs))
+                    _time, _index, callable, callback, args, kwargs, queue = self.work_list[0]
+                    if _time <= current_time:
+                        execution_list.append((callable, callback, args, kwargs, queue, _time))
                         heapq.heappop(self.work_list)
                     else:
                         break
@@ -133,42 +233,366 @@ class ExecutionThread(threading.Thread):
                 # to the work list
                 self.work_lock.release()
 
+            # in case there's a job backend defined tries to claim the
+            # due jobs from it, adding them to the list of execution
+            if self.backend: execution_list.extend(self.claim())
+
+            # in case there are workers available the due work is
+            # dispatched to the ready queues (to be executed by them)
+            # and the loop continues immediately (scheduler only)
+            if self.workers: self.dispatch(execution_list); continue
+
             # iterates over all the "callables" in the execution
             # list to execute their operations
-            for callable, callback, args, kwargs in execution_list:
-                # sets the initial (default) value for the error
-                # variable that controls the result of the execution
-                error = None
-
-                # executes the "callable" and logs the error in case the
-                # execution fails (must be done to log the error) then
-                # sets the error flag with the exception variable
-                try:
-                    callable(*args, **kwargs)
-                except Exception as exception:
-                    error = exception
-                    log.warning(str(exception), log_trace = True)
+            for callable, callback, args, kwargs, _queue, _time in execution_list:
+                self.execute(callable, callback, args, kwargs, target_time = _time)
 
-                # calls the callback method with the currently set error
-                # in order to notify the runtime about the problem, only
-                # calls the callback in case such method is defined
-                callback and callback(error = error)
+    def stop(self):
+        self.work_lock.acquire()
+        try:
+            self.run_flag = False
+            self.work_condition.notify_all()
+        finally:
+            self.work_lock.release()
+        self.ready_condition.acquire()
+        try: self.ready_condition.notify_all()
+        finally: self.ready_condition.release()
+
+    def execute(self, callable, callback, args, kwargs, target_time = None):
+        # sets the initial (default) value for the error
+        # variable that controls the result of the execution
+        error = None
+
+        # executes the "callable" and logs the error in case the
+        # execution fails (must be done to log the error) then
+        # sets the error flag with the exception variable
+        start = time.time()
+        try:
+            callable(*args, **kwargs)
+        except Exception as exception:
+            error = exception
+            log.warning(str(exception), log_trace = True)
+
+        # records the metrics of the execution, including the lag
+        # between the target time and the effective start time
+        duration = time.time() - start
+        lag = start - target_time if target_time else 0.0
+        self.record(callable, duration, lag, error = error)
+
+        # calls the callback method with the currently set error
+        # in order to notify the runtime about the problem, only
+        # calls the callback in case such method is defined
+        callback and callback(error = error)
+
+    def record(self, callable, duration, lag, error = None):
+        name = callable_name(callable)
+        self.metrics_lock.acquire()
+        try:
+            metrics = self.metrics_map.get(name, None)
+            if not metrics: metrics = self.metrics_map[name] = dict(
+                runs = 0,
+                errors = 0,
+                duration = 0.0,
+                duration_max = 0.0,
+                lag = 0.0,
+                lag_max = 0.0,
+                histogram = [0] * len(BUCKETS),
+                last = None
+            )
+            metrics["runs"] += 1
+            metrics["errors"] += 1 if error else 0
+            metrics["duration"] += duration
+            metrics["duration_max"] = max(metrics["duration_max"], duration)
+            metrics["lag"] += lag
+            metrics["lag_max"] = max(metrics["lag_max"], lag)
+            metrics["last"] = time.time()
+            for index, bucket in enumerate(BUCKETS):
+                if not bucket == None and duration > bucket: continue
+                metrics["histogram"][index] += 1
+                break
+        finally:
+            self.metrics_lock.release()
 
-            # sleeps for a while so that the process may
-            # released for different tasks
-            time.sleep(SLEEP_TIME)
+    def metrics(self):
+        """
+        Retrieves a snapshot of the metrics of the execution, both the
+        current state of the scheduler (pending, ready and running work)
+        and the accumulated metrics of each of the executed callables.
 
-    def stop(self):
-        self.run_flag = False
+        :rtype: Dictionary
+        :return: The map containing the metrics of the execution, ready
+        to be serialized (eg: as JSON).
+        """
+
+        self.work_lock.acquire()
+        try:
+            pending = len(self.work_list)
+            next_time = self.work_list[0][0] - time.time() if self.work_list else None
+        finally:
+            self.work_lock.release()
+
+        self.ready_condition.acquire()
+        try:
+            ready = dict((queue, len(items)) for queue, items in self.ready.items())
+            running = dict(self.running)
+        finally:
+            self.ready_condition.release()
+
+        callables = {}
+        self.metrics_lock.acquire()
+        try:
+            for name, metrics in self.metrics_map.items():
+                runs = metrics["runs"]
+                _metrics = dict(metrics)
+                _metrics["duration_avg"] = metrics["duration"] / runs
+                _metrics["lag_avg"] = metrics["lag"] / runs
+                _metrics["histogram"] = dict(
+                    ("+inf" if bucket == None else str(bucket), count)\
+                    for bucket, count in zip(BUCKETS, metrics["histogram"])
+                )
+                callables[name] = _metrics
+        finally:
+            self.metrics_lock.release()
+
+        return dict(
+            pending = pending,
+            next_time = next_time,
+            ready = ready,
+            running = running,
+            workers = len(self.workers),
+            runs = sum(metrics["runs"] for metrics in callables.values()),
+            errors = sum(metrics["errors"] for metrics in callables.values()),
+            lag_max = max([metrics["lag_max"] for metrics in callables.values()] or [0.0]),
+            callables = callables
+        )
+
+    def claim(self):
+        # tries to claim as many jobs as the free capacity of the workers
+        # from the backend (none while there's work waiting to be run),
+        # converting them into work tuples to be executed as local work,
+        # this avoids holding leases for jobs that can not be started
+        execution_list = []
+        count = self.capacity()
+        for _index in range(count):
+            try: job = self.backend.claim(self.identifier)
+            except Exception as exception:
+                log.warning(str(exception), log_trace = True)
+                break
+            if not job: break
+            execution_list.append(self.job_work(job))
+
+        # updates the claimed flag so that the backend is polled
+        # again immediately in case there may be more jobs due, if
+        # the capacity is exhausted the thread backs off instead
+        self.claimed = True if count and len(execution_list) == count else False
+        return execution_list
+
+    def capacity(self):
+        # in case there are no workers the work is run in sequence by
+        # the execution thread, so one job may be claimed at a time
+        if not self.workers: return 1
+
+        # the free capacity is the number of workers that are neither
+        # running work nor have work waiting for them in the ready queues
+        self.ready_condition.acquire()
+        try:
+            ready = sum(len(items) for items in self.ready.values())
+            running = sum(self.running.values())
+        finally:
+            self.ready_condition.release()
+        return max(len(self.workers) - ready - running, 0)
+
+    def job_work(self, job):
+        backend = self.backend
+
+        def callable(*args, **kwargs):
+            method = resolve_callable(job["name"])
+            return method(*args, **kwargs)
 
-    def insert_work(self, callable, args = [], kwargs = {}, target_time = None, callback = None):
+        def callback(error = None):
+            try:
+                if error: backend.fail(job)
+                else: backend.complete(job)
+            except Exception as exception:
+                log.warning(str(exception), log_trace = True)
+
+        callable._name = job["name"]
+        return (
+            callable,
+            callback,
+            job["args"],
+            job["kwargs"],
+            job["queue"],
+            job["target_time"]
+        )
+
+    def dispatch(self, execution_list):
+        if not execution_list: return
+        self.ready_condition.acquire()
+        try:
+            for callable, callback, args, kwargs, queue, _time in execution_list:
+                ready = self.ready.setdefault(queue, collections.deque())
+                ready.append((callable, callback, args, kwargs, _time))
+            self.ready_condition.notify_all()
+        finally:
+            self.ready_condition.release()
+
+    def next_ready(self):
+        # iterates over the complete set of queues with ready work in
+        # descending order of priority, selecting the first one that has
+        # not reached its concurrency limit, note that this method must
+        # be called with the ready condition acquired
+        queues = [queue for queue, ready in self.ready.items() if ready]
+        queues.sort(key = lambda queue: get_queue(queue)["priority"], reverse = True)
+        for queue in queues:
+            concurrency = get_queue(queue)["concurrency"]
+            running = self.running.get(queue, 0)
+            if concurrency and running >= concurrency: continue
+            self.running[queue] = running + 1
+            return queue, self.ready[queue].popleft()
+        return None, None
+
+    def wait_work(self):
+        # iterates while the thread is meant to be running, blocking
+        # the thread until the first work in the list is due, note
+        # that this method must be called with the work lock acquired
+        while self.run_flag:
+            # in case there may be more jobs due in the backend returns
+            # immediately so that the backend is polled again
+            if self.backend and self.claimed: break
+
+            # calculates the amount of time until the first work in
+            # the list is due, in case there's no work the thread is
+            # blocked until it's notified (new work inserted)
+            if self.work_list: timeout = self.work_list[0][0] - time.time()
+            else: timeout = SLEEP_TIME
+            if not timeout == None and timeout <= 0: break
+            if not timeout == None and SLEEP_TIME: timeout = min(timeout, SLEEP_TIME)
+            if self.backend: timeout = POLL_TIME if timeout == None else min(timeout, POLL_TIME)
+
+            # waits on the work condition for the calculated amount of
+            # time, the wait is interrupted on new work (notification),
+            # if there's a backend returns so that it's polled
+            self.work_condition.wait(timeout)
+            if self.backend: break
+
+    def insert_work(
+        self,
+        callable,
+        args = [],
+        kwargs = {},
+        target_time = None,
+        callback = None,
+        queue = None
+    ):
         target_time = target_time or time.time()
-        work = (target_time, callable, callback, args, kwargs)
+        queue = queue or "default"
+        self.work_lock.acquire()
+        try:
+            work = (target_time, next(self.work_index), callable, callback, args, kwargs, queue)
+            heapq.heappush(self.work_list, work)
+            self.work_condition.notify()
+        finally:
+            self.work_lock.release()
+
+    def insert_job(
+        self,
+        callable,
+        args = [],
+        kwargs = {},
+        target_time = None,
+        queue = None
+    ):
+        # in case there's no job backend available falls back to the
+        # (non persistent) insertion of the work in the local list
+        if not self.backend:
+            if legacy.is_string(callable): callable = resolve_callable(callable)
+            self.insert_work(
+                callable,
+                args = args,
+                kwargs = kwargs,
+                target_time = target_time,
+                queue = queue
+            )
+            return None
+
+        # converts the callable into its fully qualified name (to be
+        # resolved upon execution) and pushes the job to the backend
+        # notifying the thread so that it's claimed as soon as possible
+        name = callable if legacy.is_string(callable) else callable_name(callable)
+        identifier = self.backend.push(
+            name,
+            args = args,
+            kwargs = kwargs,
+            target_time = target_time,
+            queue = queue
+        )
         self.work_lock.acquire()
-        try: heapq.heappush(self.work_list, work)
-        finally: self.work_lock.release()
+        try:
+            self.claimed = True
+            self.work_condition.notify()
+        finally:
+            self.work_lock.release()
+        return identifier
+
+class ExecutionWorker(threading.Thread):
+    """
+    Worker thread that consumes the ready work dispatched by
+    an execution thread, selecting the work from the queue with
+    the highest priority that is under its concurrency limit.
+    """
 
-def background(timeout = None):
+    owner = None
+    """ The execution thread that owns the worker and that
+    contains the ready queues to be consumed """
+
+    def __init__(self, owner, index = 0):
+        threading.Thread.__init__(self, name = "Execution-%d" % index)
+        self.daemon = True
+        self.owner = owner
+
+    def run(self):
+        owner = self.owner
+        condition = owner.ready_condition
+
+        while owner.run_flag:
+            # waits until there's work ready to be executed that
+            # is allowed by the concurrency limits of its queue
+            condition.acquire()
+            try:
+                while owner.run_flag:
+                    queue, work = owner.next_ready()
+                    if work: break
+                    condition.wait(SLEEP_TIME)
+            finally:
+                condition.release()
+
+            # in case the execution has been stopped while waiting
+            # returns immediately (no more work to be executed)
+            if not owner.run_flag: break
+
+            # executes the work and then decrements the number of
+            # running works of the queue, notifying the other workers
+            # as they may now be able to execute work from the queue
+            try:
+                callable, callback, args, kwargs, _time = work
+                owner.execute(callable, callback, args, kwargs, target_time = _time)
+            finally:
+                condition.acquire()
+                try:
+                    owner.running[queue] -= 1
+                    condition.notify_all()
+                finally:
+                    condition.release()
+
+            # in case there's a job backend the execution thread is notified
+            # so that new jobs are claimed for the capacity that is now free
+            if owner.backend:
+                owner.work_lock.acquire()
+                try: owner.work_condition.notify()
+                finally: owner.work_lock.release()
+
+def background(timeout = None, queue = None):
 
     def decorator(function):
         _timeout = timeout or 0.0
@@ -176,7 +600,12 @@ def background(timeout = None):
         def schedule(error = None, force = False):
             if timeout == None and not force: return
             target = time.time() + _timeout
-            insert_work(function, target, schedule)
+            insert_work(
+                function,
+                target_time = target,
+                callback = schedule,
+                queue = queue
+            )
 
         # retrieves the name of the function and in
         # case the name already exists in the global
@@ -195,7 +624,62 @@ def background(timeout = None):
 
     return decorator
 
-def insert_work(callable, args = [], kwargs = {}, target_time = None, callback = None):
+def register_queue(name, priority = 0, concurrency = None):
+    """
+    Registers a new (named) execution queue, or updates an existing
+    one, with the provided priority and concurrency limit.
+
+    The priority and the concurrency limit are only relevant when a
+    pool of workers is used (the work is executed in parallel).
+
+    :type name: String
+    :param name: The name of the queue to be registered.
+    :type priority: int
+    :param priority: The priority of the queue, the work of queues with
+    higher priority is executed first when workers are available.
+    :type concurrency: int
+    :param concurrency: The maximum number of works of the queue that
+    may be executed at the same time, an invalid value means no limit.
+    """
+
+    QUEUES[name] = dict(priority = priority, concurrency = concurrency)
+
+def get_queue(name):
+    return QUEUES.get(name, None) or QUEUES["default"]
+
+def get_metrics():
+    if not background_t: return None
+    return background_t.metrics()
+
+def get_metrics_json():
+    return json.dumps(get_metrics())
+
+def resolve_callable(name):
+    # tries to import the longest module prefix of the fully qualified
+    # name and then resolves the remaining parts as attributes
+    parts = name.split(".")
+    for index in range(len(parts) - 1, 0, -1):
+        try: target = importlib.import_module(".".join(parts[:index]))
+        except ImportError: continue
+        for part in parts[index:]: target = getattr(target, part)
+        return target
+    raise exceptions.OperationalError("Invalid callable '%s'" % name)
+
+def callable_name(callable):
+    name = getattr(callable, "_name", None)
+    if name: return name
+    name = getattr(callable, "__name__", None) or callable.__class__.__name__
+    module = getattr(callable, "__module__", None)
+    return module + "." + name if module else name
+
+def insert_work(
+    callable,
+    args = [],
+    kwargs = {},
+    target_time = None,
+    callback = None,
+    queue = None
+):
     """
     Runs the provided callable (function, method, etc) in a separated
     thread context under submission of a queue system.
@@ -208,6 +692,7 @@ def insert_work(callable, args = [], kwargs = {}, target_time = None, callback =
 
         The execution is not guaranteed as the system process may be
         interrupted and resuming of the execution would not be possible.
+        For persistent (restart safe) execution use ``insert_job``.
 
     :type callable: Function
     :param callable: The callable object to be called in a separated\
@@ -225,6 +710,10 @@ def insert_work(callable, args = [], kwargs = {}, target_time = None, callback =
     :param callback: The callback function to be called upon finishing the\
     execution of the callable, in case an error (exception) on executing\
     the callback the error is passed as error argument.
+    :type queue: String
+    :param queue: The name of the (registered) queue to which the work\
+    belongs, controlling its priority and concurrency when executed by\
+    a pool of workers, if not provided the default queue is used.
     """
 
     background_t.insert_work(
@@ -232,7 +721,56 @@ def insert_work(callable, args = [], kwargs = {}, target_time = None, callback =
         args = args,
         kwargs = kwargs,
         target_time = target_time,
-        callback = callback
+        callback = callback,
+        queue = queue
+    )
+
+def insert_job(
+    callable,
+    args = [],
+    kwargs = {},
+    target_time = None,
+    queue = None
+):
+    """
+    Schedules the provided callable for execution as a persistent job,
+    stored in the configured job backend so that it survives restarts
+    and may be claimed by any of the processes of the application.
+
+    As the job is persisted the callable must be a module level function
+    (or its fully qualified name) and both the unnamed and named arguments
+    must be serializable as JSON. The execution follows an at least once
+    semantics, so the callable should be idempotent.
+
+    In case no job backend is configured the callable is inserted as
+    (non persistent) local work.
+
+    :type callable: Function
+    :param callable: The module level function (or its fully qualified\
+    name) to be executed for the job.
+    :type args: List
+    :param args: The list of unnamed argument values to be send to the\
+    callable upon execution.
+    :type kwargs: Dictionary
+    :param kwargs: The dictionary of named argument values to be send to the\
+    callable upon execution.
+    :type target_time: float
+    :param target_time: The target timestamp value for execution, in case\
+    it's not provided the current time is used as the target one.
+    :type queue: String
+    :param queue: The name of the (registered) queue to which the job\
+    belongs, controlling its priority and concurrency.
+    :rtype: String
+    :return: The identifier of the job pushed to the backend, or an\
+    invalid value in case the work has been inserted locally.
+    """
+
+    return background_t.insert_job(
+        callable,
+        args = args,
+        kwargs = kwargs,
+        target_time = target_time,
+        queue = queue
     )
 
 def interval_work(
@@ -242,16 +780,18 @@ def interval_work(
     callback = None,
     initial = None,
     interval = 60,
-    eval = None
+    eval = None,
+    queue = None
 ):
     initial = initial or (eval and eval()) or time.time()
-    composed = build_composed(callable, initial, interval, eval, callback)
+    composed = build_composed(callable, initial, interval, eval, callback, queue = queue)
     insert_work(
         composed,
         args = args,
         kwargs = kwargs,
         target_time = initial,
-        callback = callback
+        callback = callback,
+        queue = queue
     )
     return initial
 
@@ -334,7 +874,7 @@ def monthly_eval(monthday, offset, now = None):
     monthday_tuple = monthday.utctimetuple()
     return calendar.timegm(monthday_tuple)
 
-def build_composed(callable, target_time, interval, eval, callback):
+def build_composed(callable, target_time, interval, eval, callback, queue = None):
 
     def composed(*args, **kwargs):
         try:
@@ -360,17 +900,26 @@ def build_composed(callable, target_time, interval, eval, callback):
 
             # builds a new callable (composed) method taking into account the state and
             # inserts the work unit again into the queue of processing
-            composed = build_composed(callable, next_time, interval, eval, callback)
+            composed = build_composed(
+                callable,
+                next_time,
+                interval,
+                eval,
+                callback,
+                queue = queue
+            )
             insert_work(
                 composed,
                 args = args,
                 kwargs = kwargs,
                 target_time = next_time,
-                callback = callback
+                callback = callback,
+                queue = queue
             )
 
         # returns the current result from the original callable to the calling method,
         # this is the expected behavior from the scheduler point of view
         return result
 
+    composed._name = callable_name(callable)
     return composed
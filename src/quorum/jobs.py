@@ -0,0 +1,470 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Flask Quorum
+# Copyright (c) 2008-2020 Hive Solutions Lda.
+#
+# This file is part of Hive Flask Quorum.
+#
+# Hive Flask Quorum is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Flask Quorum is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Flask Quorum. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__version__ = "1.0.0"
+""" The version of the module """
+
+__revision__ = "$LastChangedRevision$"
+""" The revision number of the module """
+
+__date__ = "$LastChangedDate$"
+""" The last change date of the module """
+
+__copyright__ = "Copyright (c) 2008-2020 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+import json
+import time
+import uuid
+import threading
+
+from . import common
+from . import legacy
+from . import redisdb
+from . import exceptions
+
+LEASE_TIME = 300.0
+""" The default amount of time (in seconds) for which a claimed
+job is leased to its owner, after this period the job is considered
+abandoned (eg: crashed process) and may be claimed again """
+
+RETRIES = 3
+""" The default number of times a failed job is retried before
+being discarded from the backend """
+
+RETRY_DELAY = 60.0
+""" The base amount of time (in seconds) to wait before retrying
+a failed job, multiplied by the number of attempts (linear backoff) """
+
+class JobBackend(object):
+    """
+    Abstract persistent backend for the background execution work,
+    storing job descriptors (the name of the callable and its arguments)
+    so that they survive process restarts and are shared among the
+    multiple processes of the application.
+
+    Jobs are claimed with leases, meaning that a job claimed by an owner
+    is not visible to the other owners until the lease expires, providing
+    an at least once execution semantics.
+    """
+
+    lease = None
+    """ The amount of time (in seconds) for which a claimed job
+    is leased to its owner before being claimable again """
+
+    retries = None
+    """ The maximum number of retries for a failed job """
+
+    delay = None
+    """ The base delay (in seconds) before a failed job is retried """
+
+    def __init__(self, lease = LEASE_TIME, retries = RETRIES, delay = RETRY_DELAY):
+        self.lease = lease
+        self.retries = retries
+        self.delay = delay
+
+    def push(self, name, args = [], kwargs = {}, target_time = None, queue = None):
+        """
+        Pushes a new job descriptor to the backend, to be claimed and
+        executed (by any owner) once its target time is reached.
+
+        Both the unnamed and named arguments must be serializable as
+        JSON as they are going to be persisted in the backend.
+
+        :type name: String
+        :param name: The fully qualified name of the callable (eg:
+        ``module.function``) to be executed for the job.
+        :type args: List
+        :param args: The list of unnamed arguments for the callable.
+        :type kwargs: Dictionary
+        :param kwargs: The dictionary of named arguments for the callable.
+        :type target_time: float
+        :param target_time: The target timestamp for the execution of the
+        job, if not provided the current time is used.
+        :type queue: String
+        :param queue: The name of the queue to which the job belongs.
+        :rtype: String
+        :return: The unique identifier of the job that has been pushed.
+        """
+
+        job = dict(
+            _id = str(uuid.uuid4()),
+            name = name,
+            args = list(args),
+            kwargs = dict(kwargs),
+            queue = queue or "default",
+            target_time = target_time or time.time(),
+            lease = 0.0,
+            owner = None,
+            attempts = 0
+        )
+        self._push(job)
+        return job["_id"]
+
+    def claim(self, owner):
+        """
+        Tries to claim the next due job for the provided owner, leasing
+        it so that no other owner is able to claim it while the lease
+        is valid (atomic operation).
+
+        :type owner: String
+        :param owner: The unique identifier of the owner (process and
+        thread) that is claiming the job.
+        :rtype: Dictionary
+        :return: The descriptor of the claimed job or an invalid value
+        in case there's no job due for execution.
+        """
+
+        return self._claim(owner, time.time())
+
+    def complete(self, job):
+        self._remove(job)
+
+    def fail(self, job):
+        attempts = job.get("attempts", 1)
+        if attempts > self.retries: self._remove(job); return
+        self._retry(job, time.time() + self.delay * attempts)
+
+    def count(self):
+        raise exceptions.NotImplementedError("Missing implementation")
+
+    def clear(self):
+        raise exceptions.NotImplementedError("Missing implementation")
+
+    def _push(self, job):
+        raise exceptions.NotImplementedError("Missing implementation")
+
+    def _claim(self, owner, now):
+        raise exceptions.NotImplementedError("Missing implementation")
+
+    def _remove(self, job):
+        raise exceptions.NotImplementedError("Missing implementation")
+
+    def _retry(self, job, target_time):
+        raise exceptions.NotImplementedError("Missing implementation")
+
+    def _leased(self, job, owner, now):
+        job = dict(job)
+        job["lease"] = now + self.lease
+        job["owner"] = owner
+        job["attempts"] = job.get("attempts", 0) + 1
+        return job
+
+class MemoryBackend(JobBackend):
+    """
+    Job backend implementation that keeps the jobs in the process
+    memory, not persistent and meant to be used as a stand-in for
+    the persistent backends (eg: testing and development).
+    """
+
+    def __init__(self, *args, **kwargs):
+        JobBackend.__init__(self, *args, **kwargs)
+        self._jobs = dict()
+        self._lock = threading.RLock()
+
+    def count(self):
+        return len(self._jobs)
+
+    def clear(self):
+        self._lock.acquire()
+        try: self._jobs.clear()
+        finally: self._lock.release()
+
+    def _push(self, job):
+        self._lock.acquire()
+        try: self._jobs[job["_id"]] = dict(job)
+        finally: self._lock.release()
+
+    def _claim(self, owner, now):
+        self._lock.acquire()
+        try:
+            jobs = [job for job in legacy.values(self._jobs) if\
+                job["target_time"] <= now and job["lease"] <= now]
+            if not jobs: return None
+            job = min(jobs, key = lambda job: job["target_time"])
+            job = self._leased(job, owner, now)
+            self._jobs[job["_id"]] = job
+            return dict(job)
+        finally:
+            self._lock.release()
+
+    def _remove(self, job):
+        self._lock.acquire()
+        try:
+            _job = self._jobs.get(job["_id"], None)
+            if not _job or not _job["owner"] == job["owner"]: return
+            del self._jobs[job["_id"]]
+        finally:
+            self._lock.release()
+
+    def _retry(self, job, target_time):
+        self._lock.acquire()
+        try:
+            _job = self._jobs.get(job["_id"], None)
+            if not _job or not _job["owner"] == job["owner"]: return
+            _job.update(lease = 0.0, owner = None, target_time = target_time)
+        finally:
+            self._lock.release()
+
+class StoreBackend(JobBackend):
+    """
+    Job backend implementation that persists the jobs in a collection
+    of the currently loaded data adapter (eg: MongoDB).
+
+    Jobs are claimed using a compare and swap operation on the lease
+    value, so that only one of the concurrent owners succeeds.
+    """
+
+    name = None
+    """ The name of the collection that stores the jobs """
+
+    def __init__(self, name = "jobs", *args, **kwargs):
+        JobBackend.__init__(self, *args, **kwargs)
+        self.name = name
+
+    def count(self):
+        collection = self._get_collection()
+        return collection.count()
+
+    def clear(self):
+        collection = self._get_collection()
+        collection.remove({})
+
+    def _push(self, job):
+        collection = self._get_collection()
+        collection.insert(dict(job))
+
+    def _claim(self, owner, now):
+        # retrieves the set of candidate jobs, meaning the ones that
+        # are due and that are not leased by any owner (or for which
+        # the lease has already expired) ordered by target time
+        collection = self._get_collection()
+        candidates = collection.find(
+            {
+                "target_time" : {"$lte" : now},
+                "lease" : {"$lte" : now}
+            },
+            sort = [("target_time", 1)],
+            limit = 8
+        )
+
+        # iterates over the candidates trying to lease each of them
+        # using the current lease value as the token of the swap, if
+        # any other owner has claimed the job in the meantime the
+        # operation fails and the next candidate is tried
+        for candidate in candidates:
+            job = self._leased(candidate, owner, now)
+            try:
+                result = collection.find_and_modify(
+                    {
+                        "_id" : candidate["_id"],
+                        "lease" : candidate["lease"]
+                    },
+                    {
+                        "$set" : {
+                            "lease" : job["lease"],
+                            "owner" : job["owner"],
+                            "attempts" : job["attempts"]
+                        }
+                    }
+                )
+            except exceptions.OperationalError:
+                result = None
+            if result: return job
+
+        return None
+
+    def _remove(self, job):
+        collection = self._get_collection()
+        collection.remove({"_id" : job["_id"], "owner" : job["owner"]})
+
+    def _retry(self, job, target_time):
+        collection = self._get_collection()
+        collection.update(
+            {
+                "_id" : job["_id"],
+                "owner" : job["owner"]
+            },
+            {
+                "$set" : {
+                    "lease" : 0.0,
+                    "owner" : None,
+                    "target_time" : target_time
+                }
+            }
+        )
+
+    def _get_collection(self):
+        adapter = common.base().get_adapter()
+        return adapter.collection(self.name)
+
+class RedisBackend(JobBackend):
+    """
+    Job backend implementation backed by a Redis (compatible) connection,
+    the pending and leased jobs are kept in sorted sets (scored by target
+    time and lease expiration), the job descriptors in a hash and both
+    the owner and the number of attempts of each job in other hashes.
+
+    Every state transition of a job (claim, complete and retry) runs as
+    a server side (Lua) script, so that it's atomic and a job is never
+    lost between the sets, even if the owner fails in the middle of it.
+    """
+
+    prefix = None
+    """ The prefix to be used in every key stored in Redis """
+
+    CLAIM = """
+local now = tonumber(ARGV[1])
+local expired = redis.call("ZRANGEBYSCORE", KEYS[2], "-inf", now)
+for _, id in ipairs(expired) do
+    redis.call("ZREM", KEYS[2], id)
+    redis.call("HDEL", KEYS[4], id)
+    redis.call("ZADD", KEYS[1], now, id)
+end
+while true do
+    local id = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", now, "LIMIT", 0, 1)[1]
+    if not id then return nil end
+    redis.call("ZREM", KEYS[1], id)
+    local data = redis.call("HGET", KEYS[3], id)
+    if data then
+        redis.call("ZADD", KEYS[2], ARGV[2], id)
+        redis.call("HSET", KEYS[4], id, ARGV[3])
+        local attempts = redis.call("HINCRBY", KEYS[5], id, 1)
+        return {data, attempts}
+    end
+    redis.call("HDEL", KEYS[5], id)
+end
+"""
+    """ The script that atomically re-schedules the jobs with an
+    expired lease and moves the next due job to the leased set """
+
+    REMOVE = """
+if not (redis.call("HGET", KEYS[4], ARGV[1]) == ARGV[2]) then return 0 end
+redis.call("ZREM", KEYS[2], ARGV[1])
+redis.call("HDEL", KEYS[3], ARGV[1])
+redis.call("HDEL", KEYS[4], ARGV[1])
+redis.call("HDEL", KEYS[5], ARGV[1])
+return 1
+"""
+    """ The script that atomically removes a job, only in case it's
+    still leased to the owner that is removing it """
+
+    RETRY = """
+if not (redis.call("HGET", KEYS[4], ARGV[1]) == ARGV[2]) then return 0 end
+redis.call("ZREM", KEYS[2], ARGV[1])
+redis.call("HDEL", KEYS[4], ARGV[1])
+redis.call("HSET", KEYS[3], ARGV[1], ARGV[4])
+redis.call("ZADD", KEYS[1], ARGV[3], ARGV[1])
+return 1
+"""
+    """ The script that atomically moves a job back to the pending
+    set, only in case it's still leased to the owner retrying it """
+
+    def __init__(self, prefix = "quorum:jobs", connection = None, *args, **kwargs):
+        JobBackend.__init__(self, *args, **kwargs)
+        self.prefix = prefix
+        self._connection = connection
+        self._scripts = dict()
+
+    def count(self):
+        connection = self._get_connection()
+        return connection.hlen(self._key("jobs"))
+
+    def clear(self):
+        connection = self._get_connection()
+        connection.delete(*self._keys())
+
+    def _push(self, job):
+        connection = self._get_connection()
+        pipeline = connection.pipeline(transaction = True)
+        pipeline.hset(self._key("jobs"), job["_id"], json.dumps(job))
+        pipeline.zadd(self._key("pending"), {job["_id"] : job["target_time"]})
+        pipeline.execute()
+
+    def _claim(self, owner, now):
+        result = self._script("CLAIM")(
+            keys = self._keys(),
+            args = [repr(now), repr(now + self.lease), owner]
+        )
+        if not result: return None
+        data, attempts = result
+        job = self._leased(json.loads(legacy.str(data)), owner, now)
+        job["attempts"] = int(attempts)
+        return job
+
+    def _remove(self, job):
+        self._script("REMOVE")(
+            keys = self._keys(),
+            args = [job["_id"], job["owner"]]
+        )
+
+    def _retry(self, job, target_time):
+        owner = job["owner"]
+        job = dict(job, lease = 0.0, owner = None, target_time = target_time)
+        self._script("RETRY")(
+            keys = self._keys(),
+            args = [job["_id"], owner, repr(target_time), json.dumps(job)]
+        )
+
+    def _script(self, name):
+        script = self._scripts.get(name, None)
+        if script: return script
+        connection = self._get_connection()
+        script = self._scripts[name] = connection.register_script(getattr(self, name))
+        return script
+
+    def _key(self, name):
+        return "%s:%s" % (self.prefix, name)
+
+    def _keys(self):
+        return [
+            self._key("pending"),
+            self._key("leased"),
+            self._key("jobs"),
+            self._key("owners"),
+            self._key("attempts")
+        ]
+
+    def _get_connection(self):
+        if self._connection: return self._connection
+        self._connection = redisdb.get_connection()
+        return self._connection
+
+BACKENDS = dict(
+    memory = MemoryBackend,
+    store = StoreBackend,
+    mongo = StoreBackend,
+    redis = RedisBackend
+)
+""" The map associating the name of each of the job backends
+with the class that implements it (used for configuration) """
+
+def get_backend(name, *args, **kwargs):
+    if not name: return None
+    backend_c = BACKENDS.get(name, None)
+    if not backend_c: raise exceptions.OperationalError("Invalid job backend '%s'" % name)
+    return backend_c(*args, **kwargs)
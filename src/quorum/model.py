@@ -37,17 +37,23 @@ __copyright__ = "Copyright (c) 2008-2020 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import os
 import re
 import copy
 import math
 import json
 import types
+import base64
 import flask
+import hashlib
 import inspect
+import itertools
 import datetime
+import threading
 
 from . import util
 from . import meta
+from . import cache
 from . import common
 from . import legacy
 from . import typesf
@@ -175,6 +181,28 @@ the parameters that are considered to be dirty and that should
 be cleaned from any query operation on the data source, otherwise
 serious consequences may occur """
 
+FIND_PARAMS = DIRTY_PARAMS + (
+    "fields",
+    "eager",
+    "eager_l",
+    "fill",
+    "resolve_a",
+    "batch"
+)
+""" The complete set of names of the parameters that control the
+find operation (and its variants) and that are not part of the
+filter, to be removed when the filter is used on its own (count) """
+
+COUNT_STRATEGIES = ("exact", "estimated", "cached")
+""" The sequence containing the names of the strategies that may
+be used for the count operation of the models, exact runs a count
+over the filter, estimated uses the metadata of the collection (when
+there's no filter) and cached keeps the exact counts for a while """
+
+COUNT_TTL = 60.0
+""" The amount of time (in seconds) for which the counts of the
+cached count strategy are kept (unless invalidated by a write) """
+
 OPERATORS = {
     "eq" : None,
     "equals" : None,
@@ -237,8 +265,29 @@ INSENSITIVE = {
 values that define if an insensitive base search should be used
 instead of the "typical" sensitive search """
 
+INCREMENT_BLOCKS = dict()
+""" The map associating the process identifier and the (model and
+field) counter names with the block of values reserved by such process
+and not yet used, defined as a list with the next and the last values,
+keying by process makes blocks reserved before a fork unusable in the
+child processes (that would otherwise hand out the same values), note
+that the use of blocks gives up gapless and ordered values across
+processes, as explicit (minimum) values are only checked locally """
+
+INCREMENT_LOCK = threading.RLock()
+""" The lock that controls the access to the increment blocks so
+that the same value is never handed out to multiple threads """
+
+SETUP_LOCK = threading.RLock()
+""" The lock that controls the creation of the (per model) locks
+that serialize the setup of the models (eg: deferred setup) """
+
 BUILDERS.update(BUILDERS_META)
 
+_getattribute = object.__getattribute__
+""" Reference to the base attribute resolution method, kept at
+the module level to avoid its lookup on every attribute access """
+
 class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
     """
     Abstract model class from which all the models should
@@ -256,12 +305,38 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
     to the newly created instance, this is required for the dynamic
     addition of instance methods to models """
 
+    _cache = None
+    """ The query (second level) cache to be used for the results of
+    the find and count operations of the model, should be an instance
+    of a cache.QueryCache implementation (eg: MemoryCache) and is
+    disabled by default (opt-in), the entries are invalidated on
+    every write operation performed over the model's collection """
+
+    _count_s = "exact"
+    """ The default strategy to be used in the count operation of the
+    model (one of exact, estimated and cached), may be overridden on a
+    per call basis using the ``count_s`` named argument """
+
+    _pending = False
+    """ If the setup of the model (eg: building of indexes) is still
+    pending, meaning that it's going to be performed on first access
+    to the underlying collection (deferred setup) """
+
+    _ready = False
+    """ If the setup of the model has already been performed, note that
+    this value is set per model class (not inherited) """
+
+    _count_cache = None
+    """ The cache used by the cached count strategy, lazily created
+    for each model and invalidated on every write operation """
+
     def __init__(self, model = None, **kwargs):
         fill = kwargs.pop("fill", True)
         model = model or {}
         if fill: model = self.__class__.fill(model)
         self.__dict__["_events"] = {}
         self.__dict__["_extras"] = []
+        self.__dict__["_snapshot"] = None
         self.__dict__["model"] = model
         self.__dict__["ref"] = kwargs.pop("ref", None)
         for name, value in kwargs.items(): setattr(self, name, value)
@@ -291,16 +366,24 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         return value if is_unicode else legacy.UNICODE(value)
 
     def __getattribute__(self, name):
+        # tries to retrieve the value from the model (map) of the
+        # instance, this is the fast path for the (set) fields
         try:
-            model = object.__getattribute__(self, "model")
+            model = _getattribute(self, "model")
             if name in model: return model[name]
         except AttributeError: pass
-        cls = object.__getattribute__(self, "__class__")
-        definition = cls.definition()
-        if name in definition: raise AttributeError(
+
+        # runs the default attribute resolution and, only in case the
+        # resolved value is a dictionary (the class level definition of
+        # a field), verifies if the name refers an unset field, this
+        # avoids the definition lookup for methods and other attributes
+        value = _getattribute(self, name)
+        if not isinstance(value, dict): return value
+        cls = _getattribute(self, "__class__")
+        if name in cls.definition(): raise AttributeError(
             "attribute '%s' is not set" % name
         )
-        return object.__getattribute__(self, name)
+        return value
 
     def __setattr__(self, name, value):
         is_base = name in self.__dict__
@@ -512,25 +595,54 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         if eager_l: eager = cls._eager_b(eager)
         fields = cls._sniff(fields, rules = rules)
         collection = cls._collection()
-        model = collection.find_one(
-            kwargs,
-            fields,
-            skip = skip,
-            limit = limit,
-            sort = sort
-        )
+
+        # tries to retrieve the model from the request's identity map
+        # (first level cache) in case it's enabled and the filter is
+        # a simple one (no range or sort values are provided)
+        identity = cls._identity()
+        is_simple = not skip and not limit and not sort
+        name_i = cls._identity_name(kwargs) if identity else None
+        model = identity.get(
+            collection.name,
+            name_i,
+            kwargs[name_i],
+            fields = fields
+        ) if name_i and is_simple else None
+
+        # in case the model was not found in the identity map runs the
+        # query against the data source, storing the retrieved (raw)
+        # model in the identity map for latter usage
+        if model == None:
+            model = collection.find_one(
+                kwargs,
+                fields,
+                skip = skip,
+                limit = limit,
+                sort = sort
+            )
+            if model and identity: identity.put(
+                collection.name,
+                model,
+                name = name_i,
+                fields = fields
+            )
+
         if not model and raise_e:
             is_devel = common.is_devel()
             if is_devel: message = "%s not found for %s" % (cls.__name__, str(kwargs))
             else: message = "%s not found" % cls.__name__
             raise exceptions.NotFoundError(message)
         if not model and not raise_e: return model
+        snapshot = None if map else _snapshot(model)
         cls.types(model)
         if fill: cls.fill(model, safe = rules)
         if build: cls.build(model, map = map, rules = rules, meta = meta)
         if eager: model = cls._eager(model, eager, map = map)
         if resolve_a: model = cls._resolve_all(model, resolve = False)
-        return model if map else cls.old(model = model, safe = False)
+        if map: return model
+        model = cls.old(model = model, safe = False)
+        model._set_snapshot(snapshot)
+        return model
 
     @classmethod
     def find(cls, *args, **kwargs):
@@ -570,35 +682,176 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
 
         fields = cls._sniff(fields, rules = rules)
         collection = cls._collection()
-        models = collection.find(
+
+        # tries to retrieve the (raw) models from the query cache, in
+        # case it's enabled for the model, falling back to the data
+        # source and storing the result in the cache on a miss
+        key = cls._cache_key("find", kwargs, fields, skip, limit, sort)
+        models = cls._cache.get(collection.name, key) if key else None
+        if models == None:
+            models = collection.find(
+                kwargs,
+                fields,
+                skip = skip,
+                limit = limit,
+                sort = sort
+            )
+            if key:
+                models = list(models)
+                cls._cache.set(collection.name, key, models)
+
+        # in case the identity map is enabled stores the complete set of
+        # retrieved (raw) models in it so that further retrievals of the
+        # same entities do not require access to the data source
+        identity = cls._identity()
+        if identity:
+            models = list(models)
+            name_i = cls._identity_name(kwargs, multiple = len(models) > 1)
+            for model in models: identity.put(
+                collection.name,
+                model,
+                name = name_i,
+                fields = fields
+            )
+
+        if not models and raise_e:
+            is_devel = common.is_devel()
+            if is_devel: message = "%s not found for %s" % (cls.__name__, str(kwargs))
+            else: message = "%s not found" % cls.__name__
+            raise exceptions.NotFoundError(message)
+        return cls._find_r(
+            models,
+            eager = eager,
+            map = map,
+            rules = rules,
+            meta = meta,
+            build = build,
+            fill = fill,
+            resolve_a = resolve_a
+        )
+
+    @classmethod
+    def find_iter(cls, *args, **kwargs):
+        """
+        Streaming version of the find operation that retrieves the
+        models from the data source in batches, running the complete
+        (per model) pipeline for each batch and yielding the resulting
+        models, so that memory usage is constant regardless of the
+        size of the result set (eg: exports and reports).
+
+        Both the query cache and the identity map are bypassed as they
+        would keep every retrieved model in memory.
+
+        The arguments are the same as the ones of the find operation,
+        with the extra ``batch`` argument controlling the number of
+        models retrieved and processed at a time.
+
+        :rtype: Generator
+        :return: A generator that yields the models (or maps) matching
+        the provided filter, in the same order as the find operation.
+        """
+
+        fields,\
+        eager,\
+        eager_l,\
+        map,\
+        rules,\
+        meta,\
+        build,\
+        fill,\
+        resolve_a,\
+        skip,\
+        limit,\
+        sort,\
+        batch,\
+        raise_e = cls._get_attrs(kwargs, (
+            ("fields", None),
+            ("eager", None),
+            ("eager_l", False),
+            ("map", False),
+            ("rules", True),
+            ("meta", False),
+            ("build", True),
+            ("fill", True),
+            ("resolve_a", None),
+            ("skip", 0),
+            ("limit", 0),
+            ("sort", None),
+            ("batch", 100),
+            ("raise_e", False)
+        ))
+
+        if resolve_a == None: resolve_a = map
+        if eager_l: eager = cls._eager_b(eager)
+
+        cls._find_s(kwargs)
+        cls._find_d(kwargs)
+
+        fields = cls._sniff(fields, rules = rules)
+        collection = cls._collection()
+
+        cursor = collection.find(
             kwargs,
             fields,
             skip = skip,
             limit = limit,
-            sort = sort
+            sort = sort,
+            batch_size = batch
         )
-        if not models and raise_e:
+
+        # iterates over the cursor gathering the raw models in batches
+        # and running the complete pipeline for each of the batches, the
+        # eager loading is batched at the level of each batch of models
+        empty = True
+        iterator = iter(cursor)
+        while True:
+            models = list(itertools.islice(iterator, batch))
+            if not models: break
+            empty = False
+            models = cls._find_r(
+                models,
+                eager = eager,
+                map = map,
+                rules = rules,
+                meta = meta,
+                build = build,
+                fill = fill,
+                resolve_a = resolve_a
+            )
+            for model in models: yield model
+
+        if empty and raise_e:
             is_devel = common.is_devel()
             if is_devel: message = "%s not found for %s" % (cls.__name__, str(kwargs))
             else: message = "%s not found" % cls.__name__
             raise exceptions.NotFoundError(message)
-        models = [cls.types(model) for model in models]
-        if fill: models = [cls.fill(model, safe = rules) for model in models]
-        if build: [cls.build(model, map = map, rules = rules, meta = meta) for model in models]
-        if eager: models = cls._eager(models, eager, map = map)
-        if resolve_a: models = [cls._resolve_all(model, resolve = False) for model in models]
-        models = models if map else [cls.old(model = model, safe = False) for model in models]
-        return models
 
     @classmethod
     def count(cls, *args, **kwargs):
+        # retrieves the strategy to be used for the count, defaulting
+        # to the one defined for the model, and verifies it
+        count_s = kwargs.pop("count_s", None) or cls._count_s
+        if not count_s in COUNT_STRATEGIES: raise exceptions.OperationalError(
+            "Invalid count strategy '%s'" % count_s
+        )
+
         cls._clean_attrs(kwargs)
         collection = cls._collection()
-        if kwargs:
-            result = collection.find(kwargs)
-            result = result.count()
-        else:
-            result = collection.count()
+
+        # in case the estimated strategy is requested and there's no filter
+        # the (fast) metadata based count of the collection is used
+        if count_s == "estimated" and not kwargs:
+            return collection.count_estimated()
+
+        # tries to retrieve the count from the proper cache, the count
+        # cache for the cached strategy or the query cache (if enabled)
+        cache_c = cls._count_c() if count_s == "cached" else cls._cache
+        key = cache_c.key(cls._name(), "count", kwargs) if cache_c else None
+        result = cache_c.get(collection.name, key) if key else None
+        if not result == None: return result
+        if kwargs: result = collection.count(kwargs)
+        else: result = collection.count()
+        if key: cache_c.set(collection.name, key, result)
         return result
 
     @classmethod
@@ -682,10 +935,234 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         page["query"] = generate
         return page
 
+    @classmethod
+    def paginate_keyset(cls, limit = 10, cursor = None, sort = None, count = False, *args, **kwargs):
+        """
+        Keyset (cursor based) alternative to the paginate operation
+        that uses the values of the sort keys (plus the identifier)
+        of the boundary models as the continuation token, so that the
+        cost of retrieving a page is constant regardless of its depth
+        (no skip and no count required).
+
+        The sort keys should be fields that are always set (non null),
+        the identifier is used as the final tie breaker.
+
+        :type limit: int
+        :param limit: The maximum number of models in the page.
+        :type cursor: String
+        :param cursor: The opaque continuation token as returned in
+        the next or previous values of a previous page, if not provided
+        the first page is retrieved.
+        :type sort: List
+        :param sort: The list of (name, direction) tuples defining the
+        order of the models, the identifier is always added as the last
+        sort key (in case it's not already present).
+        :type count: bool
+        :param count: If the total number of models matching the filter
+        should be counted and returned as part of the page, may also be
+        the name of the count strategy to be used (eg: cached).
+        :rtype: Dictionary
+        :return: The page structure containing the models and the next
+        and previous continuation tokens (invalid if there's no page).
+        """
+
+        # builds the complete set of sort keys for the pagination, making
+        # sure that the identifier is used as the final tie breaker
+        sort = list(sort or [])
+        names = [name for name, _direction in sort]
+        if not "_id" in names:
+            direction = sort[-1][1] if sort else 1
+            sort.append(("_id", direction))
+            names.append("_id")
+
+        # decodes the continuation token (if any) retrieving the values of
+        # the sort keys of the boundary model and the direction of the
+        # pagination (forward for next and backward for previous)
+        values, backward = cls._keyset_decode(cursor, names) if cursor else (None, False)
+
+        # counts the total number of models for the filter, before it's
+        # changed by the keyset conditions (only if requested), the filter
+        # is built as in find, without the find parameters and with the
+        # find string and definition converted into filter conditions
+        if count:
+            count_s = count if legacy.is_string(count) else None
+            filter = dict(kwargs)
+            cls._clean_attrs(filter, dirty = FIND_PARAMS)
+            cls._find_s(filter)
+            cls._find_d(filter)
+            total = cls.count(*args, count_s = count_s, **filter)
+        else:
+            total = None
+
+        # in case there are boundary values adds the keyset condition to
+        # the filter, and for backward pagination the sort is reversed
+        # so that the models before the boundary are retrieved
+        if values: cls._keyset_filter(sort, values, backward, kwargs)
+        _sort = [(name, direction * -1) for name, direction in sort] if backward else sort
+
+        # retrieves one more model than the limit to be able to determine
+        # if there's a page after the current one (in the same direction)
+        kwargs["limit"] = limit + 1
+        kwargs["sort"] = _sort
+        models = cls.find(*args, **kwargs)
+        models = list(models)
+        more = len(models) > limit
+        models = models[:limit]
+        if backward: models.reverse()
+
+        # determines the existence of both the next and the previous pages
+        # and builds the continuation tokens from the boundary models
+        has_next = (more and not backward) or (backward and bool(values))
+        has_previous = (more and backward) or (not backward and bool(values))
+        has_next = has_next and bool(models)
+        has_previous = has_previous and bool(models)
+
+        return dict(
+            models = models,
+            size = len(models),
+            limit = limit,
+            total = total,
+            next = cls._keyset_encode(models[-1], names, False) if has_next else None,
+            previous = cls._keyset_encode(models[0], names, True) if has_previous else None
+        )
+
     @classmethod
     def delete_c(cls, *args, **kwargs):
         collection = cls._collection()
         collection.remove(kwargs)
+        cls._invalidate()
+
+    @classmethod
+    def save_many(
+        cls,
+        models,
+        validate = True,
+        verify = True,
+        pre_validate = True,
+        pre_save = True,
+        pre_create = True,
+        pre_update = True,
+        post_validate = True,
+        post_save = True,
+        post_create = True,
+        post_update = True
+    ):
+        """
+        Saves (creates or updates) the provided sequence of model
+        instances using batched operations against the data source.
+
+        The semantics are the same as the ones of the save operation
+        for each of the models (including validation and events) but
+        the increment values are reserved for all of the new models
+        in a single operation and both the inserts and the updates
+        are sent to the data source in (one) bulk operation.
+
+        :type models: List
+        :param models: The sequence of model instances (of the current
+        class) that are going to be saved.
+        :type validate: bool
+        :param validate: If the validation process should be run for
+        each of the models before any of them is saved.
+        :type verify: bool
+        :param verify: If the models should be verified to be associated
+        with a concrete model (ready to be persisted).
+        :rtype: List
+        :return: The sequence of models that have just been saved.
+        """
+
+        # in case the provided sequence of models is empty there's
+        # nothing to be done and the sequence is returned immediately
+        if not models: return models
+
+        # ensures that the current class is associated with a concrete
+        # model, ready to be persisted in the database
+        if verify: cls.assert_is_concrete_g()
+
+        # separates the models that are going to be created from the
+        # ones that are going to be updated (different operations)
+        news = [model for model in models if model.is_new()]
+        olds = [model for model in models if not model.is_new()]
+        news_i = set(id(model) for model in news)
+
+        # runs the validation process and then calls the complete set of
+        # event handlers for the save operation for each of the models (in
+        # the same order as the save operation), this happens for every
+        # model before any of them is saved, so that a validation error
+        # does not leave the data source with only part of the models saved
+        for model in models:
+            is_new = id(model) in news_i
+            validate and model._validate(
+                pre_validate = pre_validate,
+                post_validate = post_validate
+            )
+            pre_save and model.pre_save()
+            pre_create and is_new and model.pre_create()
+            pre_update and not is_new and model.pre_update()
+
+        # filters the values of each of the models, the increments are
+        # not applied at this stage as they are going to be set latter
+        # using a range based reservation (single data source access)
+        news_m = [
+            model._filter(increment_a = False, normalize = True) for model in news
+        ]
+        olds_m = [
+            model._filter(
+                increment_a = False,
+                immutables_a = True,
+                normalize = True
+            ) for model in olds
+        ]
+
+        # iterates over the complete set of increment fields to set their
+        # values in the new models, the ones that already have a value set
+        # are ensured to be the minimum and for the others a range of values
+        # is reserved in a single operation and distributed by the models
+        for name in cls.increments():
+            pending = []
+            for model, _model in zip(news, news_m):
+                if name in model.model:
+                    _model[name] = cls._ensure_min(name, model.model[name])
+                else:
+                    pending.append(_model)
+            if not pending: continue
+            values = cls._increment_many(name, len(pending))
+            for _model, value in zip(pending, values): _model[name] = value
+
+        # builds the sequence of update operations for the models that
+        # already exist in the data source, only the changed (dirty) values
+        # are sent and the models without changes are ignored
+        updates = []
+        for model, _model in zip(olds, olds_m):
+            _update = model._dirty(_model); _update.pop("_id", None)
+            if not _update: continue
+            updates.append(({"_id" : _model["_id"]}, {"$set" : _update}))
+
+        # runs both the bulk insert and the bulk update operations in
+        # the data source, applying the resulting (inserted) values back
+        # into the new model instances (eg: identifier values)
+        store = cls._collection()
+        if news_m: store.insert_many(news_m)
+        if updates: store.bulk_update(updates)
+        for model, _model in zip(news, news_m): model.apply(_model, safe_a = False)
+
+        # invalidates the identity map and query cache entries of the
+        # model's collection and updates the snapshot of each of the
+        # models with the values that are now persisted
+        if news_m or updates: cls._invalidate()
+        for model, _model in zip(news + olds, news_m + olds_m):
+            model._set_snapshot(_snapshot(_model))
+
+        # calls the post save event handlers for each of the models in
+        # order to be able to execute appropriate post operations
+        for model in models:
+            is_new = id(model) in news_i
+            post_save and model.post_save()
+            post_create and is_new and model.post_create()
+            post_update and not is_new and model.post_update()
+
+        # returns the sequence of models that have just been saved, this
+        # may be used for chaining operations
+        return models
 
     @classmethod
     def ordered(cls, filter = dict):
@@ -1038,7 +1515,7 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
 
     @classmethod
     def teardown(cls):
-        pass
+        cls._increment_reset()
 
     @classmethod
     def validate(cls):
@@ -1114,13 +1591,10 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
 
     @classmethod
     def types(cls, model):
-        definition = cls.definition()
-
-        for name, value in legacy.eager(model.items()):
-            if name == "_id": continue
+        for name, caster, _default, _private, _increment in cls._load_plan():
+            value = model.get(name, None)
             if value == None: continue
-            if not name in definition: continue
-            model[name] = cls.cast(name, value)
+            model[name] = caster(value)
 
         return model
 
@@ -1143,22 +1617,11 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         """
 
         model = model or dict()
-        definition = cls.definition()
-        for name, _definition in definition.items():
+        for name, _caster, default, private, increment in cls._load_plan():
             if name in model: continue
-            if name in ("_id",): continue
-            private = _definition.get("private", False)
-            increment = _definition.get("increment", False)
             if private and safe: continue
             if increment: continue
-            if "initial" in _definition:
-                initial = _definition["initial"]
-                model[name] = initial
-            else:
-                _type = _definition.get("type")
-                default = type_d(_type, None)
-                default = _type._default() if hasattr(_type, "_default") else default
-                model[name] = default
+            model[name] = default()
 
         return model
 
@@ -1606,13 +2069,89 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         encoder = adapter.encoder()
         return encoder
 
+    @classmethod
+    def _load_plan(cls):
+        """
+        Retrieves the (compiled) load plan for the current model, a
+        flat tuple with an entry per field (except the identifier)
+        containing the name, the caster, the default factory and the
+        private and increment flags of the field.
+
+        The plan is used by both the types and fill operations so that
+        the definition of the fields is evaluated only once per model.
+
+        :rtype: Tuple
+        :return: The tuple of ``(name, caster, default_factory, private,
+        increment)`` entries for the fields of the model.
+        """
+
+        # in case the plan is already "cached" in the current
+        # class (fast retrieval) returns immediately
+        if "_plan" in cls.__dict__: return cls._plan
+
+        # iterates over the complete set of fields of the model building
+        # the plan entry for each of them, notice that the caster is built
+        # from the extended definition (as in the cast operation)
+        plan = []
+        definition = cls.definition()
+        for name, _definition in definition.items():
+            if name in ("_id",): continue
+            _definition_e = cls.definition_n(name)
+            _type = _definition_e.get("type", legacy.UNICODE)
+            caster = _caster(_type)
+            if "initial" in _definition:
+                default = _constant(_definition["initial"])
+            else:
+                default = _default(_definition.get("type"))
+            private = _definition.get("private", False)
+            increment = _definition.get("increment", False)
+            plan.append((name, caster, default, private, increment))
+
+        # saves the currently generated plan under the current class
+        # and then returns it to the caller method
+        cls._plan = tuple(plan)
+        return cls._plan
+
     @classmethod
     def _collection(cls, name = None):
+        if cls._pending: cls._ensure()
         name = name or cls._name()
         adapter = cls._adapter()
         collection = adapter.collection(name)
         return collection
 
+    @classmethod
+    def _ensure(cls):
+        # in case the setup is not pending returns immediately, this is
+        # the fast path used on every access to the collection
+        if not cls._pending: return
+
+        # acquires the setup lock of the model and checks again if the
+        # setup is still pending (it may have been performed by another
+        # thread while waiting), note that the thread running the setup
+        # may re-enter (eg: index building) and must not run it again
+        with cls._setup_lock():
+            if not cls._pending: return
+            ident = threading.current_thread().ident
+            if cls.__dict__.get("_setup_t", None) == ident: return
+            cls._setup_t = ident
+            try: cls.setup()
+            finally: cls._setup_t = None
+            cls._ready = True
+            cls._pending = False
+
+    @classmethod
+    def _is_ready(cls):
+        return cls.__dict__.get("_ready", False)
+
+    @classmethod
+    def _setup_lock(cls):
+        if "_setup_l" in cls.__dict__: return cls._setup_l
+        with SETUP_LOCK:
+            if "_setup_l" in cls.__dict__: return cls._setup_l
+            cls._setup_l = threading.RLock()
+        return cls._setup_l
+
     @classmethod
     def _name(cls):
         # retrieves the class object for the current instance and then
@@ -1661,74 +2200,98 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         """
 
         # verifies if the provided model instance is a sequence and if
-        # that's the case runs the recursive eager loading of names and
-        # returns the resulting sequence to the caller method
+        # that's not the case encapsulates it in a list so that the
+        # complete set of models is handled in the same (batched) way
         is_list = isinstance(model, (list, tuple))
-        if is_list: return [cls._eager(_model, names, *args, **kwargs) for _model in model]
+        models = model if is_list else [model]
 
         # iterates over the complete set of names that are meant to be
-        # eager loaded from the model and runs the "resolution" process
-        # for each of them so that they are properly eager loaded
+        # eager loaded from the models and runs the "resolution" process
+        # for each of their levels, note that each level is resolved for
+        # all of the models at once (one query per target model)
         for name in names:
-            _model = model
+            _models = models
             for part in name.split("."):
-                is_sequence = isinstance(_model, (list, tuple))
-                if is_sequence: _model = [cls._res(value, part, *args, **kwargs) for value in _model]
-                else: _model = cls._res(_model, part, *args, **kwargs)
-                if not _model: break
+                _models = cls._res_many(_models, part, *args, **kwargs)
+                if not _models: break
 
         # returns the resulting model to the caller method, most of the
         # times this model should have not been touched
         return model
 
     @classmethod
-    def _res(cls, model, part, *args, **kwargs):
+    def _res_many(cls, models, part, *args, **kwargs):
         """
-        Resolves a specific model part taking into account the multiple
-        possible resolution strategies.
-
-        Most of its logic will be associated with reference like types.
+        Resolves the requested part for the complete set of provided
+        models, taking into account the multiple possible resolution
+        strategies (most of its logic is associated with references).
 
-        This method will also (for map based resolution strategies) change
-        the owner model, setting its references with the resolved maps, this
-        is required as maps do not allow reference objects to exist.
+        The references found in the part of every model are resolved
+        at once, using a single query per target model, avoiding the
+        typical N + 1 queries problem of eager loading.
 
-        :type model: Dictionary
-        :param model: The model map to be used in the resolution process.
+        :type models: List
+        :param models: The sequence of model maps (or objects) to be
+        used in the resolution process.
         :type part: String
-        :param part: The name of the model's part to be resolved.
-        :rtype: Dictionary/Object
-        :return: The resolved part that may be either a map or an object
-        depending on the resolution strategy.
+        :param part: The name of the models' part to be resolved.
+        :rtype: List
+        :return: The flat sequence of resolved values for the part, to
+        be used as the models for the next level of resolution.
         """
 
-        # in case the provided is not valid returns it (no resolution is
-        # possible) otherwise gather the base value for resolution
-        if not model: return model
-        value = model[part]
-
-        # check the data type of the requested name for resolution
-        # and in case it's not valid and not a reference returns it
-        # immediately, no resolution to be performed
-        is_reference = isinstance(value, TYPE_REFERENCES)
-        if not value and not is_reference: return value
-
-        # in case the value is a reference type object then runs
-        # the resolve operation effectively resolving the values
-        # (this is considered a very expensive operation), notice
-        # that this operation is going to respect the map vs. instance
-        # kind of resolution process so the data type of the resulting
-        # value is going to depend on that
-        if is_reference: value = value.resolve(eager_l = True, *args, **kwargs)
-
-        # in case the map resolution process was requested an explicit
-        # set of the resolved value is required (implicit resolution
-        # using `resolve()`) is not enough to ensure proper type structure
-        if kwargs.get("map", False): model[part] = value
-
-        # returns the "final" (possibly resolved) value to the caller method
-        # ready to be used for possible merging processes
-        return value
+        # filters the provided models removing the invalid and the
+        # duplicated ones (shared resolved objects) and then gathers
+        # the value of the requested part for each of them
+        _models = []
+        _models_s = set()
+        for model in models:
+            if not model: continue
+            if id(model) in _models_s: continue
+            _models.append(model)
+            _models_s.add(id(model))
+        values = [model[part] for model in _models]
+
+        # collects the complete set of single reference objects that
+        # are contained in the values and runs the batched resolution
+        # for all of them (this is considered an expensive operation)
+        references = []
+        for value in values:
+            if isinstance(value, typesf.Reference): references.append(value)
+            elif isinstance(value, typesf.References): references.extend(value.objects)
+        typesf.resolve_many(references, eager_l = True, *args, **kwargs)
+
+        # creates the list that is going to hold the flat sequence of
+        # resolved values, to be used in the next level of resolution
+        resolved = []
+
+        for model, value in zip(_models, values):
+            # check the data type of the value and in case it's not valid
+            # and not a reference there's nothing to be resolved for it
+            is_reference = isinstance(value, TYPE_REFERENCES)
+            if not value and not is_reference: continue
+
+            # retrieves the (already) resolved objects for the references
+            # notice that this is not going to hit the data source as the
+            # batched resolution has already been performed
+            if isinstance(value, typesf.Reference):
+                value = value._object
+            elif isinstance(value, typesf.References):
+                value = [object._object for object in value.objects]
+
+            # in case the map resolution process was requested an explicit
+            # set of the resolved value is required to ensure proper type
+            # structure, as maps do not allow reference objects to exist
+            if kwargs.get("map", False): model[part] = value
+
+            # adds the resolved value(s) to the flat sequence of values
+            # that are going to be used in the next level
+            if isinstance(value, (list, tuple)): resolved.extend(value)
+            else: resolved.append(value)
+
+        # returns the flat sequence of resolved values to the caller
+        # method so that it may be used for the next level
+        return resolved
 
     @classmethod
     def _res_cls(cls, name):
@@ -1762,6 +2325,68 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         # leaf name that can be used to retrieve the attribute
         return cls, name_s[-1]
 
+    @classmethod
+    def _identity(cls):
+        """
+        Retrieves the identity map (first level cache) associated with
+        the current request, in case there's no request in context or
+        the identity map is not enabled an invalid value is returned.
+
+        :rtype: IdentityMap
+        :return: The identity map for the current request or an invalid
+        value in case it's not available.
+        """
+
+        if not flask.has_request_context(): return None
+        return getattr(flask.request, "identity", None)
+
+    @classmethod
+    def _identity_name(cls, kwargs, multiple = False):
+        # the identity map is only able to handle filters that are
+        # defined by a single (non operator) attribute, so for every
+        # other kind of filter an invalid name is returned
+        if not len(kwargs) == 1: return None
+        name = list(kwargs.keys())[0]
+        if name.startswith("$"): return None
+
+        # the attribute may only be used as an alias in case it's known
+        # to be unique (otherwise a lookup by the attribute could be
+        # served with the wrong document), note that a single value
+        # matching multiple documents is never used as an alias
+        if not name in cls._identity_keys(): return None
+        if multiple and not isinstance(kwargs[name], dict): return None
+        return name
+
+    @classmethod
+    def _identity_keys(cls):
+        if "_identity_k" in cls.__dict__: return cls._identity_k
+        cls._identity_k = frozenset(
+            ["_id"] + list(cls.unique_names()) + list(cls.increments())
+        )
+        return cls._identity_k
+
+    @classmethod
+    def _count_c(cls):
+        if "_count_cache" in cls.__dict__ and cls._count_cache: return cls._count_cache
+        cls._count_cache = cache.MemoryCache(ttl = COUNT_TTL)
+        return cls._count_cache
+
+    @classmethod
+    def _cache_key(cls, *args):
+        if not cls._cache: return None
+        return cls._cache.key(cls._name(), *args)
+
+    @classmethod
+    def _invalidate(cls):
+        # invalidates both the identity map (first level cache) of the
+        # current request and the query (second level) cache for the
+        # model's collection, as their values are no longer valid
+        collection = cls._collection()
+        identity = cls._identity()
+        if identity: identity.invalidate(collection.name)
+        if cls._cache: cls._cache.invalidate(collection.name)
+        if cls._count_cache: cls._count_cache.invalidate(collection.name)
+
     @classmethod
     def _get_attrs(cls, kwargs, attrs):
         _attrs = []
@@ -1783,6 +2408,78 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
             if not key in kwargs: continue
             del kwargs[key]
 
+    @classmethod
+    def _find_r(
+        cls,
+        models,
+        eager = None,
+        map = False,
+        rules = True,
+        meta = False,
+        build = True,
+        fill = True,
+        resolve_a = False
+    ):
+        # runs the complete pipeline over the provided (raw) models
+        # retrieved from the data source, converting them into the
+        # proper models (or maps) as requested by the find operation
+        snapshots = None if map else [_snapshot(model) for model in models]
+        models = [cls.types(model) for model in models]
+        if fill: models = [cls.fill(model, safe = rules) for model in models]
+        if build: [cls.build(model, map = map, rules = rules, meta = meta) for model in models]
+        if eager: models = cls._eager(models, eager, map = map)
+        if resolve_a: models = [cls._resolve_all(model, resolve = False) for model in models]
+        if map: return models
+        models = [cls.old(model = model, safe = False) for model in models]
+        for model, snapshot in zip(models, snapshots): model._set_snapshot(snapshot)
+        return models
+
+    @classmethod
+    def _keyset_encode(cls, model, names, backward):
+        values = []
+        for name in names:
+            value = model.get(name, None) if isinstance(model, dict) else model.model.get(name, None)
+            if isinstance(value, typesf.AbstractType): value = value.json_v()
+            if name == "_id": value = str(value)
+            values.append(value)
+        data = json.dumps(dict(n = names, v = values, b = backward))
+        data = base64.urlsafe_b64encode(legacy.bytes(data))
+        return legacy.str(data)
+
+    @classmethod
+    def _keyset_decode(cls, cursor, names):
+        try:
+            data = base64.urlsafe_b64decode(legacy.bytes(cursor))
+            data = json.loads(legacy.str(data))
+            _names, values, backward = data["n"], data["v"], data["b"]
+        except Exception:
+            raise exceptions.OperationalError("Invalid pagination cursor")
+        if not _names == names or not len(values) == len(names):
+            raise exceptions.OperationalError("Pagination cursor does not match sort")
+        index = names.index("_id")
+        values[index] = cls._adapter().object_id(values[index])
+        return values, backward
+
+    @classmethod
+    def _keyset_filter(cls, sort, values, backward, kwargs):
+        # builds the disjunction of conditions that selects the models
+        # strictly after (or before) the boundary in the sort order, each
+        # condition requires equality in the previous keys and a strict
+        # comparison on the current key (eg: a > x or (a == x and b > y))
+        conditions = []
+        for index, (name, direction) in enumerate(sort):
+            condition = dict(
+                (_name, value) for (_name, _direction), value in zip(sort[:index], values[:index])
+            )
+            after = direction == 1 and not backward or direction == -1 and backward
+            condition[name] = {"$gt" if after else "$lt" : values[index]}
+            conditions.append(condition)
+
+        # adds the keyset condition to the filter, merging it with any
+        # previously existing conjunction of conditions
+        conditions = kwargs.get("$and", []) + [{"$or" : conditions}]
+        kwargs["$and"] = conditions
+
     @classmethod
     def _find_s(cls, kwargs):
         # tries to retrieve the find name value from the provided
@@ -1978,6 +2675,12 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
 
     @classmethod
     def _increment(cls, name):
+        # in case the increment field is configured to reserve blocks of
+        # values, the value is handed out from the local block so that
+        # the counters are only accessed once per block of values
+        block = cls.definition_n(name).get("increment_block", None)
+        if block and block > 1: return cls._increment_block(name, block)
+
         _name = cls._name() + ":" + name
         store = cls._collection(name = "counters")
         value = store.find_and_modify(
@@ -1997,10 +2700,82 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         })
         return value["seq"]
 
+    @classmethod
+    def _increment_many(cls, name, count):
+        # in case the increment field is configured to reserve blocks of
+        # values, the values are handed out from the local block (that
+        # is renewed as needed), otherwise a range is reserved at once
+        block = cls.definition_n(name).get("increment_block", None)
+        if block and block > 1:
+            with INCREMENT_LOCK:
+                return [cls._increment_block(name, block) for _index in range(count)]
+        return cls._increment_range(name, count)
+
+    @classmethod
+    def _increment_range(cls, name, count):
+        # reserves a range of the provided size of values for the
+        # increment field using a single operation in the counters
+        # and returns the sequence of values of such range
+        _name = cls._name() + ":" + name
+        store = cls._collection(name = "counters")
+        value = store.find_and_modify(
+            {
+                "_id" : _name
+            },
+            {
+                "$inc" : {
+                    "seq" : count
+                }
+            },
+            new = True,
+            upsert = True
+        )
+        value = value or store.find_one({
+            "_id" : _name
+        })
+        last = value["seq"]
+        return list(range(last - count + 1, last + 1))
+
+    @classmethod
+    def _increment_block(cls, name, size):
+        _name = (os.getpid(), cls._name() + ":" + name)
+        with INCREMENT_LOCK:
+            # in case there's no block for the counter in the current
+            # process or the current block is exhausted reserves a new
+            # one (single operation in the counters)
+            block = INCREMENT_BLOCKS.get(_name, None)
+            if not block or block[0] > block[1]:
+                values = cls._increment_range(name, size)
+                block = [values[0], values[-1]]
+                INCREMENT_BLOCKS[_name] = block
+
+            # retrieves the next value from the block and moves the
+            # block forward, returning the value to the caller
+            value = block[0]
+            block[0] += 1
+        return value
+
+    @classmethod
+    def _increment_reset(cls):
+        prefix = cls._name() + ":"
+        with INCREMENT_LOCK:
+            for _name in legacy.eager(INCREMENT_BLOCKS.keys()):
+                if not _name[1].startswith(prefix): continue
+                del INCREMENT_BLOCKS[_name]
+
     @classmethod
     def _ensure_min(cls, name, value):
         _name = cls._name() + ":" + name
         store = cls._collection(name = "counters")
+
+        # discards the local block of values in case the minimum value
+        # overlaps it, as the remaining values may no longer be unique,
+        # note that blocks reserved by other processes are not affected
+        with INCREMENT_LOCK:
+            _name_b = (os.getpid(), _name)
+            block = INCREMENT_BLOCKS.get(_name_b, None)
+            if block and block[0] <= value: del INCREMENT_BLOCKS[_name_b]
+
         value = store.find_and_modify(
             {
                 "_id" : _name
@@ -2318,14 +3093,23 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         )
 
         # in case the current model is not new must create a new
-        # model instance and remove the main identifier from it
-        if not is_new: _model = copy.copy(model); del _model["_id"]
+        # model instance with only the values that have changed since
+        # the model was loaded (dirty) and without the main identifier
+        if not is_new: _model = self._dirty(model); _model.pop("_id", None)
 
         # retrieves the reference to the store object to be used and
-        # uses it to store the current model data
+        # uses it to store the current model data, note that if there
+        # are no changed values the update operation is skipped
         store = self._get_store()
         if is_new: self._id = store.insert(model); self.apply(model, safe_a = False)
-        else: store.update({"_id" : model["_id"]}, {"$set" : _model})
+        elif _model: store.update({"_id" : model["_id"]}, {"$set" : _model})
+
+        # invalidates the identity map and query cache entries of the
+        # model's collection as they may no longer be valid, then
+        # updates the snapshot with the values that are now persisted
+        cls = self.__class__
+        if is_new or _model: cls._invalidate()
+        self._set_snapshot(_snapshot(model))
 
         # calls the post save event handlers in order to be able to
         # execute appropriate post operations
@@ -2351,6 +3135,11 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         store = self._get_store()
         store.remove({"_id" : self._id})
 
+        # invalidates the identity map and query cache entries of the
+        # model's collection as they may no longer be valid
+        cls = self.__class__
+        cls._invalidate()
+
         # calls the underlying delete handler that may be used to extend
         # the default delete functionality
         self._delete()
@@ -2604,6 +3393,24 @@ class Model(legacy.with_meta(meta.Ordered, observer.Observable)):
         # from the validation of the items against the model class
         return model
 
+    def _dirty(self, model):
+        # in case there's no snapshot of the persisted values (eg: the
+        # model was not loaded from the data source) every value is
+        # considered to be dirty and a complete update is performed
+        snapshot = self.__dict__.get("_snapshot", None)
+        if snapshot == None: return copy.copy(model)
+
+        # filters the (filtered) model values so that only the ones
+        # that are not present or that are different from the ones in
+        # the snapshot are returned (the dirty values)
+        return dict(
+            (name, value) for name, value in legacy.iteritems(model)\
+            if not name in snapshot or not snapshot[name] == value
+        )
+
+    def _set_snapshot(self, snapshot):
+        self.__dict__["_snapshot"] = snapshot
+
     def _evaluate(self, name, value, evaluator = "json_v"):
         # verifies if the current value is an iterable one in case
         # it is runs the evaluate method for each of the values to
@@ -2948,6 +3755,63 @@ def view(
 
     return decorator
 
+def _caster(type):
+    builder = BUILDERS.get(type, type)
+    if not builder: return lambda value: value
+    default = _default(type)
+
+    def caster(value):
+        try: return builder(value)
+        except Exception: return default()
+
+    return caster
+
+def _default(type):
+    if hasattr(type, "_default"): return type._default
+    default = TYPE_DEFAULTS.get(type, None)
+    if hasattr(default, "__call__"): return default
+    return _constant(default)
+
+def _constant(value):
+    return lambda: value
+
+def _snapshot(model):
+    # creates the snapshot of the persisted values of the model, the
+    # immutable values are kept by reference and the (mutable) container
+    # ones are replaced by a digest of their contents, so that no copy
+    # of (potentially large) documents is required on load
+    snapshot = dict()
+    for name, value in legacy.iteritems(model):
+        if isinstance(value, (dict, list)): value = _Digest(value)
+        snapshot[name] = value
+    return snapshot
+
+def _digest(value):
+    try: data = legacy.cPickle.dumps(value, protocol = 2)
+    except Exception: return None
+    return hashlib.sha1(data).digest()
+
+class _Digest(object):
+    """
+    Digest of a (mutable) value of the snapshot of a model, to be
+    compared against the current value to check if it has changed,
+    values that can not be digested are always considered changed.
+    """
+
+    __slots__ = ("digest",)
+
+    def __init__(self, value):
+        self.digest = _digest(value)
+
+    def __eq__(self, other):
+        if self.digest == None: return False
+        return self.digest == _digest(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
 def type_d(type, default = None):
     """
     Retrieves the default (initial) value for the a certain
@@ -184,6 +184,10 @@ def _count(store, *args, **kwargs):
     if is_new(3, 7): return store.count_documents(*args, **kwargs)
     return store.count(*args, **kwargs)
 
+def _count_estimated(store, *args, **kwargs):
+    if is_new(3, 7): return store.estimated_document_count(*args, **kwargs)
+    return store.count(*args, **kwargs)
+
 def _store_find_and_modify(store, *args, **kwargs):
     if is_new(): return store.find_one_and_update(*args, **kwargs)
     else: return store.find_and_modify(*args, **kwargs)
@@ -196,6 +200,20 @@ def _store_update(store, *args, **kwargs):
     if is_new(): store.update_one(*args, **kwargs)
     else: store.update(*args, **kwargs)
 
+def _store_insert_many(store, objects, *args, **kwargs):
+    if not objects: return
+    if is_new(): store.insert_many(objects, *args, **kwargs)
+    else: store.insert(objects, *args, **kwargs)
+
+def _store_bulk_update(store, updates, *args, **kwargs):
+    if not updates: return
+    if not is_new():
+        for filter, updater in updates: store.update(filter, updater)
+        return
+    operations = [_pymongo().UpdateOne(filter, updater) for filter, updater in updates]
+    kwargs["ordered"] = kwargs.get("ordered", False)
+    store.bulk_write(operations, *args, **kwargs)
+
 def _store_remove(store, *args, **kwargs):
     if is_new(): store.delete_many(*args, **kwargs)
     else: store.remove(*args, **kwargs)
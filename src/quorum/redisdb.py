@@ -40,6 +40,7 @@ __license__ = "Apache License, Version 2.0"
 import os
 import json
 import shelve
+import fnmatch
 
 from . import util
 from . import config
@@ -84,10 +85,18 @@ class RedisMemory(object):
     def setex(self, name, value, time = None):
         self.set(name, value)
 
+    def mget(self, names):
+        return [self.get(name) for name in names]
+
     def delete(self, name):
         if not name in self.values: return
         del self.values[name]
 
+    def scan_iter(self, match = None):
+        for name in list(self.values.keys()):
+            if match and not fnmatch.fnmatchcase(name, match): continue
+            yield name
+
 class RedisShelve(RedisMemory):
     """
     "Local" in persistent stub object that simulates
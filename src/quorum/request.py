@@ -39,9 +39,37 @@ __license__ = "Apache License, Version 2.0"
 
 import flask
 
+from . import util
+
 class Request(flask.Request):
+    """
+    Extended request class that adds the structured (nested)
+    versions of both the arguments and the form of the request,
+    these are lazily built upon their first access so that the
+    body of the request is only parsed if it's actually used.
+    """
 
     def __init__(self, environ, populate_request = True, shallow = False):
         flask.Request.__init__(self, environ, populate_request, shallow)
 
         self.properties = {}
+        self._args_s = None
+        self._form_s = None
+
+    @property
+    def args_s(self):
+        if self._args_s == None: self._args_s = util.load_form(self.args)
+        return self._args_s
+
+    @args_s.setter
+    def args_s(self, value):
+        self._args_s = value
+
+    @property
+    def form_s(self):
+        if self._form_s == None: self._form_s = util.load_form(self.form)
+        return self._form_s
+
+    @form_s.setter
+    def form_s(self, value):
+        self._form_s = value
@@ -38,6 +38,7 @@ __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
 import os
+import threading
 
 class OrderedDict(dict):
 
@@ -205,6 +206,123 @@ class OrderedDict(dict):
             self._list.append(item)
             self._items[key] = item
 
+class Bundles(dict):
+    """
+    Dictionary of locale bundles (locale to bundle map) that keeps
+    a cache of the compiled lookup chains, the ordered sequence of
+    bundles to be used for the localization of a value in a locale
+    (with the language and default fallbacks already flattened in).
+
+    The chains contain references to the bundles so that changes in
+    the bundles are immediately visible, while changes in the set of
+    bundles (or in the token) invalidate the complete cache.
+
+    The values that could not be localized may be accounted per locale
+    (opt-in) so that gaps in the translations may be identified, up to
+    a limited number of distinct values (as values may be arbitrary).
+
+    The loading of the bundles may be deferred by setting a loader
+    that is going to be called (once) on the first call to ensure.
+    """
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.chains = dict()
+        self.missing = dict()
+        self.missing_size = 0
+        self.loader = None
+        self._missing_count = 0
+        self._token = None
+        self._lock = threading.RLock()
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self.chains.clear()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.chains.clear()
+
+    def clear(self):
+        dict.clear(self)
+        self.chains.clear()
+
+    def pop(self, *args, **kwargs):
+        self.chains.clear()
+        return dict.pop(self, *args, **kwargs)
+
+    def popitem(self):
+        self.chains.clear()
+        return dict.popitem(self)
+
+    def setdefault(self, *args, **kwargs):
+        self.chains.clear()
+        return dict.setdefault(self, *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.chains.clear()
+
+    def ensure(self):
+        """
+        Makes sure that the (deferred) loading of the bundles has been
+        performed, calling the loader in case it's still pending.
+
+        Concurrent calls block until the loading is complete so that
+        no partial set of bundles is ever used.
+        """
+
+        if not self.loader: return
+        with self._lock:
+            loader = self.loader
+            if not loader: return
+            loader(self)
+            self.loader = None
+
+    def chain(self, key, builder, token = None):
+        """
+        Retrieves the (compiled) lookup chain for the provided key,
+        building it with the provided builder in case it's not yet
+        compiled (or in case the token has changed).
+
+        :type key: Object
+        :param key: The key that identifies the chain (eg: locale).
+        :type builder: Function
+        :param builder: The function to be called (without arguments)
+        to build the chain, should return a sequence of bundles.
+        :type token: Object
+        :param token: The value that identifies the context in which
+        the chains are built (eg: available locales), if it's changed
+        every compiled chain is discarded.
+        :rtype: Tuple
+        :return: The sequence of bundles that compose the chain.
+        """
+
+        if not token == self._token: self.chains.clear(); self._token = token
+        chain = self.chains.get(key, None)
+        if not chain == None: return chain
+        chain = tuple(builder())
+        self.chains[key] = chain
+        return chain
+
+    def miss(self, locale, value):
+        # in case the accounting of missing values is not enabled
+        # returns immediately, otherwise accounts the miss for the
+        # value in case the limit of distinct values is not reached
+        if not self.missing_size: return
+        missing = self.missing.get(locale, None)
+        if missing == None: missing = self.missing[locale] = dict()
+        count = missing.get(value, None)
+        if count == None:
+            if self._missing_count >= self.missing_size: return
+            self._missing_count += 1
+            count = 0
+        missing[value] = count + 1
+
+    def clear_missing(self):
+        self.missing.clear()
+        self._missing_count = 0
+
 class LazyDict(dict):
 
     def __getitem__(self, key, force = False, resolve = False):
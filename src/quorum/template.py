@@ -42,6 +42,15 @@ import flask
 
 from . import common
 
+RESOLVED = dict()
+""" The cache of resolved template names, mapping the pair of the
+requested template name and locale to the resolved name """
+
+SCANNED = None
+""" The set of relative paths (using forward slashes) of every
+template file under the templates directory, if set it's used
+for existence checks instead of the file system """
+
 def render_template(template_name_or_list, **context):
     # runs the resolution process in the provided template name
     # so that the proper name is going to be used when rendering
@@ -66,6 +75,72 @@ def template_resolve(template):
     account the existence or not of the best locale template.
     """
 
+    # retrieves both the complete locale set under the current request and
+    # the reference to the currently loaded app (for the cache settings)
+    locale = flask.request.locale if hasattr(flask.request, "locale") else None
+    app = common.base().APP
+
+    # in case the cache is not enabled (eg: debug or reloader mode) the
+    # resolution is always performed against the file system so that any
+    # change in the templates directory is immediately visible
+    if not is_cached(app): return _template_resolve(template, locale)
+
+    # tries to retrieve the resolved name from the cache, falling back to
+    # the complete resolution process (setting the result in the cache)
+    key = (template, locale)
+    result = RESOLVED.get(key, None)
+    if not result == None: return result
+    result = _template_resolve(template, locale, scanned = SCANNED)
+    RESOLVED[key] = result
+    return result
+
+def template_scan(path = None):
+    """
+    Scans the complete templates directory (recursively) registering
+    the relative path of every template file so that the resolution
+    of templates does not require any file system operation.
+
+    Should be called once the templates are not going to change
+    anymore (eg: at startup in production environments).
+
+    :type path: String
+    :param path: The base templates path to be scanned, if not
+    provided the templates path of the current app is used.
+    :rtype: int
+    :return: The number of template files that have been found.
+    """
+
+    global SCANNED
+
+    path = path or common.base().templates_path()
+    scanned = set()
+    for base, _names, files in os.walk(path):
+        relative = os.path.relpath(base, path)
+        relative = "" if relative == "." else relative.replace(os.sep, "/") + "/"
+        for file in files: scanned.add(relative + file)
+
+    SCANNED = scanned
+    RESOLVED.clear()
+    return len(scanned)
+
+def template_invalidate():
+    """
+    Invalidates both the cache of resolved templates and the result
+    of the scanning of the templates directory, should be called if
+    the templates directory is changed while the app is running.
+    """
+
+    global SCANNED
+    SCANNED = None
+    RESOLVED.clear()
+
+def is_cached(app = None):
+    app = app or common.base().APP
+    if not app: return False
+    if app.debug or app.use_reloader: return False
+    return getattr(app, "templates_cache", True)
+
+def _template_resolve(template, locale, scanned = None):
     # splits the provided template name into the base and the name values
     # and then splits the name into the base file name and the extension
     # part so that it's possible to re-construct the name with the proper
@@ -73,9 +148,7 @@ def template_resolve(template):
     fbase, name = os.path.split(template)
     fname, extension = name.split(".", 1)
 
-    # retrieves both the complete locale set under the current request and
-    # the language base value for the same locale (to be used as fallback)
-    locale = flask.request.locale if hasattr(flask.request, "locale") else None
+    # retrieves the language base value for the locale (to be used as fallback)
     language = locale.split("_", 1)[0] if locale else None
 
     # sets the fallback name as the "original" template path, because
@@ -100,16 +173,13 @@ def template_resolve(template):
         target = fname + "." + _locale + "." + extension
         target = fbase + "/" + target if fbase else target
 
-        # "joins" the target path and the templates (base) path to create
-        # the full path to the target template, then verifies if it exists
-        # and in case it does sets it as the template name
-        target_f = os.path.join(templates_path, target)
-        if os.path.exists(target_f): return target
+        # verifies if the target template exists (either in the scanned
+        # set or in the file system) and if it does uses it as the name
+        if _exists(templates_path, target, scanned): return target
 
     # runs the same operation for the fallback template name and verifies
     # for its existence in case it exists uses it as the resolved value
-    fallback_f = os.path.join(templates_path, fallback)
-    if os.path.exists(fallback_f): return fallback
+    if _exists(templates_path, fallback, scanned): return fallback
 
     # retrieves the reference to the currently loaded app so that its
     # properties are going to be used in the locales resolution
@@ -119,7 +189,7 @@ def template_resolve(template):
     # any previously "visited" locale value (redundant) so that the list
     # represents the non visited locales by order of preference
     locales = list(app.locales)
-    if locale in locales: locales.remove(flask.request.locale)
+    if locale in locales: locales.remove(locale)
 
     # iterates over the complete list of locales trying to find the any
     # possible existing template that is compatible with the specification
@@ -127,9 +197,13 @@ def template_resolve(template):
     for locale in locales:
         target = fname + "." + locale + "." + extension
         target = fbase + "/" + target if fbase else target
-        target_f = os.path.join(templates_path, target)
-        if os.path.exists(target_f): return target
+        if _exists(templates_path, target, scanned): return target
 
     # returns the fallback value as the last option available, note that
     # for this situation the resolution process is considered failed
     return fallback
+
+def _exists(templates_path, target, scanned = None):
+    if not scanned == None: return target in scanned
+    target_f = os.path.join(templates_path, target)
+    return os.path.exists(target_f)
@@ -37,8 +37,14 @@ __copyright__ = "Copyright (c) 2008-2020 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import time
+import flask
+import threading
+
 import quorum
 
+from . import mock
+
 class BaseTest(quorum.TestCase):
 
     def setUp(self):
@@ -109,6 +115,190 @@ class BaseTest(quorum.TestCase):
         result = quorum.to_locale("bye", locale = "pt_pt", fallback = False)
         self.assertEqual(result, "bye")
 
+    @quorum.secured
+    def test_locale_chain(self):
+        app = quorum.get_app()
+        app.locales = ("en_us", "pt_pt")
+        app.bundles["en_us"] = dict(hello = "Hello")
+        app.bundles["pt"] = dict(hello = "Olá")
+
+        chain = quorum.get_chain("pt_pt")
+        self.assertEqual(isinstance(app.bundles, quorum.Bundles), True)
+        self.assertEqual(len(chain), 2)
+        self.assertEqual(chain[0]["hello"], "Olá")
+        self.assertEqual(chain[1]["hello"], "Hello")
+        self.assertEqual(quorum.get_chain("pt_pt") is chain, True)
+
+        chain = quorum.get_chain("pt_pt", fallback = False)
+        self.assertEqual(len(chain), 1)
+
+        app.bundles["pt_pt"] = dict(bye = "Adeus")
+
+        chain = quorum.get_chain("pt_pt")
+        self.assertEqual(len(chain), 3)
+        self.assertEqual(chain[0]["bye"], "Adeus")
+
+        app.locales = ("pt_pt", "en_us")
+        app._locale_d = "pt_pt"
+
+        result = quorum.to_locale("hello", locale = "en_us")
+        self.assertEqual(result, "Hello")
+
+        result = quorum.to_locale("bye", locale = "en_us")
+        self.assertEqual(result, "Adeus")
+
+        app.bundles.clear_missing()
+
+        result = quorum.to_locale("other", locale = "en_us")
+        self.assertEqual(result, "other")
+        self.assertEqual(quorum.get_missing(), dict())
+
+        app.bundles.missing_size = 1
+
+        try:
+            result = quorum.to_locale("other", locale = "en_us")
+            self.assertEqual(result, "other")
+
+            result = quorum.to_locale("other", locale = "en_us")
+            self.assertEqual(result, "other")
+
+            result = quorum.to_locale("another", locale = "en_us")
+            self.assertEqual(result, "another")
+
+            missing = quorum.get_missing()
+            self.assertEqual(missing, dict(en_us = dict(other = 2)))
+        finally:
+            app.bundles.missing_size = 0
+            app.bundles.clear_missing()
+
+    @quorum.secured
+    def test_locale_request(self):
+        app = quorum.get_app()
+        app.locales = ("en_us", "pt_pt")
+        app.bundles["en_us"] = dict(hello = "Hello")
+        app.bundles["pt_pt"] = dict(hello = "Olá")
+
+        with app.test_request_context(base_url = "http://localhost"):
+            flask.request.locale = "pt_pt"
+            flask.request.chains = dict()
+
+            result = quorum.to_locale("hello")
+            self.assertEqual(result, "Olá")
+            self.assertEqual(len(flask.request.chains), 1)
+
+            chain = flask.request.chains[True]
+            self.assertEqual(chain[0]["hello"], "Olá")
+
+            result = quorum.to_locale("hello", locale = "en_us")
+            self.assertEqual(result, "Hello")
+            self.assertEqual(len(flask.request.chains), 1)
+
+    @quorum.secured
+    def test_startup(self):
+        startup = quorum.get_startup()
+        names = [phase["name"] for phase in startup["phases"]]
+
+        self.assertEqual(names[0], "config")
+        self.assertEqual("bundles" in names, True)
+        self.assertEqual("models" in names, True)
+        self.assertEqual(startup["total"] >= 0.0, True)
+        self.assertEqual(
+            startup["total"] >= sum(phase["duration"] for phase in startup["phases"]) * 0.99,
+            True
+        )
+
+    @quorum.secured
+    def test_startup_lazy(self):
+        quorum.unload()
+        quorum.confs("MODELS_SETUP", "lazy")
+        try: quorum.load(name = __name__, models = mock)
+        finally: quorum.confr("MODELS_SETUP")
+
+        try:
+            self.assertEqual(mock.Person._pending, True)
+            self.assertEqual(mock.Cat._pending, True)
+
+            mock.Person.count()
+
+            self.assertEqual(mock.Person._pending, False)
+            self.assertEqual(mock.Cat._pending, True)
+        finally:
+            adapter = quorum.get_adapter()
+            adapter.drop_db()
+
+        bundles = quorum.Bundles()
+        bundles.loader = lambda bundles: bundles.update(en_us = dict(hello = "Hello"))
+
+        self.assertEqual(len(bundles), 0)
+
+        bundles.ensure()
+        bundles.ensure()
+
+        self.assertEqual(bundles["en_us"], dict(hello = "Hello"))
+        self.assertEqual(bundles.loader, None)
+
+    @quorum.secured
+    def test_setup_once(self):
+        calls = []
+        setup = mock.Cat.__dict__.get("setup", None)
+
+        def _setup(cls):
+            calls.append(cls)
+            time.sleep(0.05)
+            cls._collection()
+
+        mock.Cat.setup = classmethod(_setup)
+        try:
+            mock.Cat._ready = False
+            quorum.setup_models(mock, lazy = True)
+
+            threads = [
+                threading.Thread(target = mock.Cat._ensure) for _index in range(4)
+            ]
+            for thread in threads: thread.start()
+            quorum.ensure_models(mock)
+            for thread in threads: thread.join()
+
+            self.assertEqual(calls, [mock.Cat])
+            self.assertEqual(mock.Cat._pending, False)
+            self.assertEqual(mock.Cat._is_ready(), True)
+
+            quorum.setup_models(mock, lazy = True)
+            quorum.ensure_models(mock)
+
+            self.assertEqual(calls, [mock.Cat])
+            self.assertEqual(mock.Cat._pending, False)
+        finally:
+            if setup: mock.Cat.setup = setup
+            else: del mock.Cat.setup
+            for model_c in quorum.models_c(models = mock): model_c._ready = False
+
+    @quorum.secured
+    def test_request_lazy(self):
+        app = quorum.get_app()
+
+        with app.test_request_context(
+            "/?sorter=name&person.name=Name",
+            base_url = "http://localhost",
+            method = "POST",
+            data = {"person.age" : "20", "tags" : ["a", "b"]}
+        ):
+            quorum.before_request()
+            request = flask.request._get_current_object()
+
+            self.assertEqual(request._args_s, None)
+            self.assertEqual(request._form_s, None)
+
+            self.assertEqual(request.args_s, dict(sorter = "name", person = dict(name = "Name")))
+            self.assertEqual(request._form_s, None)
+
+            self.assertEqual(request.form_s, dict(person = dict(age = "20"), tags = ["a", "b"]))
+            self.assertEqual(request.form_s is request.form_s, True)
+
+            request.form_s = dict(name = "Other")
+
+            self.assertEqual(request.form_s, dict(name = "Other"))
+
     @quorum.secured
     def test_context(self):
 
@@ -0,0 +1,230 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Flask Quorum
+# Copyright (c) 2008-2020 Hive Solutions Lda.
+#
+# This file is part of Hive Flask Quorum.
+#
+# Hive Flask Quorum is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Flask Quorum is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Flask Quorum. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__version__ = "1.0.0"
+""" The version of the module """
+
+__revision__ = "$LastChangedRevision$"
+""" The revision number of the module """
+
+__date__ = "$LastChangedDate$"
+""" The last change date of the module """
+
+__copyright__ = "Copyright (c) 2008-2020 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+import quorum
+
+class IdentityMapTest(quorum.TestCase):
+
+    @quorum.secured
+    def test_basic(self):
+        identity = quorum.IdentityMap()
+        identity.put("person", dict(_id = 1, identifier = 1, name = "Name"))
+
+        result = identity.get("person", "_id", 1)
+
+        self.assertEqual(result, dict(_id = 1, identifier = 1, name = "Name"))
+        self.assertEqual(identity.hits, 1)
+        self.assertEqual(identity.misses, 0)
+
+        result["name"] = "Changed"
+        result = identity.get("person", "_id", 1)
+
+        self.assertEqual(result["name"], "Name")
+        self.assertEqual(identity.hits, 2)
+
+        result = identity.get("person", "_id", 2)
+
+        self.assertEqual(result, None)
+        self.assertEqual(identity.misses, 1)
+
+        result = identity.get("cat", "_id", 1)
+
+        self.assertEqual(result, None)
+        self.assertEqual(identity.misses, 2)
+
+    @quorum.secured
+    def test_alias(self):
+        identity = quorum.IdentityMap()
+        identity.put(
+            "person",
+            dict(_id = 1, identifier = 1, name = "Name"),
+            name = "identifier"
+        )
+
+        self.assertEqual(identity.has("person", "identifier", 1), True)
+        self.assertEqual(identity.has("person", "identifier", 2), False)
+        self.assertEqual(identity.has("person", "name", "Name"), False)
+        self.assertEqual(identity.has("person", "identifier", [1]), False)
+
+        result = identity.get("person", "identifier", 1)
+
+        self.assertEqual(result["name"], "Name")
+
+    @quorum.secured
+    def test_fields(self):
+        identity = quorum.IdentityMap()
+        identity.put(
+            "person",
+            dict(_id = 1, identifier = 1, name = "Name"),
+            fields = ("identifier", "name")
+        )
+
+        result = identity.get("person", "_id", 1, fields = ("name",))
+
+        self.assertEqual(result, dict(_id = 1, name = "Name"))
+
+        result = identity.get("person", "_id", 1, fields = ("name", "age"))
+
+        self.assertEqual(result, None)
+
+        result = identity.get("person", "_id", 1)
+
+        self.assertEqual(result, dict(_id = 1, identifier = 1, name = "Name"))
+
+    @quorum.secured
+    def test_invalidate(self):
+        identity = quorum.IdentityMap()
+        identity.put("person", dict(_id = 1, identifier = 1), name = "identifier")
+        identity.put("cat", dict(_id = 1, identifier = 1), name = "identifier")
+
+        identity.invalidate("person")
+
+        self.assertEqual(identity.has("person", "_id", 1), False)
+        self.assertEqual(identity.has("person", "identifier", 1), False)
+        self.assertEqual(identity.has("cat", "identifier", 1), True)
+
+        identity.clear()
+
+        self.assertEqual(identity.has("cat", "identifier", 1), False)
+        self.assertEqual(identity.stats()["size"], 0)
+
+class MemoryCacheTest(quorum.TestCase):
+
+    @quorum.secured
+    def test_basic(self):
+        cache = quorum.MemoryCache()
+        key = cache.key("person", "find", dict(name = "Name"), None, 0, 0, None)
+
+        self.assertEqual(key, cache.key("person", "find", dict(name = "Name"), None, 0, 0, None))
+        self.assertNotEqual(key, cache.key("person", "find", dict(name = "Other"), None, 0, 0, None))
+        self.assertNotEqual(key, cache.key("person", "count", dict(name = "Name")))
+
+        result = cache.get("person", key)
+
+        self.assertEqual(result, None)
+        self.assertEqual(cache.misses, 1)
+
+        cache.set("person", key, [dict(_id = 1, name = "Name")])
+        result = cache.get("person", key)
+
+        self.assertEqual(result, [dict(_id = 1, name = "Name")])
+        self.assertEqual(cache.hits, 1)
+
+        result[0]["name"] = "Changed"
+        result = cache.get("person", key)
+
+        self.assertEqual(result[0]["name"], "Name")
+        self.assertEqual(cache.ratio(), 2.0 / 3.0)
+
+        cache.set("person", "count", 0)
+        result = cache.get("person", "count")
+
+        self.assertEqual(result, 0)
+
+        cache.invalidate("person")
+
+        self.assertEqual(cache.get("person", key), None)
+        self.assertEqual(cache.get("person", "count"), None)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    @quorum.secured
+    def test_eviction(self):
+        cache = quorum.MemoryCache(size = 2)
+        cache.set("person", "first", 1)
+        cache.set("person", "second", 2)
+
+        self.assertEqual(cache.get("person", "first"), 1)
+
+        cache.set("person", "third", 3)
+
+        self.assertEqual(cache.get("person", "first"), 1)
+        self.assertEqual(cache.get("person", "second"), None)
+        self.assertEqual(cache.get("person", "third"), 3)
+        self.assertEqual(cache.evictions, 1)
+
+    @quorum.secured
+    def test_ttl(self):
+        cache = quorum.MemoryCache(ttl = -1)
+        cache.set("person", "first", 1)
+
+        self.assertEqual(cache.get("person", "first"), None)
+
+        cache = quorum.MemoryCache(ttl = 3600)
+        cache.set("person", "first", 1)
+
+        self.assertEqual(cache.get("person", "first"), 1)
+
+class RedisCacheTest(quorum.TestCase):
+
+    @quorum.secured
+    def test_basic(self):
+        cache = quorum.RedisCache(ttl = None, connection = quorum.redisdb.RedisMemory())
+        cache.set("person", "first", [dict(_id = 1, name = "Name")])
+
+        self.assertEqual(cache.get("person", "first"), [dict(_id = 1, name = "Name")])
+
+        cache.invalidate("person")
+
+        self.assertEqual(cache.get("person", "first"), None)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    @quorum.secured
+    def test_clear(self):
+        connection = quorum.redisdb.RedisMemory()
+        cache = quorum.RedisCache(ttl = None, connection = connection)
+        cache.set("person", "first", [dict(_id = 1, name = "Name")])
+        cache.set("cat", "first", [dict(_id = 1, name = "Cat")])
+        cache.invalidate("cat")
+        cache.set("cat", "first", [dict(_id = 2, name = "Cat")])
+
+        self.assertEqual(cache.get("cat", "first"), [dict(_id = 2, name = "Cat")])
+
+        cache.clear()
+
+        self.assertEqual(cache.get("person", "first"), None)
+        self.assertEqual(cache.get("cat", "first"), None)
+        self.assertEqual(
+            [name for name in connection.values if not name.endswith(("namespace", "generation"))],
+            []
+        )
+
+        cache.set("person", "first", [dict(_id = 1, name = "Name")])
+
+        self.assertEqual(cache.get("person", "first"), [dict(_id = 1, name = "Name")])
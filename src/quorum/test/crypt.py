@@ -84,3 +84,51 @@ class CryptTest(quorum.TestCase):
         data = spritz.decrypt(result)
 
         self.assertEqual(data, b"hello world")
+
+    @quorum.secured
+    def test_spritz_reference(self):
+        for key in (b"hello key", b"k", b"another longer secret key" * 4):
+            for size in (0, 1, 11, 300):
+                data = bytes(bytearray((index * 7) % 256 for index in range(size)))
+
+                reference = quorum.Spritz(key)
+                stream = reference.squeeze(size)
+                expected = bytes(bytearray((b1 + b2) % 256 for b1, b2 in zip(bytearray(data), stream)))
+
+                spritz = quorum.Spritz(key)
+                result = spritz.encrypt(data)
+
+                self.assertEqual(result, expected)
+                self.assertEqual(quorum.Spritz(key).decrypt(result), data)
+
+        spritz = quorum.Spritz(b"hello key")
+        result = spritz.encrypt(b"hello") + spritz.encrypt(b" world")
+
+        self.assertEqual(result, b"\xbch\x0c\xb4X21\\\x07\xde\xe1")
+
+        reference = quorum.Spritz(b"hello key")
+        reference.absorb(b"nonce")
+        spritz = quorum.Spritz(b"hello key")
+        spritz.absorb(b"nonce")
+
+        self.assertEqual(spritz.encrypt(b"hello world"), bytes(bytearray(
+            (b1 + b2) % 256 for b1, b2 in zip(bytearray(b"hello world"), reference.squeeze(11))
+        )))
+
+    @quorum.secured
+    def test_many(self):
+        result = quorum.Spritz.encrypt_many(b"hello key", [b"hello world", b"hello world", b""])
+
+        self.assertEqual(result, [b"\xbch\x0c\xb4X21\\\x07\xde\xe1"] * 2 + [b""])
+
+        result = quorum.Spritz.decrypt_many(b"hello key", result)
+
+        self.assertEqual(result, [b"hello world", b"hello world", b""])
+
+        result = quorum.RC4.encrypt_many(b"hello key", [b"hello world", b"hello world"])
+
+        self.assertEqual(result, [b"\xc54L\x00\xac\xb4\xf2\xcf\x8b5\xa7"] * 2)
+
+        result = quorum.RC4.decrypt_many(b"hello key", result)
+
+        self.assertEqual(result, [b"hello world", b"hello world"])
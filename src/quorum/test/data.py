@@ -37,6 +37,11 @@ __copyright__ = "Copyright (c) 2008-2020 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import os
+import json
+import time
+import tempfile
+
 import quorum
 
 class DataTest(quorum.TestCase):
@@ -48,3 +53,253 @@ class DataTest(quorum.TestCase):
 
         self.assertEqual(type(identifier), str)
         self.assertEqual(len(identifier), 24)
+
+class TinyCollectionTest(quorum.TestCase):
+
+    def setUp(self):
+        try: import tinydb
+        except ImportError: self.skip()
+        self.adapter = quorum.TinyAdapter()
+        self.adapter.storage = "memory"
+        self.collection = self.adapter.collection("person")
+        self.collection.insert_many([
+            dict(name = "Alpha", age = 10, tags = ["a", "b"]),
+            dict(name = "Beta", age = 20, tags = ["b"]),
+            dict(name = "Gamma", age = 30),
+            dict(name = "delta", age = None)
+        ])
+
+    def tearDown(self):
+        self.adapter.drop_db()
+
+    @quorum.secured
+    def test_operators(self):
+        collection = self.collection
+
+        self.assertEqual(len(collection.find(dict(age = 20))), 1)
+        self.assertEqual(len(collection.find(dict(age = {"$in" : [10, 30]}))), 2)
+        self.assertEqual(len(collection.find(dict(age = {"$nin" : [10, 30]}))), 2)
+        self.assertEqual(len(collection.find(dict(age = {"$ne" : 10}))), 3)
+        self.assertEqual(len(collection.find(dict(age = {"$gt" : 10}))), 2)
+        self.assertEqual(len(collection.find(dict(age = {"$gte" : 10, "$lt" : 30}))), 2)
+        self.assertEqual(len(collection.find(dict(age = None))), 1)
+        self.assertEqual(len(collection.find(dict(tags = "b"))), 2)
+        self.assertEqual(len(collection.find(dict(tags = {"$all" : ["a", "b"]}))), 1)
+        self.assertEqual(len(collection.find(dict(tags = {"$exists" : False}))), 2)
+        self.assertEqual(len(collection.find(dict(name = {"$regex" : "^.*a$"}))), 4)
+        self.assertEqual(len(collection.find(dict(name = {"$regex" : "^a", "$options" : "-i"}))), 1)
+        self.assertEqual(len(collection.find({"$or" : [dict(age = 10), dict(age = 30)]})), 2)
+        self.assertEqual(len(collection.find({"$and" : [dict(age = {"$gt" : 10}), dict(name = "Beta")]})), 1)
+        self.assertEqual(collection.count(dict(age = {"$lte" : 20})), 2)
+        self.assertEqual(collection.count(), 4)
+
+        self.assertRaises(
+            quorum.OperationalError,
+            lambda: collection.find(dict(age = {"$unknown" : 10}))
+        )
+
+    @quorum.secured
+    def test_sort(self):
+        collection = self.collection
+
+        results = collection.find(dict(), sort = [("age", 1)])
+        self.assertEqual([result["name"] for result in results], ["delta", "Alpha", "Beta", "Gamma"])
+
+        results = collection.find(dict(), sort = [("age", -1)], skip = 1)
+        self.assertEqual([result["name"] for result in results], ["Beta", "Alpha", "delta"])
+
+        results = collection.find(dict(), sort = [("age", -1)], skip = 1, limit = 1)
+        self.assertEqual([result["name"] for result in results], ["Beta"])
+
+    @quorum.secured
+    def test_index(self):
+        collection = self.collection
+        collection.ensure_index("age")
+
+        index = collection._indexes()["age"]
+
+        self.assertEqual(index.lookup(20), set([2]))
+        self.assertEqual(index.lookup({"$in" : [10, 30]}), set([1, 3]))
+        self.assertEqual(index.lookup({"$gt" : 10}), set([2, 3]))
+        self.assertEqual(index.lookup({"$gte" : 10, "$lt" : 30}), set([1, 2]))
+        self.assertEqual(index.lookup({"$regex" : "1"}), None)
+
+        collection.update(dict(name = "Beta"), {"$set" : dict(age = 40)})
+
+        self.assertEqual(index.lookup(20), set())
+        self.assertEqual(index.lookup({"$gt" : 30}), set([2]))
+        self.assertEqual(collection.find(dict(age = 40))[0]["name"], "Beta")
+
+        collection.remove(dict(age = {"$gte" : 30}))
+
+        self.assertEqual(index.lookup({"$gt" : 0}), set([1]))
+        self.assertEqual(collection.count(), 2)
+        self.assertEqual(collection.find_one(dict(age = 10))["name"], "Alpha")
+
+    @quorum.secured
+    def test_index_reads(self):
+        collection = self.collection
+        collection.ensure_index("age")
+
+        table = collection._base
+        read_table = table._read_table
+        reads = []
+
+        def _read_table():
+            reads.append(True)
+            return read_table()
+
+        table._read_table = _read_table
+        try:
+            results = collection.find(dict(age = {"$in" : [10, 20, 30]}))
+            self.assertEqual(len(results), 3)
+            self.assertEqual(len(reads), 1)
+
+            del reads[:]
+            collection.update(dict(age = {"$gte" : 20}), {"$set" : dict(age = 50)})
+            self.assertEqual(collection._indexes()["age"].lookup(50), set([2, 3]))
+            self.assertEqual(len(reads), 1)
+        finally:
+            del table._read_table
+
+    @quorum.secured
+    def test_index_reads_legacy(self):
+        collection = self.collection
+        collection.ensure_index("age")
+
+        get_many = quorum.TinyCollection._get_many
+        quorum.TinyCollection._get_many = False
+
+        table = collection._base
+        read_table = table._read_table
+        reads = []
+
+        def _read_table():
+            reads.append(True)
+            return read_table()
+
+        table._read_table = _read_table
+        try:
+            results = collection.find(dict(age = {"$in" : [10, 30]}))
+            self.assertEqual(len(results), 2)
+            self.assertEqual(sorted(result["age"] for result in results), [10, 30])
+            self.assertEqual(len(reads), 1)
+        finally:
+            del table._read_table
+            quorum.TinyCollection._get_many = get_many
+
+    @quorum.secured
+    def test_bulk_update(self):
+        collection = self.collection
+        collection.ensure_index("age")
+
+        table = collection._base
+        update = table.update
+        updates = []
+
+        def _update(*args, **kwargs):
+            updates.append(True)
+            return update(*args, **kwargs)
+
+        table.update = _update
+        try:
+            collection.bulk_update([
+                (dict(name = "Alpha"), {"$set" : dict(age = 15)}),
+                (dict(age = 15), {"$set" : dict(tags = ["c"])}),
+                (dict(age = {"$gte" : 20}), {"$set" : dict(age = 25)})
+            ])
+        finally:
+            del table.update
+
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(collection.find_one(dict(name = "Alpha"))["tags"], ["c"])
+        self.assertEqual(collection.find_one(dict(name = "Alpha"))["age"], 15)
+        self.assertEqual(collection.count(dict(age = 25)), 2)
+        self.assertEqual(collection._indexes()["age"].lookup(25), set([2, 3]))
+        self.assertEqual(collection._indexes()["age"].lookup(10), set())
+
+class TinyAdapterTest(quorum.TestCase):
+
+    def setUp(self):
+        try: import tinydb
+        except ImportError: self.skip()
+
+    @quorum.secured
+    def test_cache(self):
+        file_path = os.path.join(tempfile.mkdtemp(), "db.json")
+        adapter = quorum.TinyAdapter(file_path = file_path, cache = True, cache_size = 3)
+
+        def read():
+            if not os.path.exists(file_path): return dict()
+            with open(file_path, "r") as file: data = file.read()
+            return json.loads(data) if data else dict()
+
+        try:
+            collection = adapter.collection("person")
+            collection.insert(dict(name = "Alpha"))
+            collection.insert(dict(name = "Beta"))
+
+            self.assertEqual(collection.count(), 2)
+            self.assertEqual(len(read().get("person", dict())), 0)
+
+            collection.insert(dict(name = "Gamma"))
+
+            self.assertEqual(len(read()["person"]), 3)
+
+            collection.remove(dict(name = "Alpha"))
+
+            self.assertEqual(collection.count(), 2)
+            self.assertEqual(len(read()["person"]), 3)
+
+            adapter.flush()
+
+            self.assertEqual(len(read()["person"]), 2)
+        finally:
+            adapter.drop_db()
+
+        self.assertEqual(os.path.exists(file_path), False)
+
+    @quorum.secured
+    def test_cache_interval(self):
+        file_path = os.path.join(tempfile.mkdtemp(), "db.json")
+        adapter = quorum.TinyAdapter(file_path = file_path, cache = True, cache_interval = 0.05)
+
+        def read():
+            if not os.path.exists(file_path): return dict()
+            with open(file_path, "r") as file: data = file.read()
+            return json.loads(data) if data else dict()
+
+        try:
+            collection = adapter.collection("person")
+            collection.insert(dict(name = "Alpha"))
+
+            self.assertEqual(len(read().get("person", dict())), 0)
+
+            for _index in range(100):
+                if read().get("person", None): break
+                time.sleep(0.01)
+
+            self.assertEqual(len(read()["person"]), 1)
+        finally:
+            adapter.drop_db()
+
+        self.assertEqual(os.path.exists(file_path), False)
+
+    @quorum.secured
+    def test_cache_atexit(self):
+        file_path = os.path.join(tempfile.mkdtemp(), "db.json")
+        adapter = quorum.TinyAdapter(file_path = file_path, cache = True)
+
+        registered = []
+        register = quorum.data.atexit.register
+        quorum.data.atexit.register = lambda callable: registered.append(callable)
+        try:
+            for _index in range(3):
+                collection = adapter.collection("person")
+                collection.insert(dict(name = "Alpha"))
+                adapter.drop_db()
+        finally:
+            quorum.data.atexit.register = register
+
+        self.assertEqual(len(registered), 1)
+
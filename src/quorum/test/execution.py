@@ -37,13 +37,140 @@ __copyright__ = "Copyright (c) 2008-2020 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import json
+import time
 import calendar
 import datetime
+import threading
 
 import quorum
 
 class ExecutionTest(quorum.TestCase):
 
+    @quorum.secured
+    def test_thread(self):
+        thread = quorum.ExecutionThread()
+        thread.start()
+
+        try:
+            event = threading.Event()
+            results = []
+
+            thread.insert_work(
+                lambda: results.append("later"),
+                target_time = time.time() + 0.2
+            )
+            thread.insert_work(lambda: results.append("first"))
+            thread.insert_work(lambda: results.append("second"))
+            thread.insert_work(event.set)
+
+            self.assertEqual(event.wait(0.1), True)
+            self.assertEqual(results, ["first", "second"])
+
+            event.clear()
+            thread.insert_work(event.set, target_time = time.time() + 0.3)
+
+            self.assertEqual(event.wait(1.0), True)
+            self.assertEqual(results, ["first", "second", "later"])
+        finally:
+            thread.stop()
+            thread.join(1.0)
+
+        self.assertEqual(thread.is_alive(), False)
+
+    @quorum.secured
+    def test_workers(self):
+        quorum.register_queue("slow", priority = 0, concurrency = 1)
+        quorum.register_queue("fast", priority = 10)
+
+        thread = quorum.ExecutionThread(workers = 2)
+        thread.start()
+
+        try:
+            release = threading.Event()
+            event = threading.Event()
+            results = []
+
+            def slow(name):
+                results.append(name)
+                release.wait(1.0)
+
+            thread.insert_work(slow, args = ["slow1"], queue = "slow")
+            thread.insert_work(slow, args = ["slow2"], queue = "slow")
+            thread.insert_work(event.set, queue = "fast")
+
+            self.assertEqual(event.wait(0.5), True)
+            self.assertEqual(results, ["slow1"])
+
+            event.clear()
+            release.set()
+            thread.insert_work(event.set, target_time = time.time() + 0.1, queue = "slow")
+
+            self.assertEqual(event.wait(1.0), True)
+            self.assertEqual(results, ["slow1", "slow2"])
+        finally:
+            thread.stop()
+            thread.join(1.0)
+
+        thread = quorum.ExecutionThread(workers = 1)
+        thread.start()
+
+        try:
+            event = threading.Event()
+            results = []
+
+            target = time.time() + 0.1
+            for queue in ("slow", "fast", "slow", "fast"):
+                thread.insert_work(results.append, args = [queue], target_time = target, queue = queue)
+            thread.insert_work(event.set, target_time = target + 0.1, queue = "slow")
+
+            self.assertEqual(event.wait(1.0), True)
+            self.assertEqual(results, ["fast", "fast", "slow", "slow"])
+        finally:
+            thread.stop()
+            thread.join(1.0)
+            del quorum.execution.QUEUES["slow"]
+            del quorum.execution.QUEUES["fast"]
+
+    @quorum.secured
+    def test_metrics(self):
+        thread = quorum.ExecutionThread()
+        thread.start()
+
+        try:
+            event = threading.Event()
+
+            def failure():
+                raise quorum.OperationalError("Failure")
+
+            thread.insert_work(failure)
+            thread.insert_work(event.set)
+            thread.insert_work(event.set, target_time = time.time() + 3600)
+
+            self.assertEqual(event.wait(1.0), True)
+            time.sleep(0.05)
+
+            metrics = thread.metrics()
+            callables = metrics["callables"]
+
+            self.assertEqual(metrics["pending"], 1)
+            self.assertEqual(metrics["runs"], 2)
+            self.assertEqual(metrics["errors"], 1)
+            self.assertEqual(metrics["next_time"] > 3500, True)
+            self.assertEqual(len(callables), 2)
+
+            name = quorum.execution.callable_name(failure)
+            self.assertEqual(callables[name]["runs"], 1)
+            self.assertEqual(callables[name]["errors"], 1)
+            self.assertEqual(sum(callables[name]["histogram"].values()), 1)
+            self.assertEqual(callables[name]["lag"] >= 0.0, True)
+
+            result = json.loads(json.dumps(metrics))
+            self.assertEqual(result["errors"], 1)
+        finally:
+            thread.stop()
+            thread.join(1.0)
+
     @quorum.secured
     def test_seconds_eval(self):
         now = datetime.datetime(year = 2014, month = 1, day = 1, second = 0)
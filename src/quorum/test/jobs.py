@@ -0,0 +1,261 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Flask Quorum
+# Copyright (c) 2008-2020 Hive Solutions Lda.
+#
+# This file is part of Hive Flask Quorum.
+#
+# Hive Flask Quorum is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Flask Quorum is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Flask Quorum. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__version__ = "1.0.0"
+""" The version of the module """
+
+__revision__ = "$LastChangedRevision$"
+""" The revision number of the module """
+
+__date__ = "$LastChangedDate$"
+""" The last change date of the module """
+
+__copyright__ = "Copyright (c) 2008-2020 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+import time
+import threading
+
+import quorum
+
+from . import mock
+
+RESULTS = []
+""" The list of results of the jobs executed by the tests """
+
+EVENT = threading.Event()
+""" The event set upon the execution of the jobs by the tests """
+
+def append(value):
+    RESULTS.append(value)
+    EVENT.set()
+
+class BackendTestCase(quorum.TestCase):
+
+    def _test_backend(self, backend):
+        now = time.time()
+        first = backend.push("module.first", args = [1], target_time = now - 10)
+        second = backend.push("module.second", kwargs = dict(value = 2), target_time = now - 5)
+        backend.push("module.third", target_time = now + 3600)
+
+        self.assertEqual(backend.count(), 3)
+
+        job = backend.claim("owner1")
+
+        self.assertEqual(job["_id"], first)
+        self.assertEqual(job["name"], "module.first")
+        self.assertEqual(job["args"], [1])
+        self.assertEqual(job["owner"], "owner1")
+        self.assertEqual(job["attempts"], 1)
+
+        other = backend.claim("owner2")
+
+        self.assertEqual(other["_id"], second)
+        self.assertEqual(other["kwargs"], dict(value = 2))
+        self.assertEqual(backend.claim("owner2"), None)
+
+        backend.complete(job)
+
+        self.assertEqual(backend.count(), 2)
+
+        backend.fail(other)
+
+        self.assertEqual(backend.count(), 2)
+        self.assertEqual(backend.claim("owner1"), None)
+
+        backend.clear()
+
+        self.assertEqual(backend.count(), 0)
+
+class JobBackendTest(BackendTestCase):
+
+    @quorum.secured
+    def test_memory(self):
+        backend = quorum.MemoryBackend(lease = 60.0, retries = 1, delay = 60.0)
+        self._test_backend(backend)
+
+    @quorum.secured
+    def test_execution(self):
+        backend = quorum.MemoryBackend()
+        thread = quorum.ExecutionThread(backend = backend)
+        thread.start()
+
+        try:
+            del RESULTS[:]
+            EVENT.clear()
+
+            identifier = thread.insert_job(append, args = ["job"])
+
+            self.assertNotEqual(identifier, None)
+            self.assertEqual(EVENT.wait(1.0), True)
+            self.assertEqual(RESULTS, ["job"])
+
+            time.sleep(0.05)
+
+            self.assertEqual(backend.count(), 0)
+
+            EVENT.clear()
+            thread.insert_job("quorum.test.jobs.append", kwargs = dict(value = "name"))
+
+            self.assertEqual(EVENT.wait(1.0), True)
+            self.assertEqual(RESULTS, ["job", "name"])
+        finally:
+            thread.stop()
+            thread.join(1.0)
+
+    @quorum.secured
+    def test_capacity(self):
+        backend = quorum.MemoryBackend()
+        thread = quorum.ExecutionThread(workers = 2, backend = backend)
+        for index in range(5): backend.push("module.job%d" % index, target_time = time.time() - 1)
+
+        execution_list = thread.claim()
+
+        self.assertEqual(len(execution_list), 2)
+        self.assertEqual(thread.claimed, True)
+
+        thread.dispatch(execution_list)
+        execution_list = thread.claim()
+
+        self.assertEqual(execution_list, [])
+        self.assertEqual(thread.claimed, False)
+        self.assertEqual(thread.capacity(), 0)
+        self.assertEqual(len([job for job in backend._jobs.values() if job["owner"]]), 2)
+
+        thread.ready.clear()
+        thread.running["default"] = 1
+        execution_list = thread.claim()
+
+        self.assertEqual(len(execution_list), 1)
+        self.assertEqual(thread.claimed, True)
+
+class StoreBackendTest(BackendTestCase):
+
+    def setUp(self):
+        try:
+            quorum.load(
+                name = __name__,
+                mongo_database = "test",
+                models = mock
+            )
+        except Exception:
+            self.skip()
+
+    def tearDown(self):
+        try:
+            adapter = quorum.get_adapter()
+            adapter.drop_db()
+        except Exception: pass
+        finally: quorum.unload()
+
+    @quorum.secured
+    def test_store(self):
+        backend = quorum.StoreBackend(lease = 60.0, retries = 1, delay = 60.0)
+        self._test_backend(backend)
+
+class RedisBackendTest(BackendTestCase):
+
+    def setUp(self):
+        try:
+            quorum.load(name = __name__)
+            if not quorum.redisdb.url: raise quorum.OperationalError("No Redis URL defined")
+            self.connection = quorum.redisdb.get_connection()
+            self.connection.ping()
+        except Exception:
+            self.skip()
+
+    def tearDown(self):
+        try:
+            backend = self._backend()
+            backend.clear()
+        except Exception: pass
+        finally: quorum.unload()
+
+    @quorum.secured
+    def test_redis(self):
+        backend = self._backend(lease = 60.0, retries = 1, delay = 60.0)
+        self._test_backend(backend)
+
+    @quorum.secured
+    def test_lease(self):
+        backend = self._backend(lease = 0.1, retries = 3, delay = 60.0)
+        identifier = backend.push("module.first")
+
+        job = backend.claim("owner1")
+
+        self.assertEqual(job["_id"], identifier)
+        self.assertEqual(job["attempts"], 1)
+        self.assertEqual(backend.claim("owner2"), None)
+
+        time.sleep(0.2)
+
+        other = backend.claim("owner2")
+
+        self.assertEqual(other["_id"], identifier)
+        self.assertEqual(other["owner"], "owner2")
+        self.assertEqual(other["attempts"], 2)
+
+        backend.complete(job)
+        backend.fail(job)
+
+        self.assertEqual(backend.count(), 1)
+        self.assertEqual(backend.claim("owner3"), None)
+
+        backend.complete(other)
+
+        self.assertEqual(backend.count(), 0)
+        self.assertEqual(backend.claim("owner3"), None)
+
+    @quorum.secured
+    def test_retry(self):
+        backend = self._backend(lease = 60.0, retries = 2, delay = 0.0)
+        identifier = backend.push("module.first", args = [1])
+
+        for attempts in range(1, 4):
+            job = backend.claim("owner%d" % attempts)
+
+            self.assertEqual(job["_id"], identifier)
+            self.assertEqual(job["args"], [1])
+            self.assertEqual(job["attempts"], attempts)
+            self.assertEqual(backend.count(), 1)
+
+            backend.fail(job)
+
+        self.assertEqual(backend.count(), 0)
+        self.assertEqual(backend.claim("owner1"), None)
+
+        keys = self.connection.keys("quorum:test:jobs:*")
+
+        self.assertEqual(keys, [])
+
+    def _backend(self, *args, **kwargs):
+        return quorum.RedisBackend(
+            prefix = "quorum:test:jobs",
+            connection = self.connection,
+            *args,
+            **kwargs
+        )
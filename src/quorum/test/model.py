@@ -37,6 +37,9 @@ __copyright__ = "Copyright (c) 2008-2020 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import types
+import flask
+
 import quorum
 
 from . import mock
@@ -105,6 +108,113 @@ class ModelTest(quorum.TestCase):
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0].age, 1)
 
+    @quorum.secured
+    def test_find_iter(self):
+        result = mock.Person.find_iter(age = 1)
+        self.assertEqual(list(result), [])
+
+        result = mock.Person.find_iter(age = 1, raise_e = True)
+        self.assertRaises(quorum.NotFoundError, lambda: list(result))
+
+        for index in range(5):
+            person = mock.Person()
+            person.age = 1
+            person.name = "Name%d" % index
+            person.save()
+
+        result = mock.Person.find_iter(age = 1, batch = 2, sort = [("name", -1)])
+        self.assertEqual(isinstance(result, types.GeneratorType), True)
+
+        result = list(result)
+        self.assertEqual(len(result), 5)
+        self.assertEqual([person.name for person in result], ["Name4", "Name3", "Name2", "Name1", "Name0"])
+        self.assertEqual(isinstance(result[0], mock.Person), True)
+
+        result = list(mock.Person.find_iter(map = True, batch = 3, skip = 1, limit = 3, sort = [("name", 1)]))
+        self.assertEqual([person["name"] for person in result], ["Name1", "Name2", "Name3"])
+        self.assertEqual(isinstance(result[0], dict), True)
+
+    @quorum.secured
+    def test_paginate_keyset(self):
+        for index in range(7):
+            person = mock.Person()
+            person.age = index % 3
+            person.name = "Name%d" % index
+            person.save()
+
+        page = mock.Person.paginate_keyset(limit = 3, sort = [("age", 1)], count = True)
+        names = [person.name for person in page["models"]]
+
+        self.assertEqual(names, ["Name0", "Name3", "Name6"])
+        self.assertEqual(page["size"], 3)
+        self.assertEqual(page["total"], 7)
+        self.assertEqual(page["previous"], None)
+        self.assertNotEqual(page["next"], None)
+
+        page = mock.Person.paginate_keyset(limit = 3, cursor = page["next"], sort = [("age", 1)])
+        names = [person.name for person in page["models"]]
+
+        self.assertEqual(names, ["Name1", "Name4", "Name2"])
+        self.assertEqual(page["total"], None)
+        self.assertNotEqual(page["previous"], None)
+        self.assertNotEqual(page["next"], None)
+
+        previous = page["previous"]
+        page = mock.Person.paginate_keyset(limit = 3, cursor = page["next"], sort = [("age", 1)])
+        names = [person.name for person in page["models"]]
+
+        self.assertEqual(names, ["Name5"])
+        self.assertEqual(page["next"], None)
+        self.assertNotEqual(page["previous"], None)
+
+        page = mock.Person.paginate_keyset(limit = 3, cursor = page["previous"], sort = [("age", 1)])
+        names = [person.name for person in page["models"]]
+
+        self.assertEqual(names, ["Name1", "Name4", "Name2"])
+
+        page = mock.Person.paginate_keyset(limit = 3, cursor = previous, sort = [("age", 1)])
+        names = [person.name for person in page["models"]]
+
+        self.assertEqual(names, ["Name0", "Name3", "Name6"])
+        self.assertEqual(page["previous"], None)
+        self.assertNotEqual(page["next"], None)
+
+        page = mock.Person.paginate_keyset(limit = 2, map = True, age = 1)
+        names = [person["name"] for person in page["models"]]
+
+        self.assertEqual(names, ["Name1", "Name4"])
+        self.assertEqual(page["next"], None)
+
+        page = mock.Person.paginate_keyset(limit = 1, map = True, age = 1)
+        page = mock.Person.paginate_keyset(limit = 1, cursor = page["next"], map = True, age = 1)
+        names = [person["name"] for person in page["models"]]
+
+        self.assertEqual(names, ["Name4"])
+        self.assertEqual(page["next"], None)
+
+        page = mock.Person.paginate_keyset(limit = 2, count = True, fields = ["name", "age"])
+        self.assertEqual(page["size"], 2)
+        self.assertEqual(page["total"], 7)
+
+        page = mock.Person.paginate_keyset(limit = 2, count = True, fill = False, eager_l = False)
+        self.assertEqual(page["size"], 2)
+        self.assertEqual(page["total"], 7)
+
+        page = mock.Person.paginate_keyset(limit = 2, count = True, find_s = "Name1", find_n = "name")
+        names = [person.name for person in page["models"]]
+
+        self.assertEqual(names, ["Name1"])
+        self.assertEqual(page["total"], 1)
+
+        page = mock.Person.paginate_keyset(limit = 2, count = True, find_d = ["age:equals:2"])
+        self.assertEqual(page["size"], 2)
+        self.assertEqual(page["total"], 2)
+
+        self.assertRaises(
+            quorum.OperationalError,
+            lambda: mock.Person.paginate_keyset(limit = 3, cursor = "invalid")
+        )
+
     @quorum.secured
     def test_count(self):
         result = mock.Person.count()
@@ -118,6 +228,40 @@ class ModelTest(quorum.TestCase):
         result = mock.Person.count()
         self.assertEqual(result, 1)
 
+    @quorum.secured
+    def test_count_strategies(self):
+        for index in range(3):
+            person = mock.Person()
+            person.age = index % 2
+            person.name = "Name%d" % index
+            person.save()
+
+        self.assertEqual(mock.Person.count(age = 0), 2)
+        self.assertEqual(mock.Person.count(age = 1, count_s = "exact"), 1)
+        self.assertEqual(mock.Person.count(count_s = "estimated"), 3)
+        self.assertEqual(mock.Person.count(age = 0, count_s = "estimated"), 2)
+        self.assertEqual(mock.Person.count(age = 0, count_s = "cached"), 2)
+        self.assertEqual(mock.Person.count(count_s = "cached"), 3)
+
+        collection = mock.Person._collection()
+        collection.insert(dict(name = "Raw", age = 0))
+
+        self.assertEqual(mock.Person.count(age = 0), 3)
+        self.assertEqual(mock.Person.count(age = 0, count_s = "cached"), 2)
+
+        person = mock.Person()
+        person.age = 0
+        person.name = "Name3"
+        person.save()
+
+        self.assertEqual(mock.Person.count(age = 0, count_s = "cached"), 4)
+        self.assertEqual(mock.Person.count(count_s = "cached"), 5)
+
+        self.assertRaises(
+            quorum.OperationalError,
+            lambda: mock.Person.count(count_s = "invalid")
+        )
+
     @quorum.secured
     def test_delete(self):
         result = mock.Person.count()
@@ -258,6 +402,69 @@ class ModelTest(quorum.TestCase):
         self.assertEqual(person.identifier, 4)
         self.assertEqual(person.name, "Name4")
 
+    @quorum.secured
+    def test_increment_block(self):
+        definition = mock.Person.definition_n("identifier")
+        definition["increment_block"] = 5
+        getpid = quorum.model.os.getpid
+        try:
+            values = []
+            for index in range(3):
+                person = mock.Person()
+                person.name = "Name%d" % index
+                person.save()
+                values.append(person.identifier)
+
+            people = [mock.Person(model = dict(name = "Name%d" % index)) for index in range(3, 7)]
+            mock.Person.save_many(people)
+            values.extend(person.identifier for person in people)
+
+            self.assertEqual(values, [1, 2, 3, 4, 5, 6, 7])
+
+            collection = mock.Person._collection(name = "counters")
+            counter = collection.find_one({"_id" : "person:identifier"})
+
+            self.assertEqual(counter["seq"], 10)
+
+            person = mock.Person()
+            person.name = "Name7"
+            person.identifier = 8
+            person.save()
+
+            person = mock.Person()
+            person.name = "Name8"
+            person.save()
+
+            self.assertEqual(person.identifier, 11)
+
+            quorum.model.os.getpid = lambda: -1
+
+            person = mock.Person()
+            person.name = "Name9"
+            person.save()
+
+            self.assertEqual(person.identifier, 16)
+
+            quorum.model.os.getpid = getpid
+
+            person = mock.Person()
+            person.name = "Name10"
+            person.save()
+
+            self.assertEqual(person.identifier, 12)
+
+            mock.Person._increment_reset()
+
+            person = mock.Person()
+            person.name = "Name11"
+            person.save()
+
+            self.assertEqual(person.identifier, 21)
+        finally:
+            quorum.model.os.getpid = getpid
+            del definition["increment_block"]
+            mock.Person._increment_reset()
+
     def test_ensure_min(self):
         person = mock.Person()
         person.identifier = 10
@@ -552,6 +759,291 @@ class ModelTest(quorum.TestCase):
         self.assertEqual(person.father.car.is_resolved(), True)
         self.assertEqual(person.father.car.name, "CarFather")
 
+    @quorum.secured
+    def test_eager_many(self):
+        cat = mock.Cat()
+        cat.name = "NameCat"
+        cat.save()
+
+        cat_friend = mock.Cat()
+        cat_friend.name = "NameCatFriend"
+        cat_friend.save()
+
+        cat.friend = cat_friend
+        cat.save()
+
+        for index in range(3):
+            person = mock.Person()
+            person.name = "Name%d" % index
+            person.cats = [cat, cat_friend]
+            person.save()
+
+        person = mock.Person()
+        person.name = "NameOther"
+        person.save()
+
+        people = mock.Person.find(eager = ("cats.friend",))
+
+        self.assertEqual(len(people), 4)
+        for person in people[:3]:
+            self.assertEqual(person.cats.is_resolved(), True)
+            self.assertEqual(len(person.cats), 2)
+            self.assertEqual(person.cats[0].name, "NameCat")
+            self.assertEqual(person.cats[1].name, "NameCatFriend")
+            self.assertEqual(person.cats[0].friend.is_resolved(), True)
+            self.assertEqual(person.cats[0].friend.name, "NameCatFriend")
+            self.assertEqual(person.cats[1].friend, None)
+        self.assertEqual(len(people[3].cats), 0)
+
+        people = mock.Person.find(map = True, eager = ("cats.friend",))
+
+        self.assertEqual(len(people), 4)
+        for person in people[:3]:
+            self.assertEqual(isinstance(person["cats"], list), True)
+            self.assertEqual(len(person["cats"]), 2)
+            self.assertEqual(person["cats"][0]["name"], "NameCat")
+            self.assertEqual(person["cats"][0]["friend"]["name"], "NameCatFriend")
+            self.assertEqual(person["cats"][1]["friend"], None)
+        self.assertEqual(people[3]["cats"], [])
+
+        cat_friend.delete()
+
+        people = mock.Person.find(eager = ("cats",))
+
+        self.assertEqual(len(people), 4)
+        self.assertEqual(people[0].cats.is_resolved(), True)
+        self.assertEqual(people[0].cats[0].name, "NameCat")
+        self.assertEqual(people[0].cats[1].is_resolved(), False)
+        self.assertEqual(people[0].cats[1].is_resolvable(), False)
+
+    @quorum.secured
+    def test_identity(self):
+        person = mock.Person()
+        person.name = "Name"
+        person.save()
+
+        with quorum.get_app().test_request_context(base_url = "http://localhost"):
+            flask.request.identity = quorum.IdentityMap()
+
+            person = mock.Person.get(identifier = 1)
+            person_c = mock.Person.get(identifier = 1)
+
+            self.assertEqual(person_c.name, "Name")
+            self.assertNotEqual(id(person_c), id(person))
+            self.assertEqual(flask.request.identity.hits, 1)
+            self.assertEqual(flask.request.identity.misses, 1)
+
+            person.name = "NameChanged"
+            person.save()
+
+            person = mock.Person.get(identifier = 1)
+
+            self.assertEqual(person.name, "NameChanged")
+            self.assertEqual(flask.request.identity.hits, 1)
+            self.assertEqual(flask.request.identity.misses, 2)
+
+            people = mock.Person.find()
+            person = mock.Person.get(identifier = 1)
+
+            self.assertEqual(len(people), 1)
+            self.assertEqual(person.name, "NameChanged")
+            self.assertEqual(flask.request.identity.hits, 2)
+
+    @quorum.secured
+    def test_identity_unique(self):
+        for name in ("Name0", "Name1"):
+            person = mock.Person()
+            person.name = name
+            person.age = 5
+            person.save()
+
+        with quorum.get_app().test_request_context(base_url = "http://localhost"):
+            flask.request.identity = quorum.IdentityMap()
+
+            people = mock.Person.find(age = 5)
+            person = mock.Person.get(age = 5)
+
+            self.assertEqual(len(people), 2)
+            self.assertEqual(people[1].name, "Name1")
+            self.assertEqual(person.name, "Name0")
+            self.assertEqual(flask.request.identity.has("person", "age", 5), False)
+
+            people = mock.Person.find(identifier = {"$in" : [1, 2]})
+            self.assertEqual(len(people), 2)
+            self.assertEqual(flask.request.identity.has("person", "identifier", 2), True)
+
+    @quorum.secured
+    def test_cache(self):
+        mock.Person._cache = quorum.MemoryCache()
+
+        try:
+            person = mock.Person()
+            person.name = "Name"
+            person.save()
+
+            people = mock.Person.find(name = "Name")
+            people_c = mock.Person.find(name = "Name")
+
+            self.assertEqual(len(people), 1)
+            self.assertEqual(len(people_c), 1)
+            self.assertEqual(people_c[0].name, "Name")
+            self.assertEqual(mock.Person._cache.hits, 1)
+            self.assertEqual(mock.Person._cache.misses, 1)
+
+            self.assertEqual(mock.Person.count(), 1)
+            self.assertEqual(mock.Person.count(), 1)
+            self.assertEqual(mock.Person._cache.hits, 2)
+
+            person = mock.Person()
+            person.name = "NameExtra"
+            person.save()
+
+            people = mock.Person.find()
+
+            self.assertEqual(len(people), 2)
+            self.assertEqual(mock.Person.count(), 2)
+
+            person.delete()
+
+            self.assertEqual(len(mock.Person.find()), 1)
+            self.assertEqual(mock.Person.count(), 1)
+
+            mock.Person.delete_c()
+
+            self.assertEqual(mock.Person.find(), [])
+            self.assertEqual(mock.Person.count(), 0)
+            self.assertEqual(mock.Person._cache.hits, 2)
+        finally:
+            mock.Person._cache = None
+
+    @quorum.secured
+    def test_dirty(self):
+        person = mock.Person()
+        person.name = "Name"
+        person.age = 20
+        person.info = dict(city = "Porto")
+        person.save()
+
+        person = mock.Person.get(identifier = 1)
+
+        collection = mock.Person._collection()
+        collection.update(dict(_id = person._id), {"$set" : dict(age = 30)})
+
+        person.save()
+        person = mock.Person.get(identifier = 1)
+
+        self.assertEqual(person.name, "Name")
+        self.assertEqual(person.age, 30)
+
+        collection.update(dict(_id = person._id), {"$set" : dict(age = 40)})
+
+        person.name = "NameChanged"
+        person.info["city"] = "Lisbon"
+        person.save()
+        person = mock.Person.get(identifier = 1)
+
+        self.assertEqual(person.name, "NameChanged")
+        self.assertEqual(person.age, 40)
+        self.assertEqual(person.info, dict(city = "Lisbon"))
+
+        person.age = 50
+        person.save()
+        person.name = "NameOther"
+        person.save()
+        person = mock.Person.get(identifier = 1)
+
+        self.assertEqual(person.name, "NameOther")
+        self.assertEqual(person.age, 50)
+
+    @quorum.secured
+    def test_dirty_nested(self):
+        person = mock.Person()
+        person.name = "Name"
+        person.info = dict(address = dict(city = "Porto"), tags = ["a"])
+        person.save()
+
+        person = mock.Person.get(identifier = 1)
+        snapshot = person.__dict__["_snapshot"]
+
+        self.assertEqual(isinstance(snapshot["info"], dict), False)
+        self.assertEqual(snapshot["name"], "Name")
+        self.assertEqual(
+            person._dirty(dict(name = "Name", info = dict(address = dict(city = "Porto"), tags = ["a"]))),
+            dict()
+        )
+
+        person.info["address"]["city"] = "Lisbon"
+        person.info["tags"].append("b")
+
+        self.assertEqual(list(person._dirty(person._filter(normalize = True)).keys()), ["info"])
+
+        person.save()
+        person = mock.Person.get(identifier = 1)
+
+        self.assertEqual(person.info, dict(address = dict(city = "Lisbon"), tags = ["a", "b"]))
+
+    @quorum.secured
+    def test_save_many(self):
+        events = []
+
+        people = []
+        for index in range(3):
+            person = mock.Person()
+            person.name = "Name%d" % index
+            person.bind("post_create", lambda: events.append("post_create"))
+            people.append(person)
+
+        result = mock.Person.save_many(people)
+
+        self.assertEqual(result, people)
+        self.assertEqual(events, ["post_create"] * 3)
+        self.assertEqual([person.identifier for person in people], [1, 2, 3])
+        self.assertEqual(mock.Person.count(), 3)
+        self.assertEqual(mock.Person.get(identifier = 2).name, "Name1")
+
+        person = mock.Person()
+        person.name = "Name3"
+        people[0].name = "NameChanged"
+        mock.Person.save_many(people + [person])
+
+        self.assertEqual(person.identifier, 4)
+        self.assertEqual(mock.Person.count(), 4)
+        self.assertEqual(mock.Person.get(identifier = 1).name, "NameChanged")
+        self.assertEqual(mock.Person.get(identifier = 4).name, "Name3")
+
+        person = mock.Person()
+        person.name = "Name4"
+        self.assertRaises(
+            quorum.ValidationError,
+            lambda: mock.Person.save_many([person, mock.Person()])
+        )
+        self.assertEqual(mock.Person.count(), 4)
+
+        person = mock.Person()
+        person.name = "Name5"
+        person.save()
+
+        self.assertEqual(person.identifier, 5)
+
+    @quorum.secured
+    def test_save_many_order(self):
+        events = []
+
+        people = []
+        for index in range(2):
+            person = mock.Person()
+            person.name = "Name%d" % index
+            person.bind("pre_validate", lambda index = index: events.append("pre_validate%d" % index))
+            person.bind("pre_save", lambda index = index: events.append("pre_save%d" % index))
+            people.append(person)
+
+        mock.Person.save_many(people)
+
+        self.assertEqual(
+            events,
+            ["pre_validate0", "pre_save0", "pre_validate1", "pre_save1"]
+        )
+
     @quorum.secured
     def test_unresolvable(self):
         person = mock.Person()
@@ -611,6 +1103,56 @@ class ModelTest(quorum.TestCase):
         self.assertEqual(second.info, {})
         self.assertNotEqual(id(first.info), id(second.info))
 
+    @quorum.secured
+    def test_load_plan(self):
+        plan = mock.Person._load_plan()
+        names = [name for name, _caster, _default, _private, _increment in plan]
+
+        self.assertEqual(plan is mock.Person._load_plan(), True)
+        self.assertEqual("_id" in names, False)
+        self.assertEqual("name" in names, True)
+        self.assertEqual("age" in names, True)
+
+        result = mock.Person.types(dict(_id = "1", name = b"Name", age = "30", other = "1"))
+
+        self.assertEqual(result["_id"], "1")
+        self.assertEqual(result["name"], "Name")
+        self.assertEqual(result["age"], 30)
+        self.assertEqual(result["other"], "1")
+
+        result = mock.Person.types(dict(age = "invalid"))
+
+        self.assertEqual(result["age"], None)
+
+        result = mock.Person.fill(dict(name = "Name"), safe = True)
+
+        self.assertEqual(result["name"], "Name")
+        self.assertEqual(result["info"], {})
+        self.assertEqual("_id" in result, False)
+        self.assertEqual("identifier" in result, False)
+
+    @quorum.secured
+    def test_getattribute(self):
+        person = mock.Person(fill = False)
+        person.name = "Name"
+
+        self.assertEqual(person.name, "Name")
+        self.assertEqual(person.__class__, mock.Person)
+        self.assertEqual(person.model["name"], "Name")
+        self.assertEqual(callable(person.save), True)
+        self.assertRaises(AttributeError, lambda: person.age)
+        self.assertRaises(AttributeError, lambda: person.unknown)
+        self.assertEqual(hasattr(person, "age"), False)
+        self.assertEqual(getattr(person, "age", None), None)
+
+        person.age = 20
+
+        self.assertEqual(person.age, 20)
+
+        del person.age
+
+        self.assertRaises(AttributeError, lambda: person.age)
+
     @quorum.secured
     def test_wrap(self):
         person = mock.Person.wrap(dict(name = "Person"))
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Flask Quorum
+# Copyright (c) 2008-2020 Hive Solutions Lda.
+#
+# This file is part of Hive Flask Quorum.
+#
+# Hive Flask Quorum is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Flask Quorum is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Flask Quorum. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__version__ = "1.0.0"
+""" The version of the module """
+
+__revision__ = "$LastChangedRevision$"
+""" The revision number of the module """
+
+__date__ = "$LastChangedDate$"
+""" The last change date of the module """
+
+__copyright__ = "Copyright (c) 2008-2020 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+import os
+import flask
+import shutil
+import tempfile
+
+import quorum
+
+class TemplateTest(quorum.TestCase):
+
+    def setUp(self):
+        quorum.load(name = __name__, locales = ("en_us", "pt_pt"))
+        self.path = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.path, "email"))
+        for name in ("index.html", "index.pt_pt.html", "email/base.pt.html"):
+            file = open(os.path.join(self.path, name), "wb")
+            try: file.write(b"")
+            finally: file.close()
+        app = quorum.get_app()
+        app.template_folder = self.path
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors = True)
+        quorum.unload()
+
+    @quorum.secured
+    def test_resolve(self):
+        app = quorum.get_app()
+
+        with app.test_request_context(base_url = "http://localhost"):
+            quorum.before_request()
+
+            self.assertEqual(quorum.template_resolve("index.html"), "index.html")
+
+            flask.request.locale = "pt_pt"
+            self.assertEqual(quorum.template_resolve("index.html"), "index.pt_pt.html")
+            self.assertEqual(quorum.template_resolve("email/base.html"), "email/base.pt.html")
+
+            flask.request.locale = "en_us"
+            self.assertEqual(quorum.template_resolve("email/base.html"), "email/base.html")
+            self.assertEqual(quorum.template_resolve("other.html"), "other.html")
+
+    @quorum.secured
+    def test_cache(self):
+        app = quorum.get_app()
+
+        with app.test_request_context(base_url = "http://localhost"):
+            quorum.before_request()
+            flask.request.locale = "pt_pt"
+
+            self.assertEqual(quorum.template_resolve("index.html"), "index.pt_pt.html")
+            self.assertEqual(len(quorum.template.RESOLVED), 1)
+
+            os.remove(os.path.join(self.path, "index.pt_pt.html"))
+            self.assertEqual(quorum.template_resolve("index.html"), "index.pt_pt.html")
+
+            quorum.template_invalidate()
+            self.assertEqual(quorum.template_resolve("index.html"), "index.html")
+
+            app.debug = True
+            quorum.template_invalidate()
+            self.assertEqual(quorum.template_resolve("index.html"), "index.html")
+            self.assertEqual(len(quorum.template.RESOLVED), 0)
+            app.debug = False
+
+    @quorum.secured
+    def test_scan(self):
+        app = quorum.get_app()
+
+        count = quorum.template_scan()
+        self.assertEqual(count, 3)
+        self.assertEqual("email/base.pt.html" in quorum.template.SCANNED, True)
+
+        with app.test_request_context(base_url = "http://localhost"):
+            quorum.before_request()
+            flask.request.locale = "pt_pt"
+
+            file = open(os.path.join(self.path, "other.pt.html"), "wb")
+            try: file.write(b"")
+            finally: file.close()
+
+            self.assertEqual(quorum.template_resolve("other.html"), "other.html")
+            self.assertEqual(quorum.template_resolve("email/base.html"), "email/base.pt.html")
+
+            quorum.template_scan()
+            self.assertEqual(quorum.template_resolve("other.html"), "other.pt.html")
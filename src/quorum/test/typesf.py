@@ -133,6 +133,50 @@ class TypesfTest(quorum.TestCase):
         self.assertEqual(isinstance(person.cats, quorum.References), True)
         self.assertEqual(len(person.cats), 3)
 
+    @quorum.secured
+    def test_references_resolve(self):
+        for index in range(3):
+            cat = mock.Cat()
+            cat.name = "NameCat%d" % index
+            cat.save()
+
+        person = mock.Person()
+        person.name = "Name"
+        person.cats = mock.Person.cats["type"]([3, 1, 4, 2])
+        person.save()
+
+        person = mock.Person.get(identifier = 1)
+
+        self.assertEqual(person.cats.is_resolved(), False)
+
+        result = person.cats.resolve()
+
+        self.assertEqual(person.cats.is_resolved(), True)
+        self.assertEqual(len(result), 4)
+        self.assertEqual(result[0].name, "NameCat2")
+        self.assertEqual(result[1].name, "NameCat0")
+        self.assertEqual(result[2], None)
+        self.assertEqual(result[3].name, "NameCat1")
+
+        person = mock.Person.get(identifier = 1)
+        names = [cat.name for cat in person.cats if cat.is_resolved()]
+
+        self.assertEqual(names, ["NameCat2", "NameCat0", "NameCat1"])
+
+        person = mock.Person.get(identifier = 1)
+        result = person.cats.map_v()
+
+        self.assertEqual(len(result), 4)
+        self.assertEqual(isinstance(result[0], dict), True)
+        self.assertEqual(result[0]["name"], "NameCat2")
+        self.assertEqual(result[2], None)
+        self.assertEqual(result[3]["name"], "NameCat1")
+
+        result = person.cats.map_v(resolve = False)
+
+        self.assertEqual(result[0]["name"], "NameCat2")
+        self.assertEqual(result[2], 4)
+
     @quorum.secured
     def test_file(self):
         file_m = dict(name = "hello", data = b"SGVsbG8gV29ybGQ=")
@@ -183,6 +227,34 @@ class TypesfTest(quorum.TestCase):
         self.assertEqual(result.value, "vGgMtFgyMVwH3uE=:encrypted")
         self.assertEqual(result.encrypted, "vGgMtFgyMVwH3uE=:encrypted")
 
+    @quorum.secured
+    def test_encrypted_lazy(self):
+        encrypted = quorum.encrypted(key = b"lazy key")
+        value = encrypted("hello world").encrypted
+        quorum.typesf.DECRYPTED.clear()
+
+        result = encrypted(value)
+
+        self.assertEqual(result.is_decrypted(), False)
+        self.assertEqual(result.json_v(), value)
+        self.assertEqual(result.is_decrypted(), False)
+        self.assertEqual(len(quorum.typesf.DECRYPTED), 0)
+
+        self.assertEqual(str(result), "hello world")
+        self.assertEqual(result.is_decrypted(), True)
+        self.assertEqual(len(quorum.typesf.DECRYPTED), 1)
+
+        result = encrypted(value)
+
+        self.assertEqual(result.is_decrypted(), False)
+        self.assertEqual(result.value, "hello world")
+        self.assertEqual(len(quorum.typesf.DECRYPTED), 1)
+
+        copy = encrypted(encrypted(value))
+
+        self.assertEqual(copy.is_decrypted(), False)
+        self.assertEqual(copy.value, "hello world")
+
     @quorum.secured
     def test_dumpall(self):
         person = mock.Person()
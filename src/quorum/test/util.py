@@ -177,6 +177,70 @@ class UtilTest(quorum.TestCase):
         result = quorum.is_bot(user_agent = "")
         self.assertEqual(result, False)
 
+    @quorum.secured
+    def test_user_agent_info(self):
+        user_agent = "Mozilla/5.0 (iPhone; CPU iPhone OS 10_3_1 like Mac OS X) AppleWebKit/603.1.30 (KHTML, like Gecko) Version/10.0 Mobile/14E304 Safari/602.1"
+        quorum.util.USER_AGENTS.clear()
+        stats = quorum.user_agent_stats()
+
+        result = quorum.user_agent_info(user_agent)
+        self.assertEqual(result["mobile"], True)
+        self.assertEqual(result["tablet"], True)
+        self.assertEqual(result["browser"]["name"], "Safari")
+
+        result = quorum.browser_info(user_agent = user_agent)
+        result["name"] = "Changed"
+
+        self.assertEqual(quorum.browser_info(user_agent = user_agent)["name"], "Safari")
+        self.assertEqual(quorum.is_mobile(user_agent = user_agent), True)
+
+        _stats = quorum.user_agent_stats()
+        self.assertEqual(_stats["misses"] - stats["misses"], 1)
+        self.assertEqual(_stats["hits"] - stats["hits"], 3)
+        self.assertEqual(_stats["size"], 1)
+
+        size = quorum.util.USER_AGENTS_SIZE
+        quorum.util.USER_AGENTS_SIZE = 2
+        try:
+            quorum.user_agent_info("First")
+            quorum.user_agent_info(user_agent)
+            quorum.user_agent_info("Second")
+
+            self.assertEqual(list(quorum.util.USER_AGENTS.keys()), [user_agent, "Second"])
+        finally:
+            quorum.util.USER_AGENTS_SIZE = size
+
+    @quorum.secured
+    def test_user_agent_fields(self):
+        user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"
+        quorum.util.USER_AGENTS.clear()
+        stats = quorum.user_agent_stats()
+
+        result = quorum.is_mobile(user_agent = user_agent)
+        self.assertEqual(result, False)
+
+        info = quorum.util.USER_AGENTS[user_agent]
+        self.assertEqual(info["mobile"], False)
+        self.assertEqual("tablet" in info, False)
+        self.assertEqual("browser" in info, False)
+
+        result = quorum.is_browser(user_agent = user_agent)
+        self.assertEqual(result, True)
+        self.assertEqual(info["browser"]["name"], "Chrome")
+        self.assertEqual("tablet" in info, False)
+
+        result = quorum.user_agent_info(user_agent)
+        self.assertEqual(result is info, True)
+        self.assertEqual(result["tablet"], False)
+        self.assertEqual(sorted(result.keys()), ["browser", "mobile", "tablet"])
+
+        result = quorum.is_tablet(user_agent = user_agent)
+        self.assertEqual(result, False)
+
+        _stats = quorum.user_agent_stats()
+        self.assertEqual(_stats["misses"] - stats["misses"], 3)
+        self.assertEqual(_stats["hits"] - stats["hits"], 1)
+
     @quorum.secured
     def test_browser_info(self):
         result = quorum.browser_info(user_agent = "Mozilla/5.0 (Windows NT 10.0) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/42.0.2311.135 Safari/537.36 Edge/12.10136")
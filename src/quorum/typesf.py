@@ -40,6 +40,8 @@ __license__ = "Apache License, Version 2.0"
 import uuid
 import base64
 import hashlib
+import threading
+import collections
 
 from . import util
 from . import crypt
@@ -49,6 +51,19 @@ from . import config
 from . import storage
 from . import exceptions
 
+DECRYPTED_SIZE = 1024
+""" The maximum number of recently decrypted values kept in
+the cache of the encrypted types, the least recently used
+values are discarded once the limit is reached """
+
+DECRYPTED = collections.OrderedDict()
+""" The cache associating the cipher, key and encrypted value
+with the resulting decrypted value, avoiding the decryption of
+the same (hot) values over and over """
+
+DECRYPTED_LOCK = threading.RLock()
+""" The lock that controls the access to the decrypted cache """
+
 class AbstractType(object):
 
     def json_v(self, *args, **kwargs):
@@ -806,6 +821,84 @@ def reference(target, name = None, dumpall = False):
 
     return _Reference
 
+def resolve_many(references, *args, **kwargs):
+    """
+    Resolves the provided sequence of reference objects using a
+    single data source query (``$in`` based) per target model,
+    instead of one query per reference.
+
+    The resolved objects are attached to each of the references,
+    meaning that any further ``resolve()`` call on them is not
+    going to hit the data source.
+
+    :type references: List
+    :param references: The sequence of reference objects to be
+    resolved, these may target different models.
+    :rtype: List
+    :return: The same sequence of references, now resolved, note
+    that the ones that were not found will hold an unset object.
+    """
+
+    # creates the map that is going to group the pending references
+    # by their target model and join attribute name, this is required
+    # as a single query is going to be performed for each of them
+    groups = dict()
+
+    # iterates over the complete set of references to filter the ones
+    # that are still pending resolution, an unset reference is going
+    # to be resolved to an invalid value (as done by resolve)
+    for reference in references:
+        if reference.is_resolved(): continue
+        if not reference.id:
+            reference.__dict__["_object"] = None
+            continue
+        key = (reference._target, reference._name)
+        group = groups.get(key, [])
+        group.append(reference)
+        groups[key] = group
+
+    # iterates over each of the groups to run the batched query for
+    # the complete set of (unique) identifiers and then associates the
+    # retrieved objects with each of the references of the group
+    for (target, name), group in legacy.iteritems(groups):
+        # in case there's an identity map for the current request
+        # the references that are present in it are resolved using
+        # it (no data source access) and removed from the group
+        identity = target._identity()
+        if identity:
+            _group = []
+            for reference in group:
+                exists = identity.has(target._name(), name, reference.id)
+                if exists: reference.resolve(*args, **kwargs)
+                else: _group.append(reference)
+            group = _group
+        if not group: continue
+
+        ids = []
+        ids_s = set()
+        for reference in group:
+            if reference.id in ids_s: continue
+            ids.append(reference.id)
+            ids_s.add(reference.id)
+
+        _kwargs = dict(kwargs)
+        _kwargs[name] = {"$in" : ids}
+        _kwargs["raise_e"] = _kwargs.get("raise_e", False)
+        _kwargs["eager_l"] = _kwargs.get("eager_l", False)
+        _kwargs["resolve_a"] = _kwargs.get("resolve_a", False)
+        objects = target.find(*args, **_kwargs)
+
+        objects_m = dict()
+        for object in objects: objects_m[object[name]] = object
+
+        for reference in group:
+            _object = objects_m.get(reference.id, None)
+            reference.__dict__["_object"] = _object
+
+    # returns the provided sequence of references to the caller
+    # method, the references should now be properly resolved
+    return references
+
 class References(AbstractType):
     pass
 
@@ -831,6 +924,7 @@ def references(target, name = None, dumpall = False):
             return self.objects.__len__()
 
         def __iter__(self):
+            self.resolve()
             return self.objects.__iter__()
 
         def __bool__(self):
@@ -893,7 +987,10 @@ def references(target, name = None, dumpall = False):
             return [object.json_v(*args, **kwargs) for object in self.objects]
 
         def map_v(self, *args, **kwargs):
-            return [object.map_v(*args, **kwargs) for object in self.objects]
+            resolve = kwargs.get("resolve", True)
+            if not resolve: return [object.map_v(*args, **kwargs) for object in self.objects]
+            objects = self.resolve()
+            return [object.map(*args, **kwargs) if object else object for object in objects]
 
         def val(self, *args, **kwargs):
             return [object.val(*args, **kwargs) for object in self.objects]
@@ -902,7 +999,11 @@ def references(target, name = None, dumpall = False):
             return [object.val() for object in self.objects]
 
         def resolve(self, *args, **kwargs):
-            return [object.resolve(*args, **kwargs) for object in self.objects]
+            # runs the batched resolution of the complete set of reference
+            # objects (single query) and then returns the resolved objects
+            # respecting the original order of the identifiers
+            resolve_many(self.objects, *args, **kwargs)
+            return [object._object for object in self.objects]
 
         def find(self, *args, **kwargs):
             kwargs = dict(kwargs)
@@ -981,19 +1082,34 @@ def encrypted(cipher = "spritz", key = None, encoding = "utf-8"):
         def __bool__(self):
             return bool(self.value)
 
+        @property
+        def value(self):
+            # in case the value has not been decrypted yet (lazy
+            # decryption) decrypts it now and caches it so that
+            # further accesses don't pay the cipher cost
+            if self._value == None: self._value = self._decrypt_c(self.encrypted)
+            return self._value
+
+        @value.setter
+        def value(self, value):
+            self._value = value
+
         def build(self, value):
             self.value = value
             self.encrypted = self._encrypt(value)
 
         def build_e(self, encrypted):
             self.encrypted = encrypted
-            self.value = self._decrypt(encrypted)
+            self.value = None
 
         def build_i(self, instance):
             self.key = instance.key
-            self.value = instance.value
+            self.value = instance._value
             self.encrypted = instance.encrypted
 
+        def is_decrypted(self):
+            return not self._value == None
+
         def json_v(self, *args, **kwargs):
             return self.encrypted
 
@@ -1007,6 +1123,33 @@ def encrypted(cipher = "spritz", key = None, encoding = "utf-8"):
             encrypted = legacy.str(encrypted, encoding = encoding)
             return encrypted + cls.PADDING
 
+        def _decrypt_c(self, value):
+            # in case there's no key the value is returned as it is
+            # (no decryption and no need for caching)
+            if not self.key: return value
+
+            # tries to retrieve the decrypted value from the cache of
+            # recently decrypted values (marking it as recently used)
+            _key = (cipher, self.key, value)
+            DECRYPTED_LOCK.acquire()
+            try:
+                decrypted = DECRYPTED.get(_key, None)
+                if not decrypted == None: DECRYPTED[_key] = DECRYPTED.pop(_key)
+            finally:
+                DECRYPTED_LOCK.release()
+            if not decrypted == None: return decrypted
+
+            # decrypts the value and stores it in the cache, discarding
+            # the least recently used values in case the limit is reached
+            decrypted = self._decrypt(value)
+            DECRYPTED_LOCK.acquire()
+            try:
+                DECRYPTED[_key] = decrypted
+                while len(DECRYPTED) > DECRYPTED_SIZE: DECRYPTED.popitem(last = False)
+            finally:
+                DECRYPTED_LOCK.release()
+            return decrypted
+
         def _decrypt(self, value, strict = False):
             if not self.key and not strict: return value
             cls = self.__class__
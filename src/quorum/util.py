@@ -52,6 +52,7 @@ import functools
 import itertools
 import threading
 import subprocess
+import collections
 
 import jinja2
 
@@ -150,6 +151,25 @@ FIND_DEFAULTS = dict(
 """ The map that defines the various default values
 for a series of find related attributes """
 
+USER_AGENTS_SIZE = 1024
+""" The maximum number of user agent classifications kept in
+the cache, the least recently used ones are discarded """
+
+USER_AGENTS = collections.OrderedDict()
+""" The cache associating the raw user agent strings with their
+complete classification (mobile, tablet and browser information) """
+
+USER_AGENTS_LOCK = threading.RLock()
+""" The lock that controls the access to the user agents cache """
+
+USER_AGENTS_STATS = dict(hits = 0, misses = 0)
+""" The map containing the counters for the lookups of the user
+agents cache, used for the calculus of the hit ratio """
+
+USER_AGENT_FIELDS = ("mobile", "tablet", "browser")
+""" The sequence containing the names of the fields of the complete
+classification of an user agent, each computed only when requested """
+
 def is_iterable(object):
     return isinstance(object, defines.ITERABLES)
 
@@ -289,11 +309,7 @@ def is_mobile(user_agent = None):
 
     user_agent = flask.request.headers.get("User-Agent", "")\
         if user_agent == None else user_agent
-    prefix = user_agent[:4]
-    mobile = defines.MOBILE_REGEX.search(user_agent)
-    mobile_prefix = defines.MOBILE_PREFIX_REGEX.search(prefix)
-    is_mobile = True if mobile or mobile_prefix else False
-    return is_mobile
+    return user_agent_info(user_agent, fields = ("mobile",))["mobile"]
 
 def is_tablet(user_agent = None):
     """
@@ -312,11 +328,7 @@ def is_tablet(user_agent = None):
 
     user_agent = flask.request.headers.get("User-Agent", "")\
         if user_agent == None else user_agent
-    prefix = user_agent[:4]
-    tablet = defines.TABLET_REGEX.search(user_agent)
-    mobile_prefix = defines.MOBILE_PREFIX_REGEX.search(prefix)
-    is_tablet = True if tablet or mobile_prefix else False
-    return is_tablet
+    return user_agent_info(user_agent, fields = ("tablet",))["tablet"]
 
 def is_browser(user_agent = None):
     """
@@ -379,7 +391,75 @@ def browser_info(user_agent = None):
 
     user_agent = flask.request.headers.get("User-Agent", "")\
         if user_agent == None else user_agent
+    info = user_agent_info(user_agent, fields = ("browser",))["browser"]
+    return dict(info) if info else None
+
+def user_agent_info(user_agent, fields = USER_AGENT_FIELDS):
+    """
+    Retrieves the classification of the provided user agent string
+    (mobile, tablet and browser information), using a bounded cache
+    of the most recently classified user agents as the number of
+    distinct user agents is usually small.
+
+    Only the requested fields are computed (and then kept in the
+    cache entry) so that a miss for a single verification does not
+    pay for the complete classification of the user agent.
+
+    The returned structure is shared and must not be changed.
+
+    :type user_agent: String
+    :param user_agent: The HTTP based user agent string to be classified.
+    :type fields: Tuple
+    :param fields: The names of the fields of the classification that
+    are required, the remaining ones may not be present in the result.
+    :rtype: Dictionary
+    :return: The map containing the (requested) mobile and tablet flags
+    and the browser information (or an invalid value) for the user agent.
+    """
+
+    USER_AGENTS_LOCK.acquire()
+    try:
+        # retrieves the cache entry for the user agent (creating it if
+        # required), the lookup only counts as an hit in case all of the
+        # requested fields have already been computed for the entry
+        info = USER_AGENTS.pop(user_agent, None)
+        if info == None: info = dict()
+        hit = all(field in info for field in fields)
+        USER_AGENTS_STATS["hits" if hit else "misses"] += 1
+        USER_AGENTS[user_agent] = info
+        while len(USER_AGENTS) > USER_AGENTS_SIZE: USER_AGENTS.popitem(last = False)
+    finally:
+        USER_AGENTS_LOCK.release()
+    if hit: return info
+
+    # computes the requested fields that are not yet present in the
+    # cache entry, the (cheap) mobile prefix verification is shared
+    # and short-circuits the complete mobile and tablet expressions
+    mobile_prefix = None
+    for field in fields:
+        if field in info: continue
+        if field == "browser": info[field] = _browser_info(user_agent); continue
+        if mobile_prefix == None:
+            prefix = user_agent[:4]
+            mobile_prefix = True if defines.MOBILE_PREFIX_REGEX.search(prefix) else False
+        if mobile_prefix: info[field] = True; continue
+        regex = defines.MOBILE_REGEX if field == "mobile" else defines.TABLET_REGEX
+        info[field] = True if regex.search(user_agent) else False
+
+    return info
+
+def user_agent_stats():
+    hits = USER_AGENTS_STATS["hits"]
+    misses = USER_AGENTS_STATS["misses"]
+    total = hits + misses
+    return dict(
+        hits = hits,
+        misses = misses,
+        ratio = float(hits) / float(total) if total else 0.0,
+        size = len(USER_AGENTS)
+    )
 
+def _browser_info(user_agent):
     info = dict()
 
     for browser_i in defines.BROWSER_INFO:
@@ -963,23 +1043,26 @@ def to_locale(value, locale = None, default = None, fallback = True):
             fallback = fallback
         ) for value in value
     ])
+    # retrieves the compiled chain of bundles for the locale (including
+    # the language and default fallbacks), in case the locale of the
+    # request is used the chain is resolved once and kept in the request
+    app = common.base().APP
     has_context = common.base().has_context()
-    locale = locale or (flask.request.locale if has_context else None)
-    if locale:
-        bundle = common.base().get_bundle(locale) or {}
-        result = bundle.get(value, None)
-        if not result == None: return result
-        language = locale.split("_", 1)[0]
-        bundle = common.base().get_bundle(language) or {}
+    chains = getattr(flask.request, "chains", None) if has_context and not locale else None
+    chain = chains.get(fallback, None) if chains else None
+    if chain == None:
+        locale = locale or (flask.request.locale if has_context else None)
+        chain = common.base().get_chain(locale, app = app, fallback = fallback)
+        if not chains == None: chains[fallback] = chain
+    else:
+        locale = flask.request.locale
+
+    # tries to find the value in each of the bundles of the chain, by
+    # order, accounting the miss in case it's not found in any of them
+    for bundle in chain:
         result = bundle.get(value, None)
         if not result == None: return result
-    app = common.base().APP
-    if fallback and app: return to_locale(
-        value,
-        locale = app._locale_d,
-        default = default,
-        fallback = False
-    )
+    if chain: app.bundles.miss(locale, value)
     return value if default == None else default
 
 def nl_to_br(value):